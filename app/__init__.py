@@ -1,3 +1,4 @@
+import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 
@@ -10,10 +11,19 @@ def create_app():
     app.config['SECRET_KEY'] = 'superkey'
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///attendance.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Build the face models at startup (set PRELOAD_FACE_MODELS=1) instead of on first use
+    app.config['PRELOAD_FACE_MODELS'] = os.environ.get('PRELOAD_FACE_MODELS', '0') == '1'
+    # Dashboard/report query cache: 'memory' (per process), 'shared' (one file for all workers) or 'off'
+    app.config['QUERY_CACHE_STORE'] = os.environ.get('QUERY_CACHE_STORE', 'memory')
+    app.config['QUERY_CACHE_TTL'] = float(os.environ.get('QUERY_CACHE_TTL', '60'))
     
     #initialzing database  
     db.init_app(app)
     
+    #query cache for dashboards, invalidated by the write paths
+    from app.query_cache import init_cache
+    init_cache(app)
+    
     #import models
     from app import models
     with app.app_context():
@@ -40,5 +50,14 @@ def create_app():
     app.register_blueprint(attendance_bp)
     app.register_blueprint(report_bp)
     
+    #register cli commands
+    from app.commands import register_commands
+    register_commands(app)
+    
+    #warm the recognition model once per process
+    if app.config['PRELOAD_FACE_MODELS']:
+        from app import model_registry
+        print(f"✅ Face models preloaded: {model_registry.preload(warm_up=True)}")
+    
     return app
      
\ No newline at end of file
@@ -0,0 +1,183 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import bindparam, case, func, insert, literal, select, update
+
+from app.models import Attendance, DailyRollup, Report, Student
+from app.query_cache import invalidate, ATTENDANCE
+
+
+# --- CONFIGURATION ---
+ATTENDED_STATUSES = ('Present', 'Late')
+ID_CHUNK = 500   # student ids per IN (...) lookup, well under SQLite's bound-parameter limit
+
+
+def count_new_rows(rows):
+    """
+    {student_id: (classes, attended)} for freshly inserted attendance rows, given as
+    (student_id, status) pairs.
+    """
+    classes, attended = Counter(), Counter()
+    for student_id, status in rows:
+        if student_id is None:
+            continue
+        classes[student_id] += 1
+        if status in ATTENDED_STATUSES:
+            attended[student_id] += 1
+    return {student_id: (classes[student_id], attended[student_id]) for student_id in classes}
+
+
+def apply_report_counts(db, counts):
+    """
+    Adds new attendance rows to the students' Report rows, inside the caller's transaction.
+    `counts` is {student_id: (classes, attended)} (see count_new_rows). Students without a
+    Report yet get one. The emotion / liveness averages are not touched: live recognition
+    does not produce those scores, so only `flask rebuild-reports` recomputes them.
+    """
+    if not counts:
+        return 0
+
+    now = datetime.now()
+    existing = set()
+    student_ids = list(counts)
+    for start in range(0, len(student_ids), ID_CHUNK):
+        chunk = student_ids[start:start + ID_CHUNK]
+        existing.update(row.student_id for row in db.session.query(Report.student_id).filter(Report.student_id.in_(chunk)))
+
+    new_reports = [
+        {
+            'student_id': student_id,
+            'total_classes': classes,
+            'attended_classes': attended,
+            'attendance_percentage': 100.0 * attended / classes,
+            'avg_emotion_score': 0.0,
+            'avg_liveness_score': 0.0,
+            'last_updated': now,
+        }
+        for student_id, (classes, attended) in counts.items() if student_id not in existing
+    ]
+    if new_reports:
+        db.session.execute(insert(Report.__table__), new_reports)
+
+    if existing:
+        reports = Report.__table__.c
+        classes, attended = bindparam('classes'), bindparam('attended')
+        # Every SET expression sees the row's old values, so the percentage uses the new totals.
+        db.session.execute(
+            update(Report.__table__).where(reports.student_id == bindparam('report_student_id')).values(
+                total_classes=reports.total_classes + classes,
+                attended_classes=reports.attended_classes + attended,
+                attendance_percentage=100.0 * (reports.attended_classes + attended) / (reports.total_classes + classes),
+                last_updated=now,
+            ),
+            [
+                {'report_student_id': student_id, 'classes': counts[student_id][0], 'attended': counts[student_id][1]}
+                for student_id in existing
+            ],
+        )
+    return len(counts)
+
+
+def rebuild_reports(db):
+    """
+    Recomputes every Report row from the attendance table in two statements
+    (students without attendance get a zeroed row). Returns the number of reports.
+    """
+    attended = func.sum(case((Attendance.status.in_(ATTENDED_STATUSES), 1), else_=0))
+    totals = select(
+        Attendance.student_id.label('student_id'),
+        func.count(Attendance.id).label('total'),
+        attended.label('attended'),
+        func.avg(Attendance.emotion_score).label('emotion'),
+        func.avg(Attendance.liveness_score).label('liveness'),
+    ).where(Attendance.student_id.isnot(None)).group_by(Attendance.student_id).subquery()
+
+    total = func.coalesce(totals.c.total, 0)
+    rows = select(
+        Student.id,
+        total,
+        func.coalesce(totals.c.attended, 0),
+        case((total > 0, 100.0 * totals.c.attended / totals.c.total), else_=0.0),
+        func.coalesce(totals.c.emotion, 0.0),
+        func.coalesce(totals.c.liveness, 0.0),
+        literal(datetime.now(), Report.last_updated.type),
+    ).outerjoin(totals, totals.c.student_id == Student.id)
+
+    db.session.execute(Report.__table__.delete())
+    result = db.session.execute(insert(Report.__table__).from_select(
+        ['student_id', 'total_classes', 'attended_classes', 'attendance_percentage',
+         'avg_emotion_score', 'avg_liveness_score', 'last_updated'],
+        rows,
+    ))
+    db.session.commit()
+    invalidate(ATTENDANCE)
+    return result.rowcount
+
+
+# --- DAILY ROLLUPS ---
+def refresh_daily_rollups(db, since=None, until=None):
+    """
+    Recomputes the DailyRollup rows for dates in [since, until] (inclusive, open-ended
+    when None) from the attendance table, replacing what was there. Called for today
+    when a session closes; `flask backfill-rollups` runs it over the whole history.
+    Returns the number of rollup rows written.
+    """
+    counts = select(
+        Attendance.date,
+        Attendance.subject_id,
+        Attendance.status,
+        func.count(Attendance.id),
+        literal(datetime.now(), DailyRollup.updated_at.type),
+    ).where(Attendance.date.isnot(None), Attendance.status.isnot(None)).group_by(
+        Attendance.date, Attendance.subject_id, Attendance.status
+    )
+    stale = DailyRollup.__table__.delete()
+
+    if since is not None:
+        counts = counts.where(Attendance.date >= since)
+        stale = stale.where(DailyRollup.date >= since)
+    if until is not None:
+        counts = counts.where(Attendance.date <= until)
+        stale = stale.where(DailyRollup.date <= until)
+
+    db.session.execute(stale)
+    result = db.session.execute(insert(DailyRollup.__table__).from_select(
+        ['date', 'subject_id', 'status', 'count', 'updated_at'], counts
+    ))
+    db.session.commit()
+    invalidate(ATTENDANCE)
+    return result.rowcount
+
+
+def rollup_trends(db, since, until, period='day', subject_id=None):
+    """
+    Present / Late / Absent totals per day, week (Monday first) or month between two dates, read
+    from DailyRollup only. Returns a list of dicts ordered by period.
+    """
+    if period == 'week':
+        bucket = func.strftime('%Y-W%W', DailyRollup.date)
+    elif period == 'month':
+        bucket = func.strftime('%Y-%m', DailyRollup.date)
+    else:
+        bucket = func.strftime('%Y-%m-%d', DailyRollup.date)
+
+    def total(status):
+        return func.coalesce(func.sum(case((DailyRollup.status == status, DailyRollup.count))), 0)
+
+    query = db.session.query(
+        bucket.label('period'), total('Present'), total('Late'), total('Absent'),
+    ).filter(DailyRollup.date >= since, DailyRollup.date <= until)
+    if subject_id is not None:
+        query = query.filter(DailyRollup.subject_id == subject_id)
+
+    trends = []
+    for label, present, late, absent in query.group_by(bucket).order_by(bucket):
+        total_rows = present + late + absent
+        trends.append({
+            'period': label,
+            'present': present,
+            'late': late,
+            'absent': absent,
+            'attendance_rate': round(100.0 * (present + late) / total_rows, 1) if total_rows else 0.0,
+        })
+    return trends
@@ -0,0 +1,136 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from sqlalchemy import tuple_
+
+from app import db
+from app.models import Attendance, Student
+
+
+# --- CONFIGURATION ---
+RECORDS_PAGE_SIZE = 50     # rows per page of the attendance history
+EXPORT_CHUNK_SIZE = 1000   # rows fetched from the database cursor at a time while exporting
+STATUSES = ('Present', 'Late', 'Absent')
+EXPORT_COLUMNS = ('id', 'date', 'roll_no', 'name', 'subject_id', 'time_in', 'time_out', 'status')
+
+
+# --- FILTERS ---
+def parse_filters(args):
+    """
+    date_from / date_to (YYYY-MM-DD, inclusive), subject_id and status from a request's
+    query string. Raises ValueError for malformed values.
+    """
+    filters = {}
+    for key in ('date_from', 'date_to'):
+        if args.get(key):
+            filters[key] = date.fromisoformat(args[key])
+    if args.get('subject_id'):
+        filters['subject_id'] = int(args['subject_id'])
+    if args.get('status'):
+        if args['status'] not in STATUSES:
+            raise ValueError(f"Unknown status {args['status']!r}.")
+        filters['status'] = args['status']
+    return filters
+
+
+def records_query(filters):
+    """Attendance rows joined to their student, newest first, with the filters applied."""
+    query = db.session.query(
+        Attendance.id,
+        Attendance.date,
+        Attendance.time_in,
+        Attendance.time_out,
+        Attendance.status,
+        Attendance.subject_id,
+        Student.name,
+        Student.roll_no,
+    ).join(Student)
+
+    if 'date_from' in filters:
+        query = query.filter(Attendance.date >= filters['date_from'])
+    if 'date_to' in filters:
+        query = query.filter(Attendance.date <= filters['date_to'])
+    if 'subject_id' in filters:
+        query = query.filter(Attendance.subject_id == filters['subject_id'])
+    if 'status' in filters:
+        query = query.filter(Attendance.status == filters['status'])
+
+    return query.order_by(Attendance.time_in.desc(), Attendance.id.desc())
+
+
+# --- KEYSET PAGINATION ---
+def encode_cursor(row):
+    return f"{row.time_in.isoformat()}_{row.id}"
+
+
+def decode_cursor(cursor):
+    """(time_in, id) of the last row on the previous page. Raises ValueError if malformed."""
+    time_in, _, row_id = cursor.rpartition('_')
+    return datetime.fromisoformat(time_in), int(row_id)
+
+
+def fetch_page(filters, cursor=None, page_size=RECORDS_PAGE_SIZE):
+    """
+    One page of records strictly after `cursor` in (time_in, id) descending order.
+    Seeks with the index on (time_in, id) instead of OFFSET, so page 1000 costs the same
+    as page 1. Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    query = records_query(filters)
+    if cursor:
+        time_in, row_id = decode_cursor(cursor)
+        # Row-value comparison: SQLite seeks the index to the cursor (an OR of the two cases scans it).
+        query = query.filter(tuple_(Attendance.time_in, Attendance.id) < (time_in, row_id))
+
+    rows = query.limit(page_size + 1).all()
+    if len(rows) > page_size:
+        return rows[:page_size], encode_cursor(rows[page_size - 1])
+    return rows, None
+
+
+# --- STREAMING EXPORT ---
+def _export_values(row):
+    return [
+        row.id,
+        row.date.isoformat() if row.date else '',
+        row.roll_no,
+        row.name,
+        row.subject_id if row.subject_id is not None else '',
+        row.time_in.isoformat(sep=' ', timespec='seconds') if row.time_in else '',
+        row.time_out.isoformat(sep=' ', timespec='seconds') if row.time_out else '',
+        row.status,
+    ]
+
+
+def iter_records(filters, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yields matching rows from a streaming database cursor, `chunk_size` rows at a time."""
+    yield from records_query(filters).yield_per(chunk_size)
+
+
+def stream_csv(filters, chunk_size=EXPORT_CHUNK_SIZE):
+    """CSV export as a generator of text chunks; memory stays flat however many rows match."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+
+    for count, row in enumerate(iter_records(filters, chunk_size), start=1):
+        writer.writerow(_export_values(row))
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_json(filters, chunk_size=EXPORT_CHUNK_SIZE):
+    """JSON array export, streamed the same way as stream_csv."""
+    parts = ['[']
+    for count, row in enumerate(iter_records(filters, chunk_size)):
+        record = dict(zip(EXPORT_COLUMNS, _export_values(row)))
+        parts.append((',' if count else '') + json.dumps(record))
+        if len(parts) >= chunk_size:
+            yield ''.join(parts)
+            parts = []
+    parts.append(']')
+    yield ''.join(parts)
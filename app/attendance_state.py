@@ -0,0 +1,111 @@
+from datetime import datetime
+
+
+# --- STATES ---
+NOT_MARKED = "not_marked"   # no record today -> next sighting marks IN
+MARKED_IN = "in"            # record without time_out -> next sighting marks OUT
+COMPLETED = "completed"     # marked in and out -> nothing left to write today
+
+
+class AttendanceState:
+    """
+    What each student has already been marked today, held in memory for one
+    attendance session. Loaded with a single query when the session starts (and
+    again if the session runs past midnight); repeat sightings of a student are
+    answered from here, so the database is only touched when a student's state
+    actually changes.
+
+    Records are kept per (student, subject): a sighting in a subject's session only
+    looks at that subject's record, so checking in to one class never becomes the
+    OUT of another. subject_id None (an untagged session) looks at the student's
+    earliest record of any subject, the same way mark_absentees_on_exit(None) counts
+    any record as attendance.
+
+    Only the session's writer thread uses an instance, so it needs no lock.
+    """
+
+    def __init__(self, db, AttendanceModel):
+        self.db = db
+        self.Attendance = AttendanceModel
+        self.day = None
+        self._states = {}     # (student_id, subject_id or None for any) -> (state, attendance_id)
+        self.preloaded = 0
+        self.hits = 0
+        self.changes = 0
+        self.reloads = 0
+
+    def _load(self, day):
+        Attendance = self.Attendance
+        rows = self.db.session.query(Attendance.student_id, Attendance.subject_id, Attendance.id, Attendance.time_out).filter(
+            Attendance.date == day
+        ).order_by(Attendance.id).all()
+
+        states = {}
+        for student_id, subject_id, attendance_id, time_out in rows:
+            # The earliest record of the day (per subject, and of any subject) is the one IN/OUT applies to.
+            state = (COMPLETED if time_out is not None else MARKED_IN, attendance_id)
+            states.setdefault((student_id, subject_id), state)
+            states.setdefault((student_id, None), state)
+
+        self._states = states
+        self.day = day
+        self.preloaded = len({student_id for student_id, _ in states})
+        self.reloads += 1
+
+    def lookup(self, student_id, subject_id=None, now=None):
+        """Returns (state, attendance_id) for today; attendance_id is None when NOT_MARKED."""
+        day = (now or datetime.now()).date()
+        if day != self.day:
+            self._load(day)
+        state = self._states.get((student_id, subject_id))
+        if state is None:
+            return NOT_MARKED, None
+        self.hits += 1
+        return state
+
+    def refresh(self, student_id, subject_id=None, now=None):
+        """
+        Re-reads one student's record from the database. Used right before a write,
+        so rows added by another session since the preload are not duplicated.
+        """
+        day = (now or datetime.now()).date()
+        Attendance = self.Attendance
+        query = self.db.session.query(Attendance.id, Attendance.time_out).filter(
+            Attendance.date == day, Attendance.student_id == student_id
+        )
+        if subject_id is not None:
+            query = query.filter(Attendance.subject_id == subject_id)
+        row = query.order_by(Attendance.id).first()
+
+        key = (student_id, subject_id)
+        if row is None:
+            self._states.pop(key, None)
+            return NOT_MARKED, None
+        state = (COMPLETED if row.time_out is not None else MARKED_IN, row.id)
+        self._states[key] = state
+        return state
+
+    def mark_in(self, student_id, attendance_id, subject_id=None):
+        state = (MARKED_IN, attendance_id)
+        self._states[(student_id, subject_id)] = state
+        # A subject's record is also the student's first record of the day if they had none
+        self._states.setdefault((student_id, None), state)
+        self.changes += 1
+
+    def mark_out(self, student_id, attendance_id, subject_id=None):
+        previous = self._states.get((student_id, subject_id))
+        state = (COMPLETED, attendance_id)
+        self._states[(student_id, subject_id)] = state
+        if subject_id is not None and self._states.get((student_id, None)) is previous:
+            self._states[(student_id, None)] = state   # the same record seen from an untagged session
+        self.changes += 1
+
+    def metrics(self):
+        return {
+            "day": self.day.isoformat() if self.day else None,
+            "preloaded": self.preloaded,
+            "tracked_students": len({student_id for student_id, _ in self._states}),
+            "cache_hits": self.hits,
+            "state_changes": self.changes,
+            "reloads": self.reloads,
+        }
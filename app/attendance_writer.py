@@ -0,0 +1,412 @@
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from app.aggregates import apply_report_counts, count_new_rows
+from app.query_cache import invalidate, ATTENDANCE
+
+try:
+    import fcntl
+except ImportError:   # Windows: only journals of this process are protected
+    fcntl = None
+
+
+# --- CONFIGURATION ---
+MAX_BATCH_EVENTS = 64        # events per transaction
+MAX_FLUSH_DELAY_MS = 500     # how long the oldest queued event may wait for its batch
+RETRY_DELAY_S = 1.0          # pause after a failed flush before trying again
+MAX_FLUSH_RETRIES = 5        # failed attempts before the batch is split to isolate events that cannot commit
+JOURNAL_FSYNC = False        # fsync every journal append (survives power loss, not just a crash)
+JOURNAL_DIRNAME = "attendance_journal"
+
+_ids = itertools.count(1)
+_active_journals = set()     # journals owned by a running writer in this process
+_active_lock = threading.Lock()
+
+
+def get_journal_dir():
+    return os.path.join(current_app.instance_path, JOURNAL_DIRNAME)
+
+
+def lock_journal(f, path):
+    """
+    Takes an exclusive lock on the open journal `f`, held until it is closed, so a
+    writer in another worker process (or the replay command) leaves it alone.
+    Returns False if another process holds it, or if `path` was removed or replaced
+    since `f` was opened.
+    """
+    if fcntl is not None:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+    try:
+        return os.path.samestat(os.fstat(f.fileno()), os.stat(path))
+    except FileNotFoundError:
+        return False
+
+
+# --- APPLYING EVENTS ---
+def apply_events(db, AttendanceModel, events):
+    """
+    Writes a batch of IN / OUT events in the caller's transaction (no commit).
+    Both kinds are idempotent, so a journal can be replayed after a crash:
+    an IN is skipped when the student already has a record of that subject that
+    day, and an OUT only fills the time_out of the student's earliest open record
+    of that subject that day. An event without a subject_id matches records of
+    any subject (see AttendanceState). The students' Report rows are updated in
+    the same transaction.
+    Returns (inserted, closed).
+    """
+    inserted = closed = 0
+    new_rows = []
+
+    ins_by_day = {}
+    for event in events:
+        if event["kind"] == "in":
+            ins_by_day.setdefault(event["day"], []).append(event)
+
+    for day, day_events in ins_by_day.items():
+        student_ids = {event["student_id"] for event in day_events}
+        existing = set()   # (student_id, subject_id) and (student_id, None) for any subject
+        for row in db.session.query(AttendanceModel.student_id, AttendanceModel.subject_id).filter(
+            AttendanceModel.date == datetime.fromisoformat(day).date(),
+            AttendanceModel.student_id.in_(student_ids),
+        ):
+            existing.update({(row.student_id, row.subject_id), (row.student_id, None)})
+
+        rows = []
+        for event in day_events:
+            key = (event["student_id"], event.get("subject_id"))
+            if key in existing:
+                continue
+            existing.update({key, (event["student_id"], None)})
+            at = datetime.fromisoformat(event["at"])
+            rows.append({
+                "student_id": event["student_id"],
+                "subject_id": event.get("subject_id"),
+                "date": at.date(),
+                "time_in": at,
+                "status": event["status"],
+            })
+        if rows:
+            db.session.bulk_insert_mappings(AttendanceModel, rows)
+            inserted += len(rows)
+            new_rows += [(row["student_id"], row["status"]) for row in rows]
+    apply_report_counts(db, count_new_rows(new_rows))
+
+    for event in events:
+        if event["kind"] != "out":
+            continue
+        open_records = [
+            AttendanceModel.date == datetime.fromisoformat(event["day"]).date(),
+            AttendanceModel.student_id == event["student_id"],
+            AttendanceModel.time_out.is_(None),
+        ]
+        if event.get("subject_id") is not None:
+            open_records.append(AttendanceModel.subject_id == event["subject_id"])
+        earliest = select(func.min(AttendanceModel.id)).where(*open_records).scalar_subquery()
+        closed += db.session.query(AttendanceModel).filter(AttendanceModel.id == earliest).update(
+            {AttendanceModel.time_out: datetime.fromisoformat(event["at"])}, synchronize_session=False
+        )
+
+    return inserted, closed
+
+
+def read_journal(path):
+    """
+    Events of a journal file that were not followed by a commit marker. A marker lists
+    the seqs it committed (older journals hold the highest committed seq instead).
+    """
+    events, committed, committed_upto = [], set(), 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue   # torn last line from a crash mid-write
+            if "committed" not in record:
+                events.append(record)
+            elif isinstance(record["committed"], list):
+                committed.update(record["committed"])
+            else:
+                committed_upto = max(committed_upto, record["committed"])
+    return [event for event in events if event["seq"] > committed_upto and event["seq"] not in committed]
+
+
+def recover_journals(db, AttendanceModel, directory=None):
+    """
+    Replays journals left behind by writers that did not shut down cleanly, then
+    deletes them. Journals still locked by a running writer are skipped.
+    Returns the number of events replayed.
+    """
+    directory = directory or get_journal_dir()
+    if not os.path.isdir(directory):
+        return 0
+
+    replayed = 0
+    for filename in sorted(os.listdir(directory)):
+        path = os.path.join(directory, filename)
+        with _active_lock:
+            if not filename.endswith(".jsonl") or path in _active_journals:
+                continue
+        try:
+            journal = open(path, encoding="utf-8")
+        except FileNotFoundError:
+            continue   # removed by another process since listdir
+        with journal:
+            if not lock_journal(journal, path):
+                continue   # a live writer (or another replay) owns it
+            try:
+                events = read_journal(path)
+                if events:
+                    apply_events(db, AttendanceModel, events)
+                    db.session.commit()
+                    invalidate(ATTENDANCE)
+                os.remove(path)
+                replayed += len(events)
+            except Exception as e:
+                db.session.rollback()
+                print(f"[WARN] Could not replay attendance journal {filename}: {e}")
+    if replayed:
+        print(f"[INFO] Replayed {replayed} attendance events from unfinished sessions.")
+    return replayed
+
+
+# --- WRITER ---
+class AttendanceWriter:
+    """
+    Takes IN / OUT events off the recognition path and writes them in batched
+    transactions, one commit per `max_batch` events or per `max_delay_ms`.
+
+    Every event is appended to a journal file (<instance>/attendance_journal)
+    before it is queued, and a commit marker follows each successful flush, so
+    if the process dies mid-session the next writer (or `flask replay-attendance-journal`)
+    replays whatever was not committed. Repeated events for the same student,
+    subject, day and kind are dropped on submit.
+
+    A batch that keeps failing is retried MAX_FLUSH_RETRIES times, then split in halves
+    until the events that cannot be written are isolated; those are parked (left in the
+    journal for `flask replay-attendance-journal`) and the rest are written, so one bad
+    event does not hold up the session.
+    """
+
+    def __init__(self, app, db, AttendanceModel, max_batch=MAX_BATCH_EVENTS, max_delay_ms=MAX_FLUSH_DELAY_MS,
+                 journal_dir=None, fsync=JOURNAL_FSYNC):
+        self.app = app
+        self.db = db
+        self.Attendance = AttendanceModel
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000.0
+        self.fsync = fsync
+
+        with app.app_context():
+            self.journal_dir = journal_dir or get_journal_dir()
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self.journal_path = os.path.join(self.journal_dir, f"writer-{os.getpid()}-{int(time.time())}-{next(_ids)}.jsonl")
+
+        self._queue = queue.Queue()
+        self._journal = None
+        self._journal_lock = threading.Lock()
+        self._seq = 0
+        self._seen = set()
+        self._pending = 0
+        self._thread = None
+        self._started_at = None
+
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.duplicates = 0
+        self.written = 0
+        self.batches = 0
+        self.failed_flushes = 0
+        self.parked = 0
+        self.replayed = 0
+        self.flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.event_latency = 0.0
+
+    # --- lifecycle ---
+    def start(self):
+        with _active_lock:
+            _active_journals.add(self.journal_path)
+        while True:
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+            if lock_journal(self._journal, self.journal_path):
+                break
+            # A replay in another process removed the new, empty file before we locked it
+            self._journal.close()
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Flushes everything still queued and removes the journal once it is all committed."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+        try:
+            with self._journal_lock:
+                if self._pending == 0:
+                    try:
+                        os.remove(self.journal_path)   # while still locked, so no replay picks it up
+                    except FileNotFoundError:
+                        pass
+                else:
+                    print(f"[WARN] {self._pending} attendance events left in {self.journal_path} for replay.")
+                self._journal.close()
+        finally:
+            with _active_lock:
+                _active_journals.discard(self.journal_path)
+
+    # --- producer side ---
+    def submit(self, kind, student_id, at, subject_id=None, status=None):
+        """Journals and queues one 'in' or 'out' event. Returns False for a duplicate."""
+        day = at.date().isoformat()
+        with self._journal_lock:
+            key = (day, student_id, subject_id, kind)
+            if key in self._seen:
+                with self._stats_lock:
+                    self.duplicates += 1
+                return False
+            self._seen.add(key)
+
+            self._seq += 1
+            event = {"seq": self._seq, "kind": kind, "student_id": student_id, "subject_id": subject_id,
+                     "status": status, "day": day, "at": at.isoformat()}
+            self._write_journal(event)
+            self._pending += 1
+
+        with self._stats_lock:
+            self.submitted += 1
+        self._queue.put((time.monotonic(), event))
+        return True
+
+    def _write_journal(self, record):
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    # --- consumer side ---
+    def _collect(self, block=True):
+        """Waits for the next batch (or, with block=False, takes what is queued). Returns (items, stopping)."""
+        try:
+            first = self._queue.get(block=block)
+        except queue.Empty:
+            return [], False
+        if first is None:
+            return [], True
+
+        items = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(items) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return items, True
+            items.append(item)
+        return items, False
+
+    def _run(self):
+        with self.app.app_context():
+            self.replayed = recover_journals(self.db, self.Attendance, self.journal_dir)
+
+            retry = []
+            failures = 0
+            stopping = False
+            while not stopping:
+                items, stopping = self._collect(block=not retry)   # a failed batch is retried without new events
+                retry += items
+                if not retry:
+                    continue
+                if self._flush(retry):
+                    retry, failures = [], 0
+                    continue
+                failures += 1
+                if failures >= MAX_FLUSH_RETRIES:
+                    self._isolate(retry)
+                    retry, failures = [], 0
+                elif not stopping:
+                    time.sleep(RETRY_DELAY_S)
+            self.db.session.remove()
+
+    def _isolate(self, items):
+        """Writes a batch that keeps failing in halves, parking the single events that still fail."""
+        if len(items) == 1:
+            _, event = items[0]
+            with self._stats_lock:
+                self.parked += 1
+            print(f"[WARN] Parked attendance event {event['kind']} for student {event['student_id']} (seq {event['seq']}) "
+                  f"in {self.journal_path}; run 'flask replay-attendance-journal' once the cause is fixed.")
+            return
+        middle = len(items) // 2
+        for half in (items[:middle], items[middle:]):
+            if not self._flush(half):
+                self._isolate(half)
+
+    def _flush(self, items):
+        start = time.monotonic()
+        events = [event for _, event in items]
+        try:
+            apply_events(self.db, self.Attendance, events)
+            self.db.session.commit()
+            invalidate(ATTENDANCE)
+        except Exception as e:
+            self.db.session.rollback()
+            with self._stats_lock:
+                self.failed_flushes += 1
+            print(f"[WARN] Attendance flush of {len(events)} events failed: {e}")
+            return False
+
+        done = time.monotonic()
+        with self._journal_lock:
+            self._pending -= len(events)
+            if self._pending == 0:
+                self._journal.seek(0)
+                self._journal.truncate()
+            else:
+                self._write_journal({"committed": [event["seq"] for event in events]})
+
+        with self._stats_lock:
+            self.batches += 1
+            self.written += len(events)
+            self.flush_seconds += done - start
+            self.max_flush_seconds = max(self.max_flush_seconds, done - start)
+            self.event_latency += sum(done - queued_at for queued_at, _ in items)
+        return True
+
+    def metrics(self):
+        with self._stats_lock:
+            elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+            return {
+                "submitted": self.submitted,
+                "written": self.written,
+                "duplicates_dropped": self.duplicates,
+                "pending": self.submitted - self.written - self.parked,
+                "batches": self.batches,
+                "avg_batch_size": round(self.written / self.batches, 2) if self.batches else 0.0,
+                "avg_flush_ms": round(1000 * self.flush_seconds / self.batches, 2) if self.batches else 0.0,
+                "max_flush_ms": round(1000 * self.max_flush_seconds, 2),
+                "avg_event_latency_ms": round(1000 * self.event_latency / self.written, 2) if self.written else 0.0,
+                "events_per_sec": round(self.written / elapsed, 2) if elapsed else 0.0,
+                "failed_flushes": self.failed_flushes,
+                "parked": self.parked,
+                "replayed": self.replayed,
+            }
@@ -0,0 +1,355 @@
+import csv
+import io
+import itertools
+import multiprocessing
+import os
+import re
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import cv2
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Student
+from app.embedding_codec import encode_embedding
+from app.embedding_index import get_index
+from app.enroll_face import find_duplicate_faces, template_from_images
+from app.face_templates import gallery_vectors
+from app.recognition import load_gallery
+from app.query_cache import invalidate, STUDENTS
+
+
+# --- CONFIGURATION ---
+# Detection + embedding run in this many worker processes (each loads its own model copy);
+# 0 runs everything in the calling process.
+ENROLL_WORKERS = min(4, os.cpu_count() or 1)
+STUDENTS_PER_TASK = 8        # students' photos handed to a worker at a time
+INSERT_BATCH_SIZE = 500      # students per INSERT / commit
+MAX_PHOTO_SIDE = 1280        # larger photos are downscaled before detection
+PROGRESS_EVERY = 100         # students between progress lines on the command line
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+REQUIRED_COLUMNS = ('name', 'email', 'roll_no', 'contact', 'password')
+# Optional columns: subject_id, and photo (file name(s) inside the photo directory, separated
+# by ';'; defaults to every <roll_no>.<ext> and <roll_no>_<n>.<ext> with ext in PHOTO_EXTENSIONS).
+# Several photos of a student become one multi-sample template (see face_templates).
+
+
+# --- ROSTER ---
+def read_roster(stream):
+    """
+    Parses a CSV roster (header row required). Returns (rows, errors): rows are dicts
+    with the student columns plus 'line'; errors are {'line', 'roll_no', 'error'}
+    for rows that cannot be imported. Raises ValueError if a required column is missing.
+    """
+    reader = csv.DictReader(stream)
+    header = [column.strip() for column in reader.fieldnames or []]
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ValueError(f"Roster is missing the column(s): {', '.join(missing)}")
+    reader.fieldnames = header
+
+    rows, errors = [], []
+    seen = {'email': set(), 'roll_no': set(), 'contact': set()}
+    for line, raw in enumerate(reader, start=2):
+        row = {key: (value or '').strip() for key, value in raw.items() if key}
+        roll_no = row.get('roll_no', '')
+        try:
+            empty = [column for column in REQUIRED_COLUMNS if not row.get(column)]
+            if empty:
+                raise ValueError(f"empty {', '.join(empty)}")
+            if not row['contact'].isdigit() or (row.get('subject_id') and not row['subject_id'].isdigit()):
+                raise ValueError("contact and subject_id must be numbers")
+            student = {
+                'line': line,
+                'name': row['name'],
+                'email': row['email'],
+                'roll_no': roll_no,
+                'contact': int(row['contact']),
+                'password': row['password'],
+                'subject_id': int(row['subject_id']) if row.get('subject_id') else None,
+                'photo': row.get('photo') or None,
+            }
+        except ValueError as e:
+            errors.append({'line': line, 'roll_no': roll_no, 'error': f"Invalid row: {e}"})
+            continue
+
+        duplicate = [key for key in seen if student[key] in seen[key]]
+        if duplicate:
+            errors.append({'line': line, 'roll_no': roll_no, 'error': f"Duplicate {', '.join(duplicate)} in roster"})
+            continue
+        for key in seen:
+            seen[key].add(student[key])
+        rows.append(student)
+    return rows, errors
+
+
+def index_photos(photo_dir):
+    """
+    (by_name, by_stem) for a photo directory: lower-case file name -> file name, and
+    lower-case roll number stem ('r001' for R001.jpg and R001_2.jpg) -> file names.
+    """
+    by_name, by_stem = {}, {}
+    for name in sorted(os.listdir(photo_dir)):
+        stem, extension = os.path.splitext(name)
+        if extension.lower() not in PHOTO_EXTENSIONS:
+            continue
+        by_name[name.lower()] = name
+        by_stem.setdefault(re.sub(r'_\d+$', '', stem).lower(), []).append(name)
+    return by_name, by_stem
+
+
+def find_photos(photo_dir, row, photo_index):
+    """Paths of the row's photos (empty if none are found)."""
+    by_name, by_stem = photo_index
+    if row['photo']:
+        names = [by_name.get(name.strip().lower()) for name in row['photo'].split(';') if name.strip()]
+        return [os.path.join(photo_dir, name) for name in names if name]
+    return [os.path.join(photo_dir, name) for name in by_stem.get(row['roll_no'].lower(), [])]
+
+
+def existing_conflicts(rows, chunk=500):
+    """{line: error} for roster rows whose email, roll number or contact is already taken."""
+    conflicts = {}
+    for key, column in (('email', Student.email), ('roll_no', Student.roll_no), ('contact', Student.contact)):
+        values = [row[key] for row in rows]
+        taken = set()
+        for start in range(0, len(values), chunk):
+            taken.update(value for (value,) in db.session.query(column).filter(column.in_(values[start:start + chunk])))
+        for row in rows:
+            if row[key] in taken and row['line'] not in conflicts:
+                conflicts[row['line']] = f"A student with this {key.replace('_', ' ')} already exists"
+    return conflicts
+
+
+# --- EMBEDDING (runs in the worker processes) ---
+def _init_worker():
+    from app import model_registry
+    model_registry.get_recognition_model()
+    model_registry.get_detector()
+
+
+def embed_photos(paths):
+    """
+    (template, error) for one student's enrollment photos: the (count, D) vectors to
+    store (one per usable photo, outliers dropped), or None and a message.
+    """
+    images = []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        scale = MAX_PHOTO_SIDE / max(image.shape[:2])
+        if scale < 1:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        images.append(image)
+    if not images:
+        return None, "Unreadable image"
+
+    try:
+        template, reasons = template_from_images(images)
+    except Exception as e:
+        return None, f"Embedding failed: {e}"
+    if template is None:
+        return None, f"No usable face ({', '.join(sorted(set(reasons)))})"
+    return template, None
+
+
+def _embed_all(photo_sets, workers, embed):
+    """Yields embed(paths) -> (template, error) per student, in order."""
+    initializer = _init_worker if embed is embed_photos else None
+    if workers <= 0:
+        if initializer:
+            initializer()
+        yield from map(embed, photo_sets)
+        return
+    # spawn, not fork: the parent may already hold TensorFlow state and threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=initializer) as pool:
+        yield from pool.map(embed, photo_sets, chunksize=STUDENTS_PER_TASK)
+
+
+# --- ENROLLMENT ---
+def _drop_duplicates(pending, matcher, errors):
+    """Records of `pending` [(record, template, files)] whose face is not already enrolled (one search per batch)."""
+    if matcher is None:
+        return [record for record, _, _ in pending]
+    records = []
+    centroids = [gallery_vectors(template, mode="centroid")[0] for _, template, _ in pending]
+    candidates = find_duplicate_faces(centroids, matcher=matcher)
+    for (record, _, filename), duplicates in zip(pending, candidates):
+        if duplicates:
+            closest = duplicates[0]
+            errors.append({'line': record['line'], 'roll_no': record['roll_no'], 'file': filename,
+                           'error': f"Face already enrolled as {closest['name']} ({closest['roll_no']}, distance {closest['distance']:.2f})"})
+        else:
+            records.append(record)
+    return records
+
+
+def _insert_students(records, errors):
+    """Bulk-inserts one batch; falls back to row-by-row so one bad row does not sink the batch."""
+    if not records:
+        return 0
+    values = [{key: value for key, value in record.items() if key != 'line'} for record in records]
+    try:
+        db.session.execute(insert(Student.__table__), values)
+        db.session.commit()
+        return len(records)
+    except IntegrityError:
+        db.session.rollback()
+
+    inserted = 0
+    for record, value in zip(records, values):
+        try:
+            db.session.execute(insert(Student.__table__), [value])
+            db.session.commit()
+            inserted += 1
+        except IntegrityError as e:
+            db.session.rollback()
+            errors.append({'line': record['line'], 'roll_no': record['roll_no'], 'error': f"Insert failed: {e.orig}"})
+    return inserted
+
+
+def enroll_students(rows, photo_dir, workers=ENROLL_WORKERS, approved=True, progress=None, embed=embed_photos,
+                    check_duplicates=True):
+    """
+    Creates a Student with a face template for every roster row whose photos yield a
+    face. Rows that already exist, have no photo, fail detection or (with check_duplicates)
+    match an enrolled face are skipped and reported; fix them and import the same roster
+    again. Duplicates within the roster itself are not detected. `progress(done, total, failed)`
+    is called after each student; `embed(paths)` must be a picklable module-level function.
+    Returns {'total', 'enrolled', 'errors', 'seconds'}.
+    """
+    from app.model_registry import MODEL_NAME
+
+    start = time.monotonic()
+    errors = []
+    conflicts = existing_conflicts(rows)
+    matcher = load_gallery(Student) if check_duplicates else None
+    photo_index = index_photos(photo_dir)
+
+    queued = []
+    for row in rows:
+        if row['line'] in conflicts:
+            errors.append({'line': row['line'], 'roll_no': row['roll_no'], 'error': conflicts[row['line']]})
+            continue
+        paths = find_photos(photo_dir, row, photo_index)
+        if not paths:
+            errors.append({'line': row['line'], 'roll_no': row['roll_no'], 'error': "No photo found"})
+            continue
+        queued.append((row, paths))
+
+    total, enrolled, pending = len(queued), 0, []
+    done = 0
+    if progress:
+        progress(done, total, len(errors))
+    for (row, paths), (template, error) in zip(queued, _embed_all([paths for _, paths in queued], workers, embed)):
+        done += 1
+        files = ';'.join(os.path.basename(path) for path in paths)
+        if error:
+            errors.append({'line': row['line'], 'roll_no': row['roll_no'], 'file': files, 'error': error})
+        else:
+            pending.append(({
+                'line': row['line'],
+                'name': row['name'],
+                'email': row['email'],
+                'roll_no': row['roll_no'],
+                'contact': row['contact'],
+                'password': row['password'],
+                'subject_id': row['subject_id'],
+                'is_approved': approved,
+                'face_embedding': encode_embedding(template, MODEL_NAME),
+            }, template, files))
+        if len(pending) >= INSERT_BATCH_SIZE:
+            enrolled += _insert_students(_drop_duplicates(pending, matcher, errors), errors)
+            pending = []
+        if progress:
+            progress(done, total, len(errors))
+    if pending:
+        enrolled += _insert_students(_drop_duplicates(pending, matcher, errors), errors)
+
+    if enrolled:
+        # One rebuild at the next session start instead of an index rewrite per student
+        get_index().invalidate()
+        invalidate(STUDENTS)
+    errors.sort(key=lambda error: error['line'])
+    return {'total': len(rows), 'enrolled': enrolled, 'errors': errors, 'seconds': round(time.monotonic() - start, 1)}
+
+
+# --- BACKGROUND JOBS (for the upload endpoint) ---
+class EnrollmentJob:
+    """One bulk enrollment started from the web UI; progress is polled by the status endpoint."""
+
+    def __init__(self, job_id, started_by=None):
+        self.id = job_id
+        self.started_by = started_by
+        self.status = "running"   # running -> finished | failed
+        self.created_at = datetime.now()
+        self.done = 0
+        self.total = 0
+        self.failed = 0
+        self.result = None
+        self.error = None
+        self.lock = threading.Lock()
+
+    def progress(self, done, total, failed):
+        with self.lock:
+            self.done, self.total, self.failed = done, total, failed
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "id": self.id,
+                "status": self.status,
+                "started_by": self.started_by,
+                "created_at": self.created_at.isoformat(timespec="seconds"),
+                "students_done": self.done,
+                "students_total": self.total,
+                "failed": self.failed,
+                "result": self.result,
+                "error": self.error,
+            }
+
+
+_jobs = {}
+_job_ids = itertools.count(1)
+_jobs_lock = threading.Lock()
+
+
+def start_enrollment_job(app, roster_text, photo_dir, approved=True, started_by=None, cleanup=None):
+    """
+    Runs read_roster + enroll_students on a background thread inside an app context.
+    `cleanup()` (e.g. removing an extracted upload) runs when the job ends.
+    """
+    with _jobs_lock:
+        job = EnrollmentJob(next(_job_ids), started_by)
+        _jobs[job.id] = job
+
+    def target():
+        try:
+            with app.app_context():
+                rows, errors = read_roster(io.StringIO(roster_text))
+                result = enroll_students(rows, photo_dir, approved=approved, progress=job.progress)
+                result['errors'] = sorted(errors + result['errors'], key=lambda error: error['line'])
+            with job.lock:
+                job.result, job.status = result, "finished"
+        except Exception as e:
+            traceback.print_exc()
+            with job.lock:
+                job.error, job.status = str(e), "failed"
+        finally:
+            if cleanup:
+                cleanup()
+
+    threading.Thread(target=target, name=f"bulk-enroll-{job.id}", daemon=True).start()
+    return job
+
+
+def get_enrollment_job(job_id):
+    return _jobs.get(job_id)
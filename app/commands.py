@@ -0,0 +1,197 @@
+import csv
+import pickle
+import time
+
+import click
+from sqlalchemy import func
+from flask.cli import with_appcontext
+
+from app import db
+from app.models import Student, Attendance, Report
+from app.model_registry import MODEL_NAME, MATCH_THRESHOLD
+from app.embedding_index import get_index
+from app.projection import DEFAULT_DIM, DEFAULT_METHOD, METHODS, calibrate_threshold, fit_projection, get_projection_store
+from app.recognition import load_and_verify_all_embeddings
+from app.embedding_codec import DTYPE_CODES, DTYPE_NAMES, STORAGE_DTYPE, decode_embedding, encode_embedding, is_legacy_pickle, read_header
+from app.attendance_writer import recover_journals
+from app.aggregates import rebuild_reports, refresh_daily_rollups
+from app.bulk_enroll import ENROLL_WORKERS, PROGRESS_EVERY, read_roster, enroll_students
+
+
+# --- flask migrate-embeddings ---
+@click.command("migrate-embeddings")
+@click.option("--model-name", default=MODEL_NAME, show_default=True, help="Model that produced the legacy vectors.")
+@click.option("--dtype", type=click.Choice(sorted(DTYPE_NAMES)), default=STORAGE_DTYPE, show_default=True)
+@click.option("--batch-size", default=500, show_default=True)
+@click.option("--recode", is_flag=True, help="Also re-encode rows already stored in another dtype (e.g. float32 -> int8).")
+@with_appcontext
+def migrate_embeddings_command(model_name, dtype, batch_size, recode):
+    """
+    Converts pickled Student.face_embedding rows to the versioned binary format.
+    With --recode, rows stored in another dtype are re-encoded as --dtype too.
+    """
+    student_ids = [row.id for row in db.session.query(Student.id).filter(Student.face_embedding.isnot(None))]
+    converted, failed = 0, 0
+
+    for start in range(0, len(student_ids), batch_size):
+        batch_ids = student_ids[start:start + batch_size]
+        rows = db.session.query(Student.id, Student.face_embedding).filter(Student.id.in_(batch_ids)).all()
+
+        updates = []
+        for row in rows:
+            try:
+                if is_legacy_pickle(row.face_embedding):
+                    # The only place pickle is still read: trusted rows written by the old capture_embedding.
+                    embedding = pickle.loads(row.face_embedding)
+                    updates.append({"id": row.id, "face_embedding": encode_embedding(embedding, model_name, dtype)})
+                elif recode:
+                    header = read_header(row.face_embedding)
+                    if header.dtype != DTYPE_CODES[DTYPE_NAMES[dtype]]:
+                        embedding = decode_embedding(row.face_embedding)
+                        updates.append({"id": row.id, "face_embedding": encode_embedding(embedding, header.model_name, dtype)})
+            except Exception as e:
+                failed += 1
+                print(f"[ERROR] Could not convert embedding for student {row.id}: {e}")
+
+        if updates:
+            db.session.bulk_update_mappings(Student, updates)
+            db.session.commit()
+            converted += len(updates)
+
+    if converted:
+        get_index().invalidate()   # rebuilt from the re-encoded rows at the next session start
+    print(f"[INFO] Converted {converted} embeddings ({failed} failed, {len(student_ids) - converted - failed} already current).")
+
+
+# --- flask replay-attendance-journal ---
+@click.command("replay-attendance-journal")
+@with_appcontext
+def replay_attendance_journal_command():
+    """Writes attendance events left in the journal by a session that did not shut down cleanly."""
+    replayed = recover_journals(db, Attendance)
+    print(f"[INFO] Replayed {replayed} attendance events.")
+
+
+# --- flask migrate-attendance ---
+@click.command("migrate-attendance")
+@with_appcontext
+def migrate_attendance_command():
+    """Backfills Attendance.date from time_in and creates the attendance/report indexes on an existing database."""
+    filled = db.session.query(Attendance).filter(
+        Attendance.date.is_(None), Attendance.time_in.isnot(None)
+    ).update({Attendance.date: func.date(Attendance.time_in)}, synchronize_session=False)
+    db.session.commit()
+    print(f"[INFO] Filled in the date of {filled} attendance rows.")
+
+    for index in [*Attendance.__table__.indexes, *Report.__table__.indexes]:
+        # CREATE INDEX IF NOT EXISTS: safe to run again
+        index.create(bind=db.engine, checkfirst=True)
+        print(f"[INFO] Index {index.name} ready.")
+
+
+# --- flask rebuild-reports ---
+@click.command("rebuild-reports")
+@with_appcontext
+def rebuild_reports_command():
+    """Recomputes every student's Report row from the full attendance table."""
+    count = rebuild_reports(db)
+    print(f"[INFO] Rebuilt {count} student reports.")
+
+
+# --- flask backfill-rollups ---
+@click.command("backfill-rollups")
+@click.option("--since", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="First day to recompute (default: all history).")
+@click.option("--until", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="Last day to recompute (default: today).")
+@with_appcontext
+def backfill_rollups_command(since, until):
+    """Recomputes the daily (date, subject, status) attendance rollups from the attendance table."""
+    count = refresh_daily_rollups(db, since=since.date() if since else None, until=until.date() if until else None)
+    print(f"[INFO] Wrote {count} daily rollup rows.")
+
+
+# --- flask fit-projection ---
+@click.command("fit-projection")
+@click.option("--method", type=click.Choice(METHODS), default=DEFAULT_METHOD, show_default=True)
+@click.option("--dim", default=DEFAULT_DIM, show_default=True, help="Dimensions embeddings are matched in.")
+@click.option("--threshold", type=float, default=None,
+              help="Match threshold in the projected space (default: calibrated on the enrolled samples).")
+@click.option("--remove", is_flag=True, help="Delete every projection artifact and match full embeddings again.")
+@with_appcontext
+def fit_projection_command(method, dim, threshold, remove):
+    """
+    Fits the dimensionality-reduction projection on the enrolled gallery, calibrates the
+    match threshold that keeps MATCH_THRESHOLD's false accept rate in it, and publishes
+    it as the next artifact revision; recognition sessions started afterwards match with it.
+    """
+    store = get_projection_store()
+    if remove:
+        store.clear()
+        print("[INFO] Projection removed; sessions will match full embeddings.")
+        return
+
+    embeddings, _ = load_and_verify_all_embeddings(Student)
+    if not len(embeddings):
+        raise click.ClickException("No enrolled face embeddings to fit on.")
+    start = time.monotonic()
+    try:
+        projection = fit_projection(embeddings, method, dim, MODEL_NAME)
+        if threshold is None:
+            samples, metadata = load_and_verify_all_embeddings(Student, mode="multi")
+            calibrate_threshold(projection, samples, [info['id'] for info in metadata], MATCH_THRESHOLD)
+        else:
+            projection.threshold, projection.source_threshold = threshold, MATCH_THRESHOLD
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    path = store.publish(projection)
+    print(f"[INFO] Fitted {projection.describe()} in {time.monotonic() - start:.1f}s -> {path}")
+
+
+# --- flask bulk-enroll ---
+@click.command("bulk-enroll")
+@click.argument("roster", type=click.File("r", encoding="utf-8-sig"))
+@click.argument("photo_dir", type=click.Path(exists=True, file_okay=False))
+@click.option("--workers", default=ENROLL_WORKERS, show_default=True, help="Embedding processes (0 = run in this process).")
+@click.option("--approved/--pending", default=True, show_default=True, help="Approve the imported students' logins.")
+@click.option("--errors-csv", type=click.Path(dir_okay=False, writable=True), default=None, help="Also write the per-row errors to this CSV.")
+@with_appcontext
+def bulk_enroll_command(roster, photo_dir, workers, approved, errors_csv):
+    """
+    Creates students from a CSV roster (name,email,roll_no,contact,password[,subject_id][,photo])
+    and enrolls their faces from PHOTO_DIR (<roll_no>.jpg and <roll_no>_<n>.jpg unless the photo
+    column names the files).
+    """
+    try:
+        rows, errors = read_roster(roster)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    print(f"[INFO] {len(rows)} students in roster ({len(errors)} invalid rows), {workers} embedding workers.")
+
+    start = time.monotonic()
+
+    def progress(done, total, failed):
+        if done and (done % PROGRESS_EVERY == 0 or done == total):
+            rate = done / max(time.monotonic() - start, 1e-9)
+            print(f"[INFO] {done}/{total} students processed ({failed} problems so far, {rate:.1f} students/s)")
+
+    roster_size = len(rows) + len(errors)
+    result = enroll_students(rows, photo_dir, workers=workers, approved=approved, progress=progress)
+    errors = sorted(errors + result["errors"], key=lambda error: error["line"])
+    for error in errors:
+        print(f"[ERROR] line {error['line']} ({error['roll_no'] or 'no roll no'}): {error['error']}"
+              + (f" [{error['file']}]" if error.get("file") else ""))
+    if errors_csv and errors:
+        with open(errors_csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["line", "roll_no", "file", "error"])
+            writer.writeheader()
+            writer.writerows(errors)
+    print(f"[INFO] Enrolled {result['enrolled']} of {roster_size} students in {result['seconds']}s ({len(errors)} rows need attention).")
+
+
+def register_commands(app):
+    app.cli.add_command(migrate_embeddings_command)
+    app.cli.add_command(replay_attendance_journal_command)
+    app.cli.add_command(migrate_attendance_command)
+    app.cli.add_command(rebuild_reports_command)
+    app.cli.add_command(backfill_rollups_command)
+    app.cli.add_command(bulk_enroll_command)
+    app.cli.add_command(fit_projection_command)
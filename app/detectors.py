@@ -0,0 +1,171 @@
+import os
+import threading
+
+import cv2
+
+
+# --- CONFIGURATION ---
+# Local model files (nothing is downloaded at runtime); override with FACE_MODEL_DIR.
+MODEL_DIR = os.environ.get("FACE_MODEL_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "models"))
+HAAR_CASCADE = "haarcascade_frontalface_default.xml"   # shipped with opencv-python (cv2.data)
+YUNET_MODEL = "face_detection_yunet_2023mar.onnx"       # from the OpenCV model zoo, placed in MODEL_DIR
+MIN_FACE_PX = 40               # smallest face looked for, in full-resolution pixels
+HAAR_SCALE_FACTOR = 1.1
+HAAR_MIN_NEIGHBORS = 5
+YUNET_SCORE_THRESHOLD = 0.7
+YUNET_NMS_THRESHOLD = 0.3
+YUNET_TOP_K = 500
+
+
+# --- BASE ---
+class FaceDetector:
+    """
+    Finds faces in a BGR frame. detect() returns DeepFace.extract_faces-style dicts,
+    {'facial_area': {'x', 'y', 'w', 'h'}, 'confidence'}, in full-resolution pixels,
+    so the pipeline and enrollment code work with any backend.
+    With scale < 1 the backend runs on a frame downscaled by that factor (detection cost
+    falls roughly with the pixel count) and the boxes are mapped back; the crops that
+    get embedded are still cut from the full-resolution frame.
+    Backends keep their OpenCV objects per thread, so one detector can be shared by the
+    pipeline's workers.
+    """
+
+    name = None
+
+    def __init__(self, scale=1.0):
+        if not 0 < scale <= 1:
+            raise ValueError(f"detection scale must be in (0, 1], got {scale}")
+        self.scale = scale
+        self._local = threading.local()
+
+    def _model(self):
+        model = getattr(self._local, "model", None)
+        if model is None:
+            model = self._local.model = self._load()
+        return model
+
+    def _load(self):
+        return None
+
+    def _detect(self, image):
+        """[(x, y, w, h, confidence or None)] in `image` coordinates."""
+        raise NotImplementedError
+
+    def detect(self, frame):
+        height, width = frame.shape[:2]
+        image = frame
+        if self.scale < 1:
+            image = cv2.resize(frame, (max(1, round(width * self.scale)), max(1, round(height * self.scale))),
+                               interpolation=cv2.INTER_AREA)
+        faces = []
+        for x, y, w, h, confidence in self._detect(image):
+            x0 = min(max(0, int(round(x / self.scale))), width)
+            y0 = min(max(0, int(round(y / self.scale))), height)
+            x1 = min(max(0, int(round((x + w) / self.scale))), width)
+            y1 = min(max(0, int(round((y + h) / self.scale))), height)
+            if x1 > x0 and y1 > y0:
+                faces.append({'facial_area': {'x': x0, 'y': y0, 'w': x1 - x0, 'h': y1 - y0}, 'confidence': confidence})
+        return faces
+
+    def warm_up(self):
+        self._model()
+
+
+# --- BACKENDS ---
+class HaarDetector(FaceDetector):
+    """OpenCV Haar cascade on the grey frame: no model download, fastest on CPU, frontal faces only."""
+
+    name = "haar"
+
+    def _load(self):
+        if not hasattr(cv2, "CascadeClassifier"):
+            raise RuntimeError("this OpenCV build has no Haar cascades (removed in OpenCV 5); use yunet or opencv<5")
+        path = os.path.join(MODEL_DIR, HAAR_CASCADE)
+        if not os.path.exists(path):
+            path = os.path.join(cv2.data.haarcascades, HAAR_CASCADE)
+        cascade = cv2.CascadeClassifier(path)
+        if cascade.empty():
+            raise FileNotFoundError(f"Haar cascade {HAAR_CASCADE} not found in {MODEL_DIR} or cv2.data")
+        return cascade
+
+    def _detect(self, image):
+        grey = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        min_side = max(8, int(MIN_FACE_PX * self.scale))
+        boxes = self._model().detectMultiScale(
+            grey, scaleFactor=HAAR_SCALE_FACTOR, minNeighbors=HAAR_MIN_NEIGHBORS, minSize=(min_side, min_side)
+        )
+        return [(x, y, w, h, None) for x, y, w, h in boxes]
+
+
+class YuNetDetector(FaceDetector):
+    """OpenCV DNN face detector (YuNet ONNX model from MODEL_DIR): more robust to pose and light than Haar."""
+
+    name = "yunet"
+
+    def _load(self):
+        path = os.path.join(MODEL_DIR, YUNET_MODEL)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"YuNet model {YUNET_MODEL} not found in {MODEL_DIR} (set FACE_MODEL_DIR)")
+        return cv2.FaceDetectorYN.create(path, "", (320, 320), YUNET_SCORE_THRESHOLD, YUNET_NMS_THRESHOLD, YUNET_TOP_K)
+
+    def _detect(self, image):
+        model = self._model()
+        model.setInputSize((image.shape[1], image.shape[0]))
+        _, faces = model.detect(image)
+        if faces is None:
+            return []
+        found = []
+        for face in faces:
+            # Each row: box (4), five landmarks (10), score
+            x, y, w, h = face[:4]
+            if min(w, h) >= MIN_FACE_PX * self.scale:
+                found.append((x, y, w, h, float(face[14])))
+        return found
+
+
+class SkipDetector(FaceDetector):
+    """No detection: the whole frame is the face (input that is already cropped, e.g. an ID photo pipeline)."""
+
+    name = "skip"
+
+    def detect(self, frame):
+        height, width = frame.shape[:2]
+        return [{'facial_area': {'x': 0, 'y': 0, 'w': width, 'h': height}, 'confidence': None}]
+
+
+class DeepFaceDetector(FaceDetector):
+    """Any DeepFace detector backend ("opencv", "ssd", "mtcnn", "retinaface", ...) through extract_faces."""
+
+    def __init__(self, backend, scale=1.0):
+        super().__init__(scale)
+        self.name = backend
+
+    def _load(self):
+        from app.model_registry import get_deepface
+        return get_deepface()
+
+    def _detect(self, image):
+        faces = self._model().extract_faces(img_path=image, detector_backend=self.name, enforce_detection=False)
+        height, width = image.shape[:2]
+        found = []
+        for face in faces:
+            area = face['facial_area']
+            # With enforce_detection=False DeepFace returns the whole image when it finds no face
+            if not face.get('confidence') and (area['w'], area['h']) == (width, height):
+                continue
+            found.append((area['x'], area['y'], area['w'], area['h'], face.get('confidence')))
+        return found
+
+
+BACKENDS = {backend.name: backend for backend in (HaarDetector, YuNetDetector, SkipDetector)}
+
+
+# --- FACTORY ---
+def build_detector(name, scale=1.0):
+    """
+    Detector for `name`: one of BACKENDS, otherwise the DeepFace detector backend of
+    that name. Model files are loaded on first use in each thread.
+    """
+    if name in BACKENDS:
+        return BACKENDS[name](scale)
+    return DeepFaceDetector(name, scale)
@@ -0,0 +1,140 @@
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+from app.quantization import dequantize_int8, quantize_int8
+
+
+# --- FORMAT ---
+# Every Student.face_embedding BLOB is a fixed 44-byte header followed by the raw vector(s):
+#
+#   magic    4s   b"FEMB"
+#   version  u8   FORMAT_VERSION
+#   dtype    u8   code from DTYPE_CODES
+#   count    u16  number of vectors stored back to back (1 for a single template)
+#   dim      u32  length of each vector
+#   model    32s  model name, utf-8, NUL padded
+#
+# The payload is count * dim little-endian values, so it can be viewed with np.frombuffer
+# without copying. int8 rows are scalar-quantized instead: count float32 scales come
+# first, then the count * dim codes (vector i ~= codes[i] * scales[i], see app.quantization).
+# Nothing in this format is ever unpickled.
+MAGIC = b"FEMB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBBHI32s")
+HEADER_SIZE = HEADER.size
+
+DTYPE_CODES = {1: np.dtype("<f4"), 2: np.dtype("<f2"), 3: np.dtype("i1")}
+DTYPE_NAMES = {"float32": 1, "float16": 2, "int8": 3}
+SCALE_DTYPE = np.dtype("<f4")
+
+# Storage precision used for new enrollments: 16 KB per 4096-d vector as float32,
+# 8 KB as float16, 4 KB as int8 (cosine scores move by ~1e-3, see bench_quantization).
+STORAGE_DTYPE = "float32"
+
+EmbeddingHeader = namedtuple("EmbeddingHeader", ["version", "dtype", "count", "dim", "model_name"])
+
+
+class EmbeddingFormatError(ValueError):
+    """Raised when a BLOB is not in the versioned embedding format."""
+
+
+# --- ENCODE ---
+def encode_embedding(embedding, model_name, dtype=STORAGE_DTYPE):
+    """Serializes a (D,) or (count, D) array into the versioned binary format."""
+    if dtype not in DTYPE_NAMES:
+        raise EmbeddingFormatError(f"unsupported storage dtype '{dtype}'")
+    code = DTYPE_NAMES[dtype]
+
+    vectors = np.asarray(embedding, dtype=np.float32)
+    vectors = vectors.reshape(1, -1) if vectors.ndim == 1 else vectors.reshape(vectors.shape[0], -1)
+
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, code, vectors.shape[0], vectors.shape[1],
+        model_name.encode("utf-8")[:32],
+    )
+    if DTYPE_CODES[code].kind == "i":
+        codes, scales = quantize_int8(vectors)
+        return header + scales.astype(SCALE_DTYPE).tobytes() + codes.tobytes()
+    return header + vectors.astype(DTYPE_CODES[code]).tobytes()
+
+
+# --- DECODE ---
+def is_legacy_pickle(blob):
+    """Old rows were written with pickle.dumps, which always starts with the PROTO opcode."""
+    return blob is not None and bytes(blob[:1]) == b"\x80"
+
+
+def read_header(blob):
+    if blob is None or len(blob) < HEADER_SIZE:
+        raise EmbeddingFormatError("embedding blob is empty or truncated")
+
+    magic, version, code, count, dim, model = HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        if is_legacy_pickle(blob):
+            raise EmbeddingFormatError("legacy pickle embedding; run 'flask migrate-embeddings'")
+        raise EmbeddingFormatError("unknown embedding format")
+    if version != FORMAT_VERSION:
+        raise EmbeddingFormatError(f"unsupported embedding format version {version}")
+    if code not in DTYPE_CODES:
+        raise EmbeddingFormatError(f"unknown dtype code {code}")
+
+    header = EmbeddingHeader(version, DTYPE_CODES[code], count, dim, model.rstrip(b"\0").decode("utf-8"))
+    if len(blob) != HEADER_SIZE + _scales_size(header) + count * dim * header.dtype.itemsize:
+        raise EmbeddingFormatError("embedding payload size does not match its header")
+    return header
+
+
+def _scales_size(header):
+    return header.count * SCALE_DTYPE.itemsize if header.dtype.kind == "i" else 0
+
+
+def _read_vectors(blob, header, count):
+    """The first `count` stored vectors as a (count, dim) array; int8 rows are dequantized to float32."""
+    offset = HEADER_SIZE + _scales_size(header)
+    vectors = np.frombuffer(blob, dtype=header.dtype, count=count * header.dim, offset=offset).reshape(count, header.dim)
+    if header.dtype.kind == "i":
+        scales = np.frombuffer(blob, dtype=SCALE_DTYPE, count=count, offset=HEADER_SIZE)
+        return dequantize_int8(vectors, scales)
+    return vectors
+
+
+def decode_embedding(blob):
+    """
+    The stored vectors: shape (D,) for a single template, (count, D) otherwise.
+    float32 and float16 rows are a zero-copy view in the storage dtype; int8 rows are
+    dequantized into a float32 copy.
+    """
+    header = read_header(blob)
+    vectors = _read_vectors(blob, header, header.count)
+    return vectors[0] if header.count == 1 else vectors
+
+
+def decode_many(blobs):
+    """
+    Decodes every stored vector of the BLOBs into one matrix in a single pass.
+    Returns (matrix, counts): matrix is (sum(counts), D) float32 holding each BLOB's
+    vectors in order, and counts[i] is how many rows BLOB i contributed (its template's
+    sample count), 0 when it could not be decoded or has a minority dimension.
+    """
+    headers = []
+    for blob in blobs:
+        try:
+            headers.append(read_header(blob))
+        except EmbeddingFormatError:
+            headers.append(None)
+
+    dims = [h.dim for h in headers if h is not None]
+    dim = max(set(dims), key=dims.count) if dims else 0
+
+    counts = np.array([h.count if h is not None and h.dim == dim else 0 for h in headers], dtype=np.int64)
+    matrix = np.empty((int(counts.sum()), dim), dtype=np.float32)
+
+    row = 0
+    for blob, header, count in zip(blobs, headers, counts):
+        if count:
+            matrix[row:row + count] = _read_vectors(blob, header, count)
+            row += count
+
+    return matrix, counts
@@ -0,0 +1,229 @@
+import json
+import os
+import threading
+
+import numpy as np
+from flask import current_app
+
+from app import face_templates
+from app.matcher import l2_normalize
+from app.embedding_codec import decode_embedding
+
+
+# --- CONFIGURATION ---
+INDEX_DIRNAME = "embedding_index"     # created inside the Flask instance folder
+DATA_FILENAME = "embeddings.f32"      # raw little-endian float32 rows, already L2-normalized
+META_FILENAME = "embeddings.json"     # sidecar: dim + one {id, name, roll_no} entry per row
+INDEX_VERSION = 2                     # 2: a student may own several rows (face_templates "multi" mode)
+COMPACT_MIN_TOMBSTONES = 64           # deleted rows tolerated before the data file is rewritten
+
+_LOCK = threading.Lock()
+
+
+# --- ON-DISK INDEX ---
+class EmbeddingIndex:
+    """
+    Memory-mapped gallery of enrolled faces that lives next to the database.
+    Row i of the data file belongs to entry i of the sidecar, so opening the index
+    is an mmap plus one small JSON read instead of decoding every Student BLOB.
+    A student owns one row per gallery vector of their template (one in "centroid"
+    mode). New students are appended and re-enrolled students are overwritten in place.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.data_path = os.path.join(directory, DATA_FILENAME)
+        self.meta_path = os.path.join(directory, META_FILENAME)
+
+    # --- sidecar helpers ---
+    def _read_meta(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != INDEX_VERSION or meta.get("template_mode") != face_templates.TEMPLATE_MODE:
+            return None
+        return meta
+
+    def _write_meta(self, meta):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _row_bytes(self, meta):
+        return meta["dim"] * np.dtype(np.float32).itemsize
+
+    def is_valid(self):
+        """True when the sidecar exists and agrees with the size of the data file."""
+        meta = self._read_meta()
+        if meta is None or not os.path.exists(self.data_path):
+            return False
+        return os.path.getsize(self.data_path) == len(meta["rows"]) * self._row_bytes(meta)
+
+    def invalidate(self):
+        """Drops the sidecar so the next session start rebuilds from the database."""
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+
+    # --- full rebuild ---
+    def rebuild(self, embeddings, metadata):
+        with _LOCK:
+            os.makedirs(self.directory, exist_ok=True)
+            self.invalidate()
+
+            if len(metadata):
+                gallery = l2_normalize(embeddings)
+                dim = gallery.shape[1]
+            else:
+                gallery = np.zeros((0, 0), dtype=np.float32)
+                dim = 0
+
+            tmp_path = self.data_path + ".tmp"
+            gallery.astype("<f4").tofile(tmp_path)
+            os.replace(tmp_path, self.data_path)
+
+            self._write_meta({
+                "version": INDEX_VERSION, "template_mode": face_templates.TEMPLATE_MODE,
+                "dim": dim, "rows": list(metadata),
+            })
+
+    # --- read path ---
+    def load(self):
+        """
+        Returns (gallery, metadata) where gallery is a read-only (N, D) float32 memmap.
+        Deleted rows are all-zero (cosine distance 1.0) and have None metadata.
+        Raises ValueError if the index is missing or inconsistent.
+        """
+        if not self.is_valid():
+            raise ValueError(f"embedding index at {self.directory} is missing or stale")
+
+        meta = self._read_meta()
+        rows = meta["rows"]
+        if not rows:
+            return np.zeros((0, meta["dim"]), dtype=np.float32), []
+
+        gallery = np.memmap(self.data_path, dtype="<f4", mode="r", shape=(len(rows), meta["dim"]))
+        return gallery, rows
+
+    # --- incremental updates ---
+    def upsert(self, info, vectors):
+        """
+        Replaces info['id']'s rows with `vectors` ((D,) or (n, D) gallery vectors).
+        Existing rows are overwritten in place, surplus ones become tombstones and
+        extra vectors are appended. Returns False if the index needs a rebuild.
+        """
+        with _LOCK:
+            if not self.is_valid():
+                return False
+
+            meta = self._read_meta()
+            vectors = l2_normalize(vectors).astype("<f4")
+
+            if meta["rows"] and vectors.shape[1] != meta["dim"]:
+                # A different model produced this vector; the whole index must be rebuilt.
+                self.invalidate()
+                return False
+            meta["dim"] = vectors.shape[1]
+            row_bytes = self._row_bytes(meta)
+
+            owned = [i for i, row in enumerate(meta["rows"]) if row and row["id"] == info["id"]]
+            appended = max(0, len(vectors) - len(owned))
+            positions = owned[:len(vectors)] + list(range(len(meta["rows"]), len(meta["rows"]) + appended))
+            surplus = owned[len(vectors):]
+            meta["rows"].extend([info] * appended)
+
+            with open(self.data_path, "r+b") as f:
+                for position, vector in zip(positions, vectors):
+                    f.seek(position * row_bytes)
+                    f.write(vector.tobytes())
+                    meta["rows"][position] = info
+                for position in surplus:
+                    f.seek(position * row_bytes)
+                    f.write(bytes(row_bytes))
+                    meta["rows"][position] = None
+
+            self._write_meta(meta)
+            return True
+
+    def remove(self, student_id):
+        """
+        Deletes a student's row. The row is zeroed in place and its sidecar entry becomes
+        None (a tombstone), so sessions that already mmapped the file simply stop matching
+        that student. Tombstones are compacted away once they pile up.
+        """
+        with _LOCK:
+            if not self.is_valid():
+                return False
+
+            meta = self._read_meta()
+            ids = [row["id"] if row else None for row in meta["rows"]]
+            positions = [i for i, row_id in enumerate(ids) if row_id == student_id]
+            if not positions:
+                return True
+
+            with open(self.data_path, "r+b") as f:
+                for position in positions:
+                    f.seek(position * self._row_bytes(meta))
+                    f.write(bytes(self._row_bytes(meta)))
+                    meta["rows"][position] = None
+
+            tombstones = ids.count(None) + len(positions)
+            if tombstones > max(COMPACT_MIN_TOMBSTONES, len(ids) // 4):
+                self._compact(meta)
+            else:
+                self._write_meta(meta)
+            return True
+
+    def _compact(self, meta):
+        # Written to a new file and swapped in, so open memmaps keep reading the old inode.
+        keep = [i for i, row in enumerate(meta["rows"]) if row]
+        gallery = np.fromfile(self.data_path, dtype="<f4").reshape(len(meta["rows"]), meta["dim"])
+
+        tmp_path = self.data_path + ".tmp"
+        gallery[keep].tofile(tmp_path)
+        self.invalidate()
+        os.replace(tmp_path, self.data_path)
+
+        meta["rows"] = [meta["rows"][i] for i in keep]
+        self._write_meta(meta)
+
+
+# --- FLASK HELPERS ---
+def get_index():
+    """Index for the running app, stored under <instance>/embedding_index."""
+    return EmbeddingIndex(os.path.join(current_app.instance_path, INDEX_DIRNAME))
+
+
+def student_info(student):
+    return {"id": student.id, "name": student.name, "roll_no": student.roll_no}
+
+
+def sync_student(student):
+    """
+    Mirrors one student's current face embedding into the index.
+    The database stays the source of truth: any failure just invalidates the index.
+    """
+    index = get_index()
+    try:
+        if student.face_embedding is None:
+            if not index.remove(student.id):
+                index.invalidate()
+            return
+        vectors = face_templates.gallery_vectors(decode_embedding(student.face_embedding))
+        if not index.upsert(student_info(student), vectors):
+            index.invalidate()
+    except Exception as e:
+        print(f"[WARN] Embedding index update failed for student {student.id}: {e}")
+        index.invalidate()
+
+
+def remove_student(student_id):
+    index = get_index()
+    try:
+        if not index.remove(student_id):
+            index.invalidate()
+    except Exception as e:
+        print(f"[WARN] Embedding index delete failed for student {student_id}: {e}")
+        index.invalidate()
@@ -0,0 +1,168 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+
+# --- CONFIGURATION ---
+MAX_BATCH_SIZE = 32       # faces per inference call
+MAX_BATCH_DELAY_MS = 10   # how long the first queued face may wait for the batch to fill
+
+
+# --- PREPROCESSING ---
+def preprocess_face(face_crop, target_size):
+    """
+    Same steps DeepFace.represent(..., detector_backend='skip') applies to a crop:
+    BGR -> RGB, letterbox-resize to the model input, scale to [0, 1].
+    Returns a float32 (H, W, 3) array.
+    """
+    target_h, target_w = target_size
+    img = face_crop[:, :, ::-1]
+
+    factor = min(target_h / img.shape[0], target_w / img.shape[1])
+    img = cv2.resize(img, (int(img.shape[1] * factor), int(img.shape[0] * factor)))
+
+    diff_h, diff_w = target_h - img.shape[0], target_w - img.shape[1]
+    img = np.pad(img, ((diff_h // 2, diff_h - diff_h // 2), (diff_w // 2, diff_w - diff_w // 2), (0, 0)))
+    if img.shape[:2] != (target_h, target_w):
+        img = cv2.resize(img, (target_w, target_h))
+
+    img = img.astype(np.float32)
+    if img.max() > 1:
+        img /= 255.0
+    return img
+
+
+def make_deepface_batch_infer(model_client):
+    """
+    Wraps a DeepFace FacialRecognition client so a whole (B, H, W, 3) batch goes through
+    the underlying Keras model in one call. Models without a Keras graph fall back to
+    one forward() per face.
+    """
+    keras_model = getattr(model_client, "model", None)
+
+    def infer(batch):
+        if callable(keras_model) and hasattr(keras_model, "predict"):
+            output = keras_model(batch, training=False)
+            return np.asarray(output.numpy() if hasattr(output, "numpy") else output, dtype=np.float32)
+        return np.array([model_client.forward(img[None, ...]) for img in batch], dtype=np.float32)
+
+    return infer
+
+
+def model_target_size(model_client):
+    # DeepFace stores input_shape as (width, height); resize_image is given it reversed.
+    width, height = model_client.input_shape
+    return height, width
+
+
+# --- BATCHING SERVICE ---
+class BatchEmbeddingService:
+    """
+    Collects face crops from any number of callers (pipeline workers, several frames)
+    and runs them through the model in batches of up to `max_batch_size`. A batch is
+    dispatched when it is full or when its oldest face has waited `max_delay_ms`.
+    """
+
+    def __init__(self, infer_batch, target_size, max_batch_size=MAX_BATCH_SIZE, max_delay_ms=MAX_BATCH_DELAY_MS):
+        self.infer_batch = infer_batch
+        self.target_size = target_size
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000.0
+
+        self._requests = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.faces = 0
+        self.inference_seconds = 0.0
+
+    @classmethod
+    def for_deepface(cls, model_client, **options):
+        return cls(make_deepface_batch_infer(model_client), model_target_size(model_client), **options)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._requests.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def embed(self, face_crops):
+        """Blocking call: returns an (n, D) float32 array, one row per crop."""
+        if not face_crops:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        if self._thread is None:
+            # Not started: run inline, still one call per max_batch_size faces.
+            rows = [preprocess_face(crop, self.target_size) for crop in face_crops]
+            return np.concatenate([
+                self._infer(np.stack(rows[i:i + self.max_batch_size]))
+                for i in range(0, len(rows), self.max_batch_size)
+            ])
+
+        futures = []
+        for crop in face_crops:
+            future = Future()
+            self._requests.put((preprocess_face(crop, self.target_size), future))
+            futures.append(future)
+        return np.stack([future.result() for future in futures])
+
+    def _infer(self, batch):
+        start = time.monotonic()
+        embeddings = self.infer_batch(batch)
+        with self._lock:
+            self.batches += 1
+            self.faces += len(batch)
+            self.inference_seconds += time.monotonic() - start
+        return embeddings
+
+    def _run(self):
+        while True:
+            first = self._requests.get()
+            if first is None:
+                return
+
+            pending = [first]
+            deadline = time.monotonic() + self.max_delay
+            stopping = False
+            while len(pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                pending.append(item)
+
+            try:
+                embeddings = self._infer(np.stack([img for img, _ in pending]))
+                for (_, future), embedding in zip(pending, embeddings):
+                    future.set_result(embedding)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+
+            if stopping:
+                return
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "faces": self.faces,
+                "avg_batch_size": round(self.faces / self.batches, 2) if self.batches else 0.0,
+                "faces_per_sec": round(self.faces / self.inference_seconds, 1) if self.inference_seconds else 0.0,
+            }
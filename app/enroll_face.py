@@ -1,91 +1,161 @@
+import time
+
 import cv2
-import pickle
 import numpy as np
-from deepface import DeepFace
 from app.models import Student
+from app.embedding_codec import encode_embedding, decode_embedding
+from app.embedding_service import BatchEmbeddingService
+from app.face_templates import TEMPLATE_MODE, TEMPLATE_SAMPLES, best_face, build_template, gallery_vectors
+from app.recognition import load_gallery
 
 
 # --- CONFIGURATION ---
-DETECTOR_BACKEND = "opencv" 
-MODEL_NAME = "VGG-Face, FaceNet"     
-THRESHOLD = 0.9
-        
+# Must match the recognition model and its match threshold, so all come from the model registry
+from app.model_registry import MODEL_NAME, MATCH_THRESHOLD, get_detector, get_recognition_model
+DUPLICATE_CANDIDATES = 3   # closest enrolled faces reported by a duplicate check
+BURST_SECONDS = 15         # longest a webcam enrollment waits for enough good frames
+BURST_INTERVAL_S = 0.3     # spacing between accepted frames, so samples differ in pose/expression
+BURST_CANDIDATES = 2 * TEMPLATE_SAMPLES   # frames embedded per burst; build_template keeps the best
+MIN_BURST_SAMPLES = 3      # fewer accepted frames than this and the capture fails
+
+
+
+def embed_template(face_crops):
+    """
+    (count, D) template from quality-checked face crops, embedded in one batch exactly
+    the way recognition embeds live crops (see BatchEmbeddingService).
+    """
+    embeddings = BatchEmbeddingService.for_deepface(get_recognition_model()).embed(face_crops)
+    return build_template(embeddings)
 
 
+def template_from_images(images, min_samples=1):
+    """
+    Template from a set of BGR images of one person (e.g. a folder of photos).
+    Returns (template or None, reasons): None when fewer than `min_samples` images have
+    a usable face, with the rejection reason of every image that was dropped. Photos
+    may show other people in the background, so the largest face of each is used.
+    """
+    detector = get_detector()
+    crops, reasons = [], []
+    for image in images:
+        detections = detector.detect(image)
+        crop, _, reason = best_face(image, detections, pick_largest=True)
+        if crop is None:
+            reasons.append(reason)
+        else:
+            crops.append(crop)
+    if len(crops) < min_samples:
+        return None, reasons
+    return embed_template(crops), reasons
 
-def capture_embedding():
-        
-    print("[INFO] Registering Student Face. Press 'c' to capture and 'q' to quit.")
-    cap = cv2.VideoCapture(0)
 
-    while True:
+def capture_embedding(source=0, max_seconds=BURST_SECONDS):
+    """
+    Enrolls from a short webcam burst instead of a single keypress frame: while the
+    student looks at the camera, frames are sampled every BURST_INTERVAL_S, frames with
+    no face, several faces, blur, bad exposure or a small face are rejected, and the
+    accepted crops are embedded together. Returns the encoded template BLOB (several
+    vectors, see face_templates) or None if the burst failed or 'q' was pressed.
+    """
+    detector = get_detector()
+    print("[INFO] Registering Student Face. Look at the camera and turn your head slightly. Press 'q' to quit.")
+    cap = cv2.VideoCapture(source)
+    crops = []
+    status = "Looking for a face..."
+    last_sample = 0.0
+    deadline = time.monotonic() + max_seconds
+
+    while len(crops) < BURST_CANDIDATES and time.monotonic() < deadline:
         ret, frame = cap.read()
-        if not ret: 
+        if not ret:
             break
 
-        cv2.putText(frame, "Press 'c' to Capture face", (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-        cv2.imshow("Face Registration", frame)
+        now = time.monotonic()
+        if now - last_sample >= BURST_INTERVAL_S:
+            detections = detector.detect(frame)
+            crop, _, reason = best_face(frame, detections)
+            if crop is None:
+                status = f"Frame rejected: {reason}"
+            else:
+                crops.append(crop.copy())
+                last_sample = now
+                status = f"Captured {len(crops)}/{BURST_CANDIDATES}"
 
-        key = cv2.waitKey(1)
-        if key == ord('q'):
+        cv2.putText(frame, status, (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+        cv2.imshow("Face Registration", frame)
+        if cv2.waitKey(1) == ord('q'):
+            crops = []
             break
-        
-        elif key == ord('c'):
-            try:
-                # Generate Embedding
-                results = DeepFace.represent(
-                    img_path=frame, 
-                    model_name=MODEL_NAME, 
-                    detector_backend=DETECTOR_BACKEND,
-                    enforce_detection=True
-                )
-                
-                if results:
-                    
-                    embedding_list = results[0]["embedding"]
-                    embedding_array = np.array(embedding_list, dtype=np.float32)
-                    
-                    embedding_blob = pickle.dumps(embedding_array)
-                    
-                   
-                    
-                    break
-                
-            except ValueError:
-                print("[ERROR] No face detected. Try again!")
-            except Exception as e:
-                print(f"[ERROR] {e}")
 
     cap.release()
-    cv2.destroyAllWindows()      
-    
-    return embedding_blob
+    cv2.destroyAllWindows()
+
+    if len(crops) < MIN_BURST_SAMPLES:
+        print(f"[ERROR] Only {len(crops)} usable frames captured. Try again with better light!")
+        return None
+    try:
+        return encode_embedding(embed_template(crops), MODEL_NAME)
+    except Exception as e:
+        print(f"[ERROR] {e}")
+        return None
+
+
+
+def find_duplicate_faces(embeddings, exclude_roll_nos=None, matcher=None,
+                         top_k=DUPLICATE_CANDIDATES, threshold=MATCH_THRESHOLD):
+    """
+    Searches the enrolled gallery for each embedding with the same backend and cosine
+    threshold recognition uses, so a face is a duplicate exactly when recognition could
+    mistake it for someone already enrolled.
+    Returns one list per embedding of up to `top_k` {'id', 'name', 'roll_no', 'distance'}
+    dicts, closest first. exclude_roll_nos[i] (a student re-enrolling) is skipped for row i.
+    """
+    if matcher is None:
+        matcher = load_gallery(Student)
+    threshold = matcher.match_threshold(threshold)
+    embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+    candidates = [[] for _ in range(len(embeddings))]
+    if matcher.size == 0 or not len(embeddings) or matcher.input_dim != embeddings.shape[1]:
+        return candidates
 
+    # In "multi" mode every student owns several rows, including the one re-enrolling,
+    # so search deep enough for top_k others; rows still short of top_k with every
+    # neighbour under the threshold are searched again with twice the depth.
+    rows_per_student = TEMPLATE_SAMPLES if TEMPLATE_MODE == "multi" else 1
+    k = min(matcher.size, (top_k + 1) * rows_per_student)
+    pending = list(range(len(embeddings)))
+    while pending:
+        indices, distances = matcher.match(embeddings[pending], k=k)
+        unfinished = []
+        for i, rows, row_distances in zip(pending, indices, distances):
+            candidates[i] = []
+            for row, distance in zip(rows, row_distances):
+                info = matcher.metadata[row]
+                if distance >= threshold or info is None or len(candidates[i]) == top_k:
+                    continue
+                if exclude_roll_nos and info['roll_no'] == exclude_roll_nos[i]:
+                    continue
+                if any(found['id'] == info['id'] for found in candidates[i]):
+                    continue   # the student's other template rows, or approximate backends' padding
+                candidates[i].append({
+                    'id': info['id'],
+                    'name': info['name'],
+                    'roll_no': info['roll_no'],
+                    'distance': round(max(float(distance), 0.0), 4),
+                })
+            if len(candidates[i]) < top_k and row_distances[-1] < threshold and k < matcher.size:
+                unfinished.append(i)
+        pending = unfinished
+        k = min(matcher.size, 2 * k)
+    return candidates
 
 
 def check_face_duplicate(new_embedding_blob, roll_no):
     """
-    Compares the new embedding against ALL students in the DB.
-    Returns the Name of the existing student if a match is found, else None.
+    Compares a newly captured template (its centroid) against every enrolled face
+    (except the student's own). Returns the closest matches under the threshold, best
+    first; an empty list means the face is new.
     """
-    new_embedding = pickle.loads(new_embedding_blob)
-    
-    existing_students = Student.query.filter(Student.face_embedding.isnot(None)).all()
-    
-    
-
-    for student in existing_students:
-        if student.roll_no == roll_no:
-            continue
-            
-        stored_embedding_blob = student.face_embedding
-        if stored_embedding_blob is None:
-            continue
-        
-        stored_embedding = pickle.loads(stored_embedding_blob)
-        distance = np.linalg.norm(new_embedding - stored_embedding)
-        
-        if distance < THRESHOLD:
-            return {student.name}
-                   
-    return None 
\ No newline at end of file
+    centroid = gallery_vectors(decode_embedding(new_embedding_blob), mode="centroid")
+    return find_duplicate_faces(centroid, exclude_roll_nos=[roll_no])[0]
@@ -0,0 +1,109 @@
+import cv2
+import numpy as np
+
+from app.matcher import l2_normalize
+
+
+# --- CONFIGURATION ---
+TEMPLATE_SAMPLES = 5          # embeddings kept per student (the enrollment BLOB's `count`)
+# How the samples enter the recognition gallery:
+#   "centroid" - one row per student, the normalized mean of the samples (same cost as one sample)
+#   "multi"    - one row per sample; a face matches the student's closest sample
+TEMPLATE_MODE = "centroid"
+OUTLIER_DISTANCE = 0.35       # samples this far (cosine) from the others' centroid are dropped
+
+# Frames rejected before they are embedded
+MIN_FACE_SIZE = 80            # px, shorter side of the detected box
+MIN_SHARPNESS = 60.0          # variance of the Laplacian of the grey face crop (blur check)
+BRIGHTNESS_RANGE = (40, 220)  # mean grey level of the face crop
+MIN_DETECTOR_CONFIDENCE = 0.9 # when the detector reports one
+
+
+# --- FRAME QUALITY ---
+def face_quality(face_crop, confidence=None):
+    """
+    Returns (sharpness, None) for a crop good enough to enroll, or (None, reason).
+    Cheap checks only: box size, exposure, blur and the detector's own confidence.
+    """
+    height, width = face_crop.shape[:2]
+    if min(height, width) < MIN_FACE_SIZE:
+        return None, "face too small"
+    if confidence is not None and confidence < MIN_DETECTOR_CONFIDENCE:
+        return None, "low detection confidence"
+
+    grey = cv2.cvtColor(face_crop, cv2.COLOR_BGR2GRAY) if face_crop.ndim == 3 else face_crop
+    brightness = float(grey.mean())
+    if not BRIGHTNESS_RANGE[0] <= brightness <= BRIGHTNESS_RANGE[1]:
+        return None, "too dark" if brightness < BRIGHTNESS_RANGE[0] else "overexposed"
+
+    sharpness = float(cv2.Laplacian(grey, cv2.CV_64F).var())
+    if sharpness < MIN_SHARPNESS:
+        return None, "blurred"
+    return sharpness, None
+
+
+def best_face(frame, detections, pick_largest=False):
+    """
+    (crop, sharpness, reason) for the enrollable face in one frame's detections (the
+    FaceDetector.detect output, see app.detectors). Frames with no face are rejected, and so are frames
+    with several faces unless `pick_largest` (then the largest face is checked).
+    """
+    faces = [face for face in detections if face.get('facial_area', {}).get('w', 0) > 0]
+    if not faces:
+        return None, None, "no face"
+    if len(faces) > 1 and not pick_largest:
+        return None, None, "several faces"
+
+    face = max(faces, key=lambda f: f['facial_area']['w'] * f['facial_area']['h'])
+    area = face['facial_area']
+    x, y, w, h = (max(0, int(area[k])) for k in ('x', 'y', 'w', 'h'))
+    crop = frame[y:y + h, x:x + w]
+    if crop.size == 0:
+        return None, None, "no face"
+    sharpness, reason = face_quality(crop, face.get('confidence'))
+    return (crop if reason is None else None), sharpness, reason
+
+
+# --- TEMPLATES ---
+def build_template(samples, max_samples=TEMPLATE_SAMPLES):
+    """
+    The vectors to store for one student, as a (count, D) float32 array: unit-length
+    samples minus outliers (a different person or a bad frame that passed the quality
+    checks), at most `max_samples`, closest to the centroid first.
+    """
+    samples = l2_normalize(samples)
+    if len(samples) > 2:
+        centroid = l2_normalize(samples.mean(axis=0))[0]
+        distances = 1.0 - samples @ centroid
+        order = np.argsort(distances)
+        keep = order[distances[order] <= OUTLIER_DISTANCE]
+        samples = samples[keep if len(keep) else order[:1]]
+    return samples[:max_samples]
+
+
+def gallery_vectors(stored, mode=None):
+    """
+    Gallery rows for one student's stored vectors ((D,) or (count, D)): the normalized
+    centroid in "centroid" mode, every normalized sample in "multi" mode.
+    """
+    samples = l2_normalize(stored)
+    if (mode or TEMPLATE_MODE) == "centroid" and len(samples) > 1:
+        return l2_normalize(samples.mean(axis=0))
+    return samples
+
+
+def gallery_rows(vectors, counts, mode=None):
+    """
+    gallery_vectors for many students at once, on decode_many's output: `vectors` holds
+    every student's stored samples back to back, counts[i] of them for student i.
+    Returns (rows, row_counts), row_counts[i] being the gallery rows of student i.
+    """
+    counts = np.asarray(counts)
+    if not len(vectors):
+        return np.zeros((0, np.shape(vectors)[-1]), dtype=np.float32), np.zeros_like(counts)
+    samples = l2_normalize(vectors)
+    if (mode or TEMPLATE_MODE) != "centroid":
+        return samples, counts
+    row_counts = np.minimum(counts, 1)
+    starts = np.cumsum(counts)[counts > 0] - counts[counts > 0]
+    return l2_normalize(np.add.reduceat(samples, starts, axis=0)), row_counts
@@ -0,0 +1,127 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+# --- FRAME SOURCES ---
+# Every source exposes the small part of the cv2.VideoCapture API the attendance code uses
+# (isOpened / read / release) plus `live`: True when frames arrive in real time and stale
+# ones should be dropped, False when every frame should be processed (files, benchmarks).
+
+class VideoCaptureSource:
+    """Camera index or video file, read through OpenCV."""
+
+    def __init__(self, target):
+        self.capture = cv2.VideoCapture(target)
+        self.live = isinstance(target, int)
+        self.name = f"camera:{target}" if self.live else str(target)
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def read(self):
+        return self.capture.read()
+
+    def release(self):
+        self.capture.release()
+
+
+class ImageDirectorySource:
+    """Plays the images of a directory in filename order, optionally paced to `fps`."""
+
+    def __init__(self, directory, fps=None, loop=False):
+        self.name = directory
+        self.paths = sorted(
+            os.path.join(directory, f) for f in os.listdir(directory)
+            if f.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.fps = fps
+        self.loop = loop
+        self.live = False
+        self._position = 0
+        self._last_read = None
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def read(self):
+        if self._position >= len(self.paths):
+            if not self.loop or not self.paths:
+                return False, None
+            self._position = 0
+
+        _pace(self)
+        frame = cv2.imread(self.paths[self._position])
+        self._position += 1
+        return frame is not None, frame
+
+    def release(self):
+        self._position = len(self.paths)
+        self.loop = False
+
+
+class SyntheticSource:
+    """
+    Generates `count` noise frames of the given size, optionally paced to `fps`.
+    Used to benchmark the pipeline without a camera or video file.
+    """
+
+    def __init__(self, width=640, height=480, count=300, fps=None, seed=0):
+        self.name = f"synthetic:{width}x{height}"
+        self.count = count
+        self.fps = fps
+        self.live = fps is not None
+        self._rng = np.random.default_rng(seed)
+        self._base = self._rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        self._position = 0
+        self._last_read = None
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        if self._position >= self.count:
+            return False, None
+        _pace(self)
+        self._position += 1
+        return True, np.roll(self._base, self._position, axis=1)
+
+    def release(self):
+        self._position = self.count
+
+
+def _pace(source):
+    if not source.fps:
+        return
+    now = time.monotonic()
+    if source._last_read is not None:
+        wait = 1.0 / source.fps - (now - source._last_read)
+        if wait > 0:
+            time.sleep(wait)
+    source._last_read = time.monotonic()
+
+
+def open_frame_source(source):
+    """
+    Accepts a camera index (int or digit string), a video file, a directory of images,
+    or "synthetic[:WIDTHxHEIGHT[:COUNT[:FPS]]]".
+    """
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return VideoCaptureSource(int(source))
+
+    if isinstance(source, str) and source.startswith("synthetic"):
+        parts = source.split(":")[1:]
+        width, height = (int(v) for v in parts[0].split("x")) if parts else (640, 480)
+        count = int(parts[1]) if len(parts) > 1 else 300
+        fps = float(parts[2]) if len(parts) > 2 else None
+        return SyntheticSource(width, height, count, fps)
+
+    if os.path.isdir(source):
+        return ImageDirectorySource(source)
+
+    return VideoCaptureSource(source)
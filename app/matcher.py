@@ -0,0 +1,121 @@
+import numpy as np
+
+
+# --- NORMALIZATION ---
+def l2_normalize(vectors):
+    """
+    Returns a contiguous float32 copy of `vectors` with every row scaled to unit length.
+    Zero rows stay zero, so they score a cosine distance of 1.0 (same as find_cosine_distance).
+    """
+    matrix = np.array(vectors, dtype=np.float32, copy=True, ndmin=2)
+    matrix = matrix.reshape(matrix.shape[0], -1)
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+
+    return np.ascontiguousarray(matrix)
+
+
+# --- GALLERY MATCHER ---
+class GalleryMatcher:
+    """
+    Keeps every enrolled embedding pre-normalized in one (N, D) float32 matrix so a whole
+    batch of live faces is scored with a single matrix product instead of a Python loop.
+    With a `projection` (see app.projection) the gallery and every live batch are matched
+    in the projected space; callers keep passing full embeddings.
+    """
+
+    def __init__(self, embeddings, metadata, projection=None, **options):
+        if len(embeddings) != len(metadata):
+            raise ValueError("embeddings and metadata must have the same length")
+
+        self.metadata = list(metadata)
+        self.projection = projection
+        if len(self.metadata):
+            self.gallery = l2_normalize(projection.transform(embeddings) if projection else embeddings)
+        else:
+            self.gallery = np.zeros((0, 0), dtype=np.float32)
+        self._build(**options)
+
+    @classmethod
+    def from_normalized(cls, gallery, metadata, projection=None, **options):
+        """
+        Wraps an already L2-normalized (N, D) matrix (e.g. the index memmap, or its
+        QuantizedRows) without copying it. With a projection, `gallery` must already
+        be projected and normalized.
+        """
+        matcher = cls.__new__(cls)
+        matcher.metadata = list(metadata)
+        matcher.projection = projection
+        matcher.gallery = gallery
+        matcher._build(**options)
+        return matcher
+
+    def _build(self, **options):
+        """
+        Hook for subclasses that precompute search structures over self.gallery.
+        Options meant for other backends (e.g. IVF's nprobe) are ignored, so one
+        SEARCH_OPTIONS dict works whichever backend is configured.
+        """
+
+    @property
+    def size(self):
+        return self.gallery.shape[0]
+
+    @property
+    def dim(self):
+        return self.gallery.shape[1]
+
+    @property
+    def input_dim(self):
+        """Length of the embeddings callers pass in (the model's, even when projected)."""
+        return self.projection.input_dim if self.projection is not None else self.dim
+
+    def match_threshold(self, threshold):
+        """
+        The cut-off on this matcher's distances for a full-space `threshold`: the
+        projection's calibrated threshold when `threshold` is the one it was calibrated
+        for, otherwise `threshold` as given.
+        """
+        if self.projection is not None and threshold == self.projection.source_threshold:
+            return self.projection.threshold
+        return threshold
+
+    def prepare(self, live_embeddings):
+        """Live embeddings as unit-length rows of the gallery's space."""
+        if self.projection is not None:
+            return l2_normalize(self.projection.transform(live_embeddings))
+        return l2_normalize(live_embeddings)
+
+    def distances(self, live_embeddings):
+        """Cosine distance matrix of shape (num_live, gallery_size)."""
+        live = self.prepare(live_embeddings)
+        if isinstance(self.gallery, np.ndarray):
+            return 1.0 - live @ self.gallery.T
+        # Quantized gallery (see app.quantization): it scores its own codes chunk by chunk
+        return 1.0 - (self.gallery @ live.T).T
+
+    def match(self, live_embeddings, k=1):
+        """
+        Scores a batch of live embeddings against the gallery.
+        Returns (indices, distances), both of shape (num_live, k), sorted best-first.
+        """
+        if self.size == 0:
+            raise ValueError("gallery is empty")
+
+        k = max(1, min(k, self.size))
+        if len(live_embeddings) == 0:
+            return np.zeros((0, k), dtype=np.int64), np.zeros((0, k), dtype=np.float32)
+
+        dist = self.distances(live_embeddings)
+
+        if k < self.size:
+            top = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(self.size), (dist.shape[0], 1))
+
+        top_dist = np.take_along_axis(dist, top, axis=1)
+        order = np.argsort(top_dist, axis=1)
+
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_dist, order, axis=1)
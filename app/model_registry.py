@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+
+# --- CONFIGURATION ---
+# Single source of truth for the face models used by enrollment and recognition.
+MODEL_NAME = "VGG-Face"
+# "haar" / "yunet" / "skip" (see app.detectors), or any DeepFace detector backend name.
+# "opencv" is DeepFace's Haar detector plus eye alignment; switching away from it changes
+# the crops, so re-enroll (or check recognition accuracy) after changing it.
+DETECTOR_BACKEND = "opencv"
+# Detection runs on the frame downscaled by this factor (boxes are mapped back and crops
+# cut at full resolution); 0.5 is ~4x less detection work on a 1080p classroom camera.
+DETECTION_SCALE = 1.0
+# Faces match when the cosine distance (1 - cosine similarity) of their L2-normalized
+# embeddings, as scored by the gallery search, is below this. Used both to recognize
+# students and to reject duplicate enrollments.
+MATCH_THRESHOLD = 0.50
+
+_lock = threading.Lock()
+_models = {}
+_metrics = {"load_seconds": {}, "warmup_seconds": None, "rss_mb_before": None, "rss_mb_after": None}
+
+
+def _rss_mb():
+    """Current resident set size of this process in MB (None if it cannot be read)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # peak, KB on Linux
+    except ImportError:
+        return None
+
+
+# --- ACCESSORS ---
+def get_deepface():
+    """The DeepFace module, imported once (importing it pulls in TensorFlow)."""
+    if "deepface" not in _models:
+        with _lock:
+            if "deepface" not in _models:
+                start = time.monotonic()
+                from deepface import DeepFace
+                _models["deepface"] = DeepFace
+                _metrics["load_seconds"]["deepface_import"] = round(time.monotonic() - start, 3)
+    return _models["deepface"]
+
+
+def _build(key, builder):
+    if key not in _models:
+        with _lock:
+            if key not in _models:
+                if _metrics["rss_mb_before"] is None:
+                    _metrics["rss_mb_before"] = _rss_mb()
+                start = time.monotonic()
+                _models[key] = builder()
+                _metrics["load_seconds"][key] = round(time.monotonic() - start, 3)
+                _metrics["rss_mb_after"] = _rss_mb()
+    return _models[key]
+
+
+def get_recognition_model():
+    """DeepFace FacialRecognition client for MODEL_NAME, built once per process."""
+    DeepFace = get_deepface()
+    return _build(f"recognition:{MODEL_NAME}", lambda: DeepFace.build_model(MODEL_NAME))
+
+
+def get_detector():
+    """FaceDetector for DETECTOR_BACKEND at DETECTION_SCALE (see app.detectors), built once per process."""
+    from app.detectors import build_detector
+
+    def build():
+        detector = build_detector(DETECTOR_BACKEND, DETECTION_SCALE)
+        detector.warm_up()
+        return detector
+
+    return _build(f"detector:{DETECTOR_BACKEND}", build)
+
+
+# --- STARTUP ---
+def preload(warm_up=True):
+    """
+    Builds the configured recognition model and detector and, optionally, pushes one
+    dummy image through each so the first real frame does not pay graph tracing costs.
+    """
+    model = get_recognition_model()
+    detector = get_detector()
+
+    if warm_up and _metrics["warmup_seconds"] is None:
+        from app.embedding_service import BatchEmbeddingService
+
+        start = time.monotonic()
+        blank = np.zeros((240, 320, 3), dtype=np.uint8)
+        detector.detect(blank)
+        BatchEmbeddingService.for_deepface(model).embed([blank[:160, :160]])
+        _metrics["warmup_seconds"] = round(time.monotonic() - start, 3)
+        _metrics["rss_mb_after"] = _rss_mb()
+
+    return metrics()
+
+
+def metrics():
+    """Load/warm-up timings and process memory, for sizing server workers."""
+    with _lock:
+        return {
+            "model_name": MODEL_NAME,
+            "detector_backend": DETECTOR_BACKEND,
+            "detection_scale": DETECTION_SCALE,
+            "loaded": sorted(_models),
+            "load_seconds": dict(_metrics["load_seconds"]),
+            "warmup_seconds": _metrics["warmup_seconds"],
+            "rss_mb_before_models": _metrics["rss_mb_before"],
+            "rss_mb_after_models": _metrics["rss_mb_after"],
+            "rss_mb_now": _rss_mb(),
+            "pid": os.getpid(),
+        }
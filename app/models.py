@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime, date, time
+from sqlalchemy.orm import column_property, deferred
 
     
     
@@ -47,7 +48,9 @@ class Student(db.Model):
     contact = db.Column(db.Integer, unique=True, nullable=False)
     password = db.Column(db.String(255), nullable=False)
     is_approved = db.Column(db.Boolean, default=False, nullable=False) 
-    face_embedding = db.Column(db.LargeBinary)   # stored face vector
+    # stored face vector; deferred so listings never read the BLOB, recognition selects it explicitly
+    face_embedding = deferred(db.Column(db.LargeBinary))
+    has_face_embedding = column_property(face_embedding.columns[0].isnot(None))
     subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id'))
     created_at = db.Column(db.DateTime, default=datetime.now)
 
@@ -90,6 +93,16 @@ class Attendance(db.Model):
     emotion_score = db.Column(db.Float, nullable=True)
     liveness_score = db.Column(db.Float, nullable=True)
     mode = db.Column(db.String(20), default='Face')  # Face/Voice/Both
+
+    # Lookups filter on the `date` column (never func.date(time_in)) so these can be used
+    __table_args__ = (
+        db.Index('ix_attendances_date_student', 'date', 'student_id'),
+        db.Index('ix_attendances_student_date', 'student_id', 'date'),
+        db.Index('ix_attendances_subject_date', 'subject_id', 'date'),
+        db.Index('ix_attendances_date_status', 'date', 'status'),
+        db.Index('ix_attendances_time_in_id', 'time_in', 'id'),   # keyset pagination of the history
+    )
+
     @staticmethod
     def get_late_policy_time():
         return 9, 0, 0
@@ -101,7 +114,7 @@ class Attendance(db.Model):
 class Report(db.Model):
     __tablename__ = 'reports'
     id = db.Column(db.Integer, primary_key=True)
-    student_id = db.Column(db.Integer, db.ForeignKey('students.id'))
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), index=True)
     total_classes = db.Column(db.Integer, default=0)
     attended_classes = db.Column(db.Integer, default=0)
     attendance_percentage = db.Column(db.Float, default=0.0)
@@ -111,3 +124,21 @@ class Report(db.Model):
 
     def __repr__(self):
         return f"<Report {self.student_id} - {self.attendance_percentage}%>"
+
+# -------------------- DAILY ROLLUP MODEL --------------------
+class DailyRollup(db.Model):
+    """Attendance rows per (date, subject, status); recomputed at session close and by `flask backfill-rollups`."""
+    __tablename__ = 'daily_rollups'
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id'), nullable=True)
+    status = db.Column(db.String(10), nullable=False)
+    count = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_daily_rollups_date_subject_status', 'date', 'subject_id', 'status'),
+    )
+
+    def __repr__(self):
+        return f"<DailyRollup {self.date} {self.subject_id} {self.status}: {self.count}>"
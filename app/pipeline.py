@@ -0,0 +1,264 @@
+import queue
+import threading
+import time
+from contextlib import nullcontext
+
+
+# --- STAGE METRICS ---
+class StageStats:
+    """Thread-safe counters for one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self.items = 0
+        self.dropped = 0
+        self.busy_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds, items=1):
+        with self._lock:
+            self.items += items
+            self.busy_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def drop(self, items=1):
+        with self._lock:
+            self.dropped += items
+
+    def snapshot(self, elapsed):
+        with self._lock:
+            return {
+                "items": self.items,
+                "dropped": self.dropped,
+                "avg_ms": round(1000 * self.busy_seconds / self.items, 2) if self.items else 0.0,
+                "max_ms": round(1000 * self.max_seconds, 2),
+                "per_sec": round(self.items / elapsed, 2) if elapsed > 0 else 0.0,
+            }
+
+
+_DONE = object()
+
+
+def build_faces(matcher, threshold, boxes, embeddings):
+    """Matches a batch of embeddings and returns one {"box", "student", "distance"} dict per box."""
+    indices, distances = matcher.match(embeddings, k=1)
+    faces = []
+    for box, index, distance in zip(boxes, indices[:, 0], distances[:, 0]):
+        student = matcher.metadata[index] if distance < threshold else None
+        faces.append({"box": box, "student": student, "distance": float(distance)})
+    return faces
+
+
+def _put_latest(q, item, stats):
+    """Non-blocking put that evicts the oldest queued item when the queue is full."""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+                stats.drop()
+            except queue.Empty:
+                pass
+
+
+# --- PIPELINE ---
+class AttendancePipeline:
+    """
+    Live recognition split into stages connected by bounded queues:
+
+        capture thread -> embed workers (pool) -> matcher thread -> writer thread
+
+    `embed_faces(frame)` returns (boxes, embeddings) for every face in a frame,
+    `matcher` is any search backend with match(), and `handle_matches(faces)` runs on
+    the writer thread with a list of {"box", "student", "distance"} dicts and returns
+    (box, label, color) annotations for display.
+
+    With a live source the capture stage never waits: when workers fall behind the
+    oldest queued frame is dropped, and workers skip frames older than `max_frame_age`.
+    With a file source every frame is processed and the queues apply backpressure.
+
+    With a FaceTracker, `embed_faces` must also expose detect(frame) -> (boxes, crops)
+    and embed(crops); only faces the tracker flags are embedded and matched, the rest
+    reuse their track's identity.
+
+    Stage metrics count frames; "faces" counts the faces written (its avg_ms is the
+    write time per face, over frames that had any).
+    """
+
+    def __init__(self, source, embed_faces, matcher, handle_matches, threshold,
+                 workers=2, queue_size=4, max_frame_age=1.0, drop_stale=None, writer_context=None, tracker=None):
+        self.source = source
+        self.embed_faces = embed_faces
+        self.matcher = matcher
+        self.handle_matches = handle_matches
+        self.threshold = threshold
+        self.workers = workers
+        self.max_frame_age = max_frame_age
+        self.drop_stale = getattr(source, "live", True) if drop_stale is None else drop_stale
+        self.writer_context = writer_context or nullcontext
+        self.tracker = tracker
+
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.embedded = queue.Queue(maxsize=queue_size)
+        self.matched = queue.Queue(maxsize=queue_size)
+
+        self.stats = {name: StageStats(name) for name in ("capture", "embed", "match", "write", "faces", "end_to_end")}
+        self._stop = threading.Event()
+        self._threads = []
+        self._started_at = None
+        self._latest_lock = threading.Lock()
+        self._latest_frame = None
+        self._latest_annotations = []
+        self.error = None
+
+    # --- lifecycle ---
+    def start(self):
+        self._started_at = time.monotonic()
+        targets = [(self._capture, "capture")]
+        targets += [(self._embed, f"embed-{i}") for i in range(self.workers)]
+        targets += [(self._match, "match"), (self._write, "write")]
+
+        for target, name in targets:
+            thread = threading.Thread(target=target, name=f"attendance-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def is_running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def run(self):
+        """Runs to completion on the calling thread (for files and benchmarks)."""
+        self.start()
+        self.join()
+        return self.metrics()
+
+    # --- read side ---
+    def latest(self):
+        """Most recent captured frame and the most recent annotations from the writer."""
+        with self._latest_lock:
+            return self._latest_frame, list(self._latest_annotations)
+
+    def metrics(self):
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        result = {name: stats.snapshot(elapsed) for name, stats in self.stats.items()}
+        result["elapsed_s"] = round(elapsed, 2)
+        if self.tracker is not None:
+            result["tracking"] = self.tracker.metrics()
+        return result
+
+    # --- stages ---
+    def _capture(self):
+        stats = self.stats["capture"]
+        try:
+            while not self._stop.is_set():
+                start = time.monotonic()
+                ret, frame = self.source.read()
+                if not ret:
+                    break
+                stats.record(time.monotonic() - start)
+
+                with self._latest_lock:
+                    self._latest_frame = frame
+
+                item = (time.monotonic(), frame)
+                if self.drop_stale:
+                    _put_latest(self.frames, item, stats)
+                else:
+                    self.frames.put(item)
+        except Exception as e:
+            self.error = e
+        finally:
+            for _ in range(self.workers):
+                self.frames.put(_DONE)
+
+    def _embed(self):
+        stats = self.stats["embed"]
+        while True:
+            item = self.frames.get()
+            if item is _DONE:
+                self.embedded.put(_DONE)
+                return
+
+            captured_at, frame = item
+            if self.drop_stale and time.monotonic() - captured_at > self.max_frame_age:
+                stats.drop()
+                continue
+
+            start = time.monotonic()
+            try:
+                if self.tracker is None:
+                    boxes, embeddings = self.embed_faces(frame)
+                    item = (captured_at, boxes, embeddings, None, None)
+                else:
+                    item = self._track_and_embed(captured_at, frame)
+            except Exception as e:
+                print(f"[WARN] Face embedding failed: {e}")
+                item = (captured_at, [], [], None, None)
+            stats.record(time.monotonic() - start)
+
+            self.embedded.put(item)
+
+    def _track_and_embed(self, captured_at, frame):
+        boxes, crops = self.embed_faces.detect(frame)
+        tracks, needed = self.tracker.update(boxes)
+        embedded_tracks = [tracks[i] for i in needed]
+        try:
+            embeddings = self.embed_faces.embed([crops[i] for i in needed]) if needed else []
+        except Exception:
+            self.tracker.release(embedded_tracks)
+            raise
+        return captured_at, [boxes[i] for i in needed], embeddings, embedded_tracks, tracks
+
+    def _match(self):
+        stats = self.stats["match"]
+        finished_workers = 0
+        while finished_workers < self.workers:
+            item = self.embedded.get()
+            if item is _DONE:
+                finished_workers += 1
+                continue
+
+            captured_at, boxes, embeddings, embedded_tracks, tracks = item
+            start = time.monotonic()
+            faces = build_faces(self.matcher, self.threshold, boxes, embeddings)
+            if tracks is not None:
+                faces = self.tracker.resolve(embedded_tracks, faces, tracks)
+            stats.record(time.monotonic() - start)
+
+            self.matched.put((captured_at, faces))
+        self.matched.put(_DONE)
+
+    def _write(self):
+        stats = self.stats["write"]
+        with self.writer_context():
+            while True:
+                item = self.matched.get()
+                if item is _DONE:
+                    return
+
+                captured_at, faces = item
+                start = time.monotonic()
+                try:
+                    annotations = self.handle_matches(faces)
+                except Exception as e:
+                    print(f"[WARN] Attendance write failed: {e}")
+                    annotations = []
+                elapsed = time.monotonic() - start
+                stats.record(elapsed)
+                if faces:
+                    self.stats["faces"].record(elapsed, items=len(faces))
+                self.stats["end_to_end"].record(time.monotonic() - captured_at)
+
+                with self._latest_lock:
+                    self._latest_annotations = annotations
@@ -0,0 +1,301 @@
+import glob
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+from flask import current_app
+
+from app.matcher import l2_normalize
+
+
+# --- CONFIGURATION ---
+PROJECTION_DIRNAME = "projection"     # created inside the Flask instance folder
+FORMAT_VERSION = 2                    # 2: calibrated match threshold stored with the projection
+METHODS = ("pca", "random")
+DEFAULT_METHOD = "pca"
+DEFAULT_DIM = 256                     # 4096-d VGG-Face -> 256-d: 16x less matching work
+FIT_SAMPLE_MAX = 20000                # PCA is fitted on at most this many gallery rows
+KEEP_REVISIONS = 3                    # older artifacts are deleted after a refit
+TRANSFORM_CHUNK_ROWS = 4096           # rows projected at a time (bounds the temporary copy)
+PCA_OVERSAMPLE = 16                   # randomized PCA: extra directions and power iterations
+PCA_POWER_ITERATIONS = 2
+CALIBRATION_QUERIES = 1000            # rows whose nearest other-student rows are the impostor pairs
+CALIBRATION_POOL = 20000              # rows those neighbours are searched among
+CALIBRATION_NEIGHBOURS = 10
+
+_FILENAME = re.compile(r"projection-r(\d+)\.npz$")
+
+
+# --- PROJECTION ---
+class Projection:
+    """
+    Linear map from full embeddings (e.g. 4096-d VGG-Face) to `dim` dimensions for
+    matching: y = (normalize(x) - mean) @ components. Stored embeddings stay full size,
+    so a projection can be refit or dropped at any time; only the gallery built at
+    session start and the live embeddings are projected.
+    Distances change in the projected space, so `threshold` is the cut-off calibrated
+    to keep the false accept rate `source_threshold` has on full embeddings (see
+    calibrate_threshold); a projection without one is never used for matching.
+    """
+
+    def __init__(self, method, mean, components, model_name, revision=0, fitted_at=None, samples=0,
+                 explained_variance=None, threshold=None, source_threshold=None, false_accept_rate=None,
+                 calibration_pairs=0):
+        self.method = method
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.ascontiguousarray(components, dtype=np.float32)   # (input_dim, dim)
+        self.model_name = model_name
+        self.revision = revision
+        self.fitted_at = fitted_at or datetime.now().isoformat(timespec="seconds")
+        self.samples = samples
+        self.explained_variance = explained_variance   # fraction of the variance kept (PCA only)
+        self.threshold = threshold                     # match cut-off in the projected space
+        self.source_threshold = source_threshold       # the full-space threshold it stands in for
+        self.false_accept_rate = false_accept_rate     # of both thresholds, on the calibration impostor pairs
+        self.calibration_pairs = calibration_pairs
+
+    @property
+    def input_dim(self):
+        return self.components.shape[0]
+
+    @property
+    def dim(self):
+        return self.components.shape[1]
+
+    def transform(self, vectors):
+        """
+        (N, input_dim) or (input_dim,) embeddings -> (N, dim) float32 (not normalized).
+        All-zero rows (deleted students' tombstones in the index) stay all-zero, so they
+        keep distance 1.0 instead of becoming -mean @ components.
+        """
+        vectors = np.asarray(vectors)
+        vectors = vectors.reshape(1, -1) if vectors.ndim == 1 else vectors
+        projected = np.empty((len(vectors), self.dim), dtype=np.float32)
+        for start in range(0, len(vectors), TRANSFORM_CHUNK_ROWS):
+            block = l2_normalize(vectors[start:start + TRANSFORM_CHUNK_ROWS])
+            empty = ~block.any(axis=1)
+            block -= self.mean
+            block[empty] = 0
+            projected[start:start + TRANSFORM_CHUNK_ROWS] = block @ self.components
+        return projected
+
+    def describe(self):
+        text = f"{self.method} {self.input_dim}->{self.dim} (revision {self.revision}"
+        if self.method == "pca":
+            text += f", fitted on {self.samples} faces, {100 * self.explained_variance:.1f}% variance kept"
+        if self.threshold is not None:
+            text += f", threshold {self.source_threshold:.3f} -> {self.threshold:.3f}"
+            text += (f" (FAR {self.false_accept_rate:.4f} on {self.calibration_pairs} impostor pairs)"
+                     if self.false_accept_rate is not None else " (set by hand)")
+        return text + ")"
+
+    # --- artifact ---
+    def save(self, path):
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            format_version=FORMAT_VERSION, method=self.method, model_name=self.model_name,
+            revision=self.revision, fitted_at=self.fitted_at, samples=self.samples,
+            explained_variance=np.nan if self.explained_variance is None else self.explained_variance,
+            threshold=np.nan if self.threshold is None else self.threshold,
+            source_threshold=np.nan if self.source_threshold is None else self.source_threshold,
+            false_accept_rate=np.nan if self.false_accept_rate is None else self.false_accept_rate,
+            calibration_pairs=self.calibration_pairs,
+            mean=self.mean, components=self.components,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Reads an artifact; raises ValueError if it is not in the current format."""
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["format_version"]) != FORMAT_VERSION:
+                raise ValueError(f"unsupported projection format {int(data['format_version'])}; "
+                                 f"run 'flask fit-projection' to refit it")
+            optional = {
+                name: None if np.isnan(float(data[name])) else float(data[name])
+                for name in ("explained_variance", "threshold", "source_threshold", "false_accept_rate")
+            }
+            return cls(
+                str(data["method"]), data["mean"], data["components"], str(data["model_name"]),
+                revision=int(data["revision"]), fitted_at=str(data["fitted_at"]), samples=int(data["samples"]),
+                calibration_pairs=int(data["calibration_pairs"]), **optional,
+            )
+
+
+# --- FITTING ---
+def fit_pca(embeddings, dim, model_name, seed=0):
+    """
+    PCA of the L2-normalized gallery by randomized SVD (a few passes over at most
+    FIT_SAMPLE_MAX rows instead of a full input_dim x input_dim eigendecomposition).
+    """
+    rng = np.random.default_rng(seed)
+    embeddings = np.asarray(embeddings)
+    if len(embeddings) > FIT_SAMPLE_MAX:
+        embeddings = embeddings[np.sort(rng.choice(len(embeddings), FIT_SAMPLE_MAX, replace=False))]
+    if len(embeddings) <= dim:
+        raise ValueError(f"PCA to {dim} dimensions needs more than {dim} enrolled faces "
+                         f"(have {len(embeddings)}); use a smaller dimension or --method random")
+
+    samples = l2_normalize(embeddings)
+    mean = samples.mean(axis=0)
+    samples -= mean
+
+    sketch = samples @ rng.standard_normal((samples.shape[1], dim + PCA_OVERSAMPLE), dtype=np.float32)
+    for _ in range(PCA_POWER_ITERATIONS):
+        sketch, _ = np.linalg.qr(sketch)
+        sketch = samples @ (samples.T @ sketch)
+    basis, _ = np.linalg.qr(sketch)
+    _, singular_values, components = np.linalg.svd(basis.T @ samples, full_matrices=False)
+
+    total_variance = float(np.sum(samples.astype(np.float64) ** 2))
+    kept = float(np.sum(singular_values[:dim].astype(np.float64) ** 2))
+    return Projection("pca", mean, components[:dim].T, model_name, samples=len(samples),
+                      explained_variance=kept / total_variance if total_variance else 1.0)
+
+
+def fit_random(input_dim, dim, model_name, seed=0):
+    """Data-independent orthonormal random projection (works for any gallery size)."""
+    if dim > input_dim:
+        raise ValueError(f"cannot project {input_dim}-d embeddings to {dim} dimensions")
+    rng = np.random.default_rng(seed)
+    components, _ = np.linalg.qr(rng.standard_normal((input_dim, dim), dtype=np.float32))
+    return Projection("random", np.zeros(input_dim, dtype=np.float32), components, model_name)
+
+
+def fit_projection(embeddings, method=DEFAULT_METHOD, dim=DEFAULT_DIM, model_name="", seed=0):
+    if method not in METHODS:
+        raise ValueError(f"unknown projection method '{method}' (choose from {', '.join(METHODS)})")
+    if method == "pca":
+        return fit_pca(embeddings, dim, model_name, seed)
+    return fit_random(np.asarray(embeddings).shape[1], dim, model_name, seed)
+
+
+# --- THRESHOLD CALIBRATION ---
+def impostor_pairs(samples, owners, seed=0):
+    """
+    Index pairs (a, b) of close impostors among the enrolled samples: each sampled row
+    with its nearest rows of other students, the pairs that decide the false accept rate.
+    """
+    rng = np.random.default_rng(seed)
+    owners = np.asarray(owners)
+    queries = rng.choice(len(samples), min(len(samples), CALIBRATION_QUERIES), replace=False)
+    pool = rng.choice(len(samples), min(len(samples), CALIBRATION_POOL), replace=False)
+    k = min(CALIBRATION_NEIGHBOURS, len(pool))
+
+    a, b = [], []
+    for start in range(0, len(queries), 256):
+        block = queries[start:start + 256]
+        similarities = samples[block] @ samples[pool].T
+        similarities[owners[block][:, None] == owners[pool][None, :]] = -np.inf
+        nearest = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        found = np.isfinite(np.take_along_axis(similarities, nearest, axis=1))
+        a.append(np.broadcast_to(block[:, None], nearest.shape)[found])
+        b.append(pool[nearest][found])
+    return np.concatenate(a), np.concatenate(b)
+
+
+def calibrate_threshold(projection, samples, owners, threshold, seed=0):
+    """
+    Stores on `projection` the largest cut-off on projected distances that accepts no
+    larger share of impostor pairs than `threshold` accepts on full embeddings, so the
+    projected space keeps the false accept rate recognition was tuned for. `samples`
+    are the enrolled embeddings and owners[i] the student of row i.
+    Raises ValueError when there are no impostor pairs (fewer than two students).
+    """
+    samples = l2_normalize(samples)
+    a, b = impostor_pairs(samples, owners, seed)
+    if not len(a):
+        raise ValueError("calibrating the match threshold needs at least two enrolled students")
+
+    full = 1.0 - np.einsum("ij,ij->i", samples[a], samples[b])
+    projected = l2_normalize(projection.transform(samples))
+    distances = np.sort(1.0 - np.einsum("ij,ij->i", projected[a], projected[b]))
+
+    # distance < distances[n] accepts at most n of the impostor pairs. When the full-space
+    # threshold accepts none, keep the same relative margin below the nearest impostor.
+    false_accepts = int(np.count_nonzero(full < threshold))
+    if false_accepts == 0:
+        cut = float(distances[0] * threshold / max(float(full.min()), 1e-6))
+    elif false_accepts < len(distances):
+        cut = float(distances[false_accepts])
+    else:
+        cut = float(distances[-1]) + 1e-6
+
+    projection.threshold = cut
+    projection.source_threshold = float(threshold)
+    projection.false_accept_rate = false_accepts / len(distances)
+    projection.calibration_pairs = len(distances)
+    return projection
+
+
+# --- ARTIFACT STORE ---
+class ProjectionStore:
+    """
+    Versioned projection artifacts in one directory: projection-r<revision>.npz.
+    The highest revision is the active one; deleting it rolls back to the previous.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def revisions(self):
+        found = []
+        for path in glob.glob(os.path.join(self.directory, "projection-r*.npz")):
+            match = _FILENAME.search(os.path.basename(path))
+            if match:
+                found.append((int(match.group(1)), path))
+        return sorted(found)
+
+    def current(self):
+        """The active Projection, or None when none has been fitted (or it is unreadable)."""
+        revisions = self.revisions()
+        if not revisions:
+            return None
+        try:
+            return Projection.load(revisions[-1][1])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[WARN] Ignoring projection artifact {revisions[-1][1]}: {e}")
+            return None
+
+    def publish(self, projection):
+        """Saves `projection` as the next revision and prunes old ones. Returns its path."""
+        os.makedirs(self.directory, exist_ok=True)
+        revisions = self.revisions()
+        projection.revision = revisions[-1][0] + 1 if revisions else 1
+        path = os.path.join(self.directory, f"projection-r{projection.revision:04d}.npz")
+        projection.save(path)
+        for _, old_path in revisions[:max(0, len(revisions) + 1 - KEEP_REVISIONS)]:
+            os.remove(old_path)
+        return path
+
+    def clear(self):
+        for _, path in self.revisions():
+            os.remove(path)
+
+
+# --- FLASK HELPERS ---
+def get_projection_store():
+    """Store for the running app, under <instance>/projection."""
+    return ProjectionStore(os.path.join(current_app.instance_path, PROJECTION_DIRNAME))
+
+
+def active_projection(model_name, input_dim, threshold):
+    """
+    The fitted projection to match with, or None to match full embeddings. An artifact
+    fitted for another model or embedding size, or calibrated for another match
+    threshold, is ignored until it is refit.
+    """
+    projection = get_projection_store().current()
+    if projection is None:
+        return None
+    if projection.model_name != model_name or projection.input_dim != input_dim:
+        print(f"[WARN] Projection revision {projection.revision} was fitted for {projection.model_name} "
+              f"{projection.input_dim}-d embeddings; matching without it. Run 'flask fit-projection'.")
+        return None
+    if projection.threshold is None or projection.source_threshold != threshold:
+        print(f"[WARN] Projection revision {projection.revision} was calibrated for match threshold "
+              f"{projection.source_threshold}, not {threshold}; matching without it. Run 'flask fit-projection'.")
+        return None
+    return projection
@@ -0,0 +1,100 @@
+import numpy as np
+
+
+# --- CONFIGURATION ---
+PRECISIONS = ("float32", "float16", "int8")
+INT8_LEVELS = 127         # symmetric codes in [-127, 127]; -128 is never produced
+SCORE_CHUNK_ROWS = 1024   # gallery rows widened to float32 at a time while scoring (16 MB at 4096-d)
+
+
+# --- SCALAR QUANTIZATION ---
+def quantize_int8(vectors):
+    """
+    Symmetric per-row int8 quantization. Returns (codes, scales): codes is (N, D) int8 and
+    scales is (N,) float32 with row i ~= codes[i] * scales[i]. Zero rows get scale 0.
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix = matrix.reshape(1, -1) if matrix.ndim == 1 else matrix
+    peaks = np.abs(matrix).max(axis=1) if matrix.size else np.zeros(len(matrix), dtype=np.float32)
+    scales = (peaks / INT8_LEVELS).astype(np.float32)
+    safe = np.where(scales > 0, scales, 1.0)[:, None]
+    codes = np.clip(np.rint(matrix / safe), -INT8_LEVELS, INT8_LEVELS).astype(np.int8)
+    return codes, scales
+
+
+def dequantize_int8(codes, scales):
+    return codes.astype(np.float32) * np.asarray(scales, dtype=np.float32)[:, None]
+
+
+# --- QUANTIZED GALLERY ---
+class QuantizedRows:
+    """
+    An (N, D) gallery kept in float16 or int8 instead of float32 (2x / ~4x smaller).
+    It stands in for the float32 matrix inside the matchers: `rows @ x` scores against
+    the stored codes a chunk at a time (int8 scales are applied to the dot products,
+    not to the gallery), so a full-precision copy of the gallery never exists.
+    Indexing returns QuantizedRows; np.asarray() dequantizes.
+    """
+
+    def __init__(self, codes, scales=None):
+        self.codes = codes
+        self.scales = scales   # (N,) float32 for int8 codes, None for float16
+
+    @classmethod
+    def from_float(cls, vectors, precision, chunk=SCORE_CHUNK_ROWS):
+        """Quantizes an (N, D) float matrix (e.g. the index memmap) a chunk at a time."""
+        if precision not in PRECISIONS or precision == "float32":
+            raise ValueError(f"unsupported gallery precision '{precision}' (choose from float16, int8)")
+        vectors = np.asarray(vectors)
+        if precision == "float16":
+            codes = np.empty(vectors.shape, dtype=np.float16)
+            for start in range(0, len(vectors), chunk):
+                codes[start:start + chunk] = vectors[start:start + chunk]
+            return cls(codes)
+
+        codes = np.empty(vectors.shape, dtype=np.int8)
+        scales = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), chunk):
+            codes[start:start + chunk], scales[start:start + chunk] = quantize_int8(vectors[start:start + chunk])
+        return cls(codes, scales)
+
+    @property
+    def precision(self):
+        return "int8" if self.scales is not None else "float16"
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, key):
+        return QuantizedRows(self.codes[key], self.scales[key] if self.scales is not None else None)
+
+    def __array__(self, dtype=None, copy=None):
+        matrix = dequantize_int8(self.codes, self.scales) if self.scales is not None else self.codes.astype(np.float32)
+        return matrix if dtype is None else matrix.astype(dtype)
+
+    def __matmul__(self, other):
+        """rows @ other for a float32 (D,) or (D, k) operand, as float32."""
+        other = np.asarray(other, dtype=np.float32)
+        scores = np.empty((len(self.codes),) + other.shape[1:], dtype=np.float32)
+        for start in range(0, len(self.codes), SCORE_CHUNK_ROWS):
+            block = self.codes[start:start + SCORE_CHUNK_ROWS].astype(np.float32) @ other
+            if self.scales is not None:
+                scale = self.scales[start:start + SCORE_CHUNK_ROWS]
+                block *= scale[:, None] if block.ndim == 2 else scale
+            scores[start:start + SCORE_CHUNK_ROWS] = block
+        return scores
+
+
+def quantize_gallery(gallery, precision):
+    """`gallery` unchanged for float32, otherwise its QuantizedRows in `precision`."""
+    if precision == "float32":
+        return gallery
+    return QuantizedRows.from_float(gallery, precision)
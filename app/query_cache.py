@@ -0,0 +1,275 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+
+
+# --- CONFIGURATION ---
+CACHE_TTL_S = 60.0                          # longest a cached dashboard figure can lag behind the database
+CACHE_MAX_ENTRIES = 256                     # least recently used entries are evicted beyond this
+SHARED_STORE_FILENAME = "query_cache.db"    # in the instance folder, for QUERY_CACHE_STORE=shared
+
+# Tags name what a cached value was computed from; write paths invalidate by tag.
+STUDENTS = "students"
+TEACHERS = "teachers"
+ATTENDANCE = "attendance"
+
+
+# --- STORES ---
+class MemoryStore:
+    """Per-process LRU dictionary of key -> (value, expires_at, tags)."""
+
+    name = "memory"
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        """(True, value) for a live entry, (False, None) otherwise."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at, _ = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def put(self, key, value, expires_at, tags):
+        """Stores an entry; returns the number of entries evicted to make room."""
+        with self._lock:
+            self._entries[key] = (value, expires_at, frozenset(tags))
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def invalidate(self, tags):
+        """Drops every entry carrying one of `tags` (all entries when `tags` is empty)."""
+        with self._lock:
+            if not tags:
+                dropped = len(self._entries)
+                self._entries.clear()
+                return dropped
+            stale = [key for key, (_, _, entry_tags) in self._entries.items() if entry_tags & set(tags)]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SharedStore:
+    """
+    The same interface over a small SQLite file, so every worker process on the host
+    shares one cache and an invalidation in one worker is seen by all of them.
+    Values are pickled; only plain data produced by this app is ever stored.
+    """
+
+    name = "shared"
+
+    def __init__(self, path, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")   # readers do not block the writer
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, tags TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_used_at ON entries (used_at)")
+
+    def _connect(self):
+        # A connection per call: cheap for a local file, and safe across threads and forked workers.
+        return _Closing(sqlite3.connect(self.path, timeout=5.0, isolation_level=None))
+
+    def get(self, key, now):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return False, None
+            if row[1] <= now:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return False, None
+            conn.execute("UPDATE entries SET used_at = ? WHERE key = ?", (now, key))
+            return True, pickle.loads(row[0])
+
+    def put(self, key, value, expires_at, tags):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, tags, expires_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), "," + ",".join(tags) + ",",
+                 expires_at, time.time()),
+            )
+            return conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                " SELECT key FROM entries ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+
+    def invalidate(self, tags):
+        with self._connect() as conn:
+            if not tags:
+                return conn.execute("DELETE FROM entries").rowcount
+            clause = " OR ".join("tags LIKE ?" for _ in tags)
+            return conn.execute(f"DELETE FROM entries WHERE {clause}", [f"%,{tag},%" for tag in tags]).rowcount
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class _Closing:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, *exc):
+        self.conn.close()
+
+
+# --- CACHE ---
+class QueryCache:
+    """
+    Read-through cache for dashboard queries: get_or_load() returns a live cached
+    value or calls the loader and keeps its result for `ttl` seconds. Loader results
+    must be plain data (dicts, lists, tuples), never ORM instances bound to a session.
+    """
+
+    def __init__(self, store, ttl=CACHE_TTL_S):
+        self.store = store
+        self.ttl = ttl
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.errors = 0
+        self._generation = 0   # bumped by every invalidation
+
+    def get_or_load(self, key, loader, tags=(), ttl=None):
+        now = time.time()
+        try:
+            found, value = self.store.get(key, now)
+        except Exception as e:
+            found = False
+            with self._stats_lock:
+                self.errors += 1
+            print(f"[WARN] Query cache read failed for {key}: {e}")
+        if found:
+            with self._stats_lock:
+                self.hits += 1
+            return value
+
+        with self._stats_lock:
+            generation = self._generation
+        value = loader()
+        with self._stats_lock:
+            self.misses += 1
+            # A write committed while the loader ran may not be in `value`: serve it, don't keep it.
+            if generation != self._generation:
+                return value
+        try:
+            evicted = self.store.put(key, value, now + (self.ttl if ttl is None else ttl), tuple(tags))
+            with self._stats_lock:
+                self.evictions += evicted
+        except Exception as e:
+            with self._stats_lock:
+                self.errors += 1
+            print(f"[WARN] Query cache write failed for {key}: {e}")
+        return value
+
+    def invalidate(self, *tags):
+        with self._stats_lock:
+            self._generation += 1
+        try:
+            dropped = self.store.invalidate(tags)
+        except Exception as e:
+            # Worst case the entries live out their TTL; the write itself already succeeded.
+            print(f"[WARN] Query cache invalidation failed for {tags}: {e}")
+            return 0
+        with self._stats_lock:
+            self.invalidations += 1
+        return dropped
+
+    def stats(self):
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "store": self.store.name,
+                "ttl_seconds": self.ttl,
+                "max_entries": self.store.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "errors": self.errors,
+            }
+        try:
+            stats["entries"] = len(self.store)
+        except Exception:
+            stats["entries"] = None
+        return stats
+
+
+# --- FLASK HELPERS ---
+def init_cache(app):
+    """
+    Attaches the query cache to the app according to QUERY_CACHE_STORE
+    ('memory', 'shared' or 'off') and QUERY_CACHE_TTL.
+    """
+    store = app.config.get('QUERY_CACHE_STORE', 'memory')
+    max_entries = app.config.get('QUERY_CACHE_MAX_ENTRIES', CACHE_MAX_ENTRIES)
+    if store == 'off':
+        cache = None
+    elif store == 'shared':
+        os.makedirs(app.instance_path, exist_ok=True)
+        cache = QueryCache(SharedStore(os.path.join(app.instance_path, SHARED_STORE_FILENAME), max_entries),
+                           app.config.get('QUERY_CACHE_TTL', CACHE_TTL_S))
+    else:
+        cache = QueryCache(MemoryStore(max_entries), app.config.get('QUERY_CACHE_TTL', CACHE_TTL_S))
+    app.extensions['query_cache'] = cache
+    return cache
+
+
+def get_cache():
+    """The running app's cache, or None when it is disabled or outside an app context."""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('query_cache')
+
+
+def cached(key, loader, tags=(), ttl=None):
+    """loader() through the app's cache (called directly when caching is off)."""
+    cache = get_cache()
+    if cache is None:
+        return loader()
+    return cache.get_or_load(key, loader, tags, ttl)
+
+
+def invalidate(*tags):
+    """Call after committing a write that changes data tagged with any of `tags`."""
+    cache = get_cache()
+    if cache is not None:
+        cache.invalidate(*tags)
+
+
+def cache_stats():
+    cache = get_cache()
+    return cache.stats() if cache is not None else {"store": "off"}
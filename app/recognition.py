@@ -1,20 +1,47 @@
 import cv2
 import numpy as np
-import pickle
 from datetime import datetime, timedelta
 import time
-from deepface import DeepFace
 
 # Flask imports must be handled carefully, but we include the required models and db here
 from app.models import Student, Attendance # Import Student and Attendance models
 from app import db # Assuming db is accessible
-from sqlalchemy import func
+from app.search_backends import build_search_backend
+from app.embedding_index import get_index
+from app.projection import active_projection
+from app.embedding_codec import decode_many
+from app.face_templates import gallery_rows
+from app.pipeline import AttendancePipeline
+from app.frame_sources import open_frame_source
+from app.embedding_service import BatchEmbeddingService
+from app.scheduler import MultiStreamScheduler, Stream, DEFAULT_STREAM_FPS
+from app.tracker import FaceTracker
+from app.attendance_state import AttendanceState, NOT_MARKED, MARKED_IN
+from app.attendance_writer import AttendanceWriter
+from flask import current_app
 
 # --- CONFIGURATION ---
-DETECTOR_BACKEND = "opencv" 
-MODEL_NAME = "VGG-Face"
-# Threshold for Cosine Distance (usually 0.25 to 0.40 is common)
-THRESHOLD = 0.50 
+# Model and detector names are shared with enrollment through the model registry
+from app.model_registry import MODEL_NAME, MATCH_THRESHOLD, get_detector, get_recognition_model
+# Threshold for Cosine Distance, shared with the enrollment duplicate check
+THRESHOLD = MATCH_THRESHOLD
+# Gallery search: "exact" (brute force) or "ivf" (approximate, for very large galleries)
+SEARCH_BACKEND = "exact"
+SEARCH_OPTIONS = {}  # e.g. {"nlist": 256, "nprobe": 8} for "ivf"
+# In-memory gallery precision: "float32", or "float16" / "int8" for a 2x / ~4x smaller
+# gallery scored directly on the quantized rows (see app.quantization)
+GALLERY_PRECISION = "float32"
+# Match in the reduced space of the fitted projection artifact when there is one
+# (flask fit-projection); False always matches the full embeddings. The artifact carries
+# its own cut-off, calibrated against THRESHOLD, and is ignored if THRESHOLD changes.
+USE_PROJECTION = True
+# Detection/embedding worker threads in the live pipeline
+PIPELINE_WORKERS = 2
+# Face crops per model call, and how long a crop may wait for its batch to fill
+EMBED_MAX_BATCH_SIZE = 32
+EMBED_MAX_DELAY_MS = 10
+# Track faces across frames and only re-embed new / low-confidence / stale tracks
+TRACK_FACES = True
 
 # --- DISTANCE METRIC FUNCTION ---
 def find_cosine_distance(source_representation, test_representation):
@@ -38,28 +65,49 @@ def find_cosine_distance(source_representation, test_representation):
 
 # --- UTILITIES ---
 
-def load_and_verify_all_embeddings(StudentModel):
-    """Retrieves all registered students' data and embeddings."""
-    students = StudentModel.query.filter(StudentModel.face_embedding.isnot(None)).all()
+def load_and_verify_all_embeddings(StudentModel, mode=None):
+    """
+    Retrieves all registered students' data and decodes their embeddings in one pass.
+    Each student contributes the gallery rows of their template (one in centroid mode,
+    one per stored sample in multi mode; TEMPLATE_MODE unless `mode` is given), all
+    sharing the student's metadata.
+    """
+    students = StudentModel.query.with_entities(
+        StudentModel.id, StudentModel.name, StudentModel.roll_no, StudentModel.face_embedding
+    ).filter(StudentModel.face_embedding.isnot(None)).all()
     
-    known_embeddings = []
-    known_metadata = []
+    # Rows from another model (different length) cannot share the gallery: decode_many keeps the majority
+    stored, counts = decode_many([student.face_embedding for student in students])
+    gallery, row_counts = gallery_rows(stored, counts, mode)
     
-    for student in students:
-        try:
-            # Deserialize the BLOB back into a NumPy array
-            embedding_array = pickle.loads(student.face_embedding)
-            known_embeddings.append(embedding_array)
-            known_metadata.append({
-                'id': student.id, 
-                'name': student.name, 
-                'roll_no': student.roll_no,
-            })
-        except Exception as e:
-            print(f"Error loading embedding for student {student.id}: {e}")
+    known_metadata = []
+    for student, count, rows in zip(students, counts, row_counts):
+        if not count:
+            print(f"Error loading embedding for student {student.id}: unreadable, legacy or from another model")
             continue
-            
-    return np.array(known_embeddings), known_metadata
+        known_metadata.extend([{
+            'id': student.id, 
+            'name': student.name, 
+            'roll_no': student.roll_no,
+        }] * int(rows))
+    
+    return gallery, known_metadata
+
+def load_gallery(StudentModel):
+    """
+    Opens the memory-mapped embedding index, rebuilding it from the database
+    only when it is missing or stale. Returns the configured search backend.
+    """
+    index = get_index()
+    if not index.is_valid():
+        print("[INFO] Embedding index missing or stale. Rebuilding from database...")
+        known_embeddings_arr, known_metadata = load_and_verify_all_embeddings(StudentModel)
+        index.rebuild(known_embeddings_arr, known_metadata)
+        
+    gallery, metadata = index.load()
+    projection = active_projection(MODEL_NAME, gallery.shape[1], THRESHOLD) if USE_PROJECTION and len(metadata) else None
+    return build_search_backend(SEARCH_BACKEND, gallery, metadata, precision=GALLERY_PRECISION,
+                                projection=projection, **SEARCH_OPTIONS)
 
 def calculate_attendance_status(AttendanceModel):
     """Calculates 'Present' or 'Late' status based on policy time."""
@@ -79,126 +127,243 @@ def calculate_attendance_status(AttendanceModel):
     else:
         return 'Present', (0, 255, 0) # Green
 
-# --- MAIN ATTENDANCE LOOP (UPDATED) ---
+class FaceEmbedder:
+    """
+    Detect + embed step run by the pipeline workers. Calling it maps a frame to
+    (boxes, embeddings); detect() and embed() are also exposed separately so a
+    FaceTracker can skip embedding faces it already knows.
+    All crops of a frame go to the batching service together, so a full classroom
+    costs one model call instead of one per face.
+    """
+    def __init__(self, detector, embedding_service):
+        self.detector = detector
+        self.embedding_service = embedding_service
+        
+    def detect(self, frame):
+        faces = self.detector.detect(frame)
+        
+        face_boxes = []
+        face_crops = []
+        for face_data in faces:
+            x, y, w, h = [face_data['facial_area'][k] for k in ['x', 'y', 'w', 'h']]
+            face_crop = frame[y:y+h, x:x+w]
+            
+            if face_crop.size == 0: continue
+            
+            face_boxes.append((x, y, w, h))
+            face_crops.append(face_crop)
+            
+        return face_boxes, face_crops
+    
+    def embed(self, face_crops):
+        return self.embedding_service.embed(face_crops)
+    
+    def __call__(self, frame):
+        face_boxes, face_crops = self.detect(frame)
+        return face_boxes, self.embed(face_crops)
+
+def make_face_embedder(embedding_service):
+    return FaceEmbedder(get_detector(), embedding_service)
 
-def mark_attendance_loop(db, AttendanceModel, StudentModel, DeepFace):
+def record_attendance(AttendanceModel, state, writer, face, subject_id=None):
+    """
+    Marks IN / OUT for one matched face and returns its (box, label, color, event)
+    annotation, event being 'in', 'out', 'completed' or 'unknown'.
+    `state` is the session's AttendanceState: repeat sightings are answered from it.
+    IN / OUT apply to the student's record for `subject_id` (any subject when None).
+    IN / OUT transitions are handed to the session's AttendanceWriter, which commits
+    them in batches off this thread.
+    Runs on the pipeline's writer thread.
+    """
+    student = face['student']
+    if student is None:
+        return face['box'], f"Unknown (Dist: {face['distance']:.2f})", (0, 0, 255), 'unknown' # Red
+    
+    identified_id = student['id']
+    identified_name = student['name']
+    
+    current_time = datetime.now()
+    
+    # Check for existing record for today (in memory)
+    marked, attendance_id = state.lookup(identified_id, subject_id, current_time)
+    if marked == NOT_MARKED:
+        # About to insert: confirm against the database in case another session marked them
+        marked, attendance_id = state.refresh(identified_id, subject_id, current_time)
+
+    if marked == NOT_MARKED:
+        # SCENARIO A: MARKING IN (Create New Record)
+        attendance_status, color = calculate_attendance_status(AttendanceModel)
+        
+        writer.submit('in', identified_id, current_time, subject_id=subject_id, status=attendance_status)
+        state.mark_in(identified_id, attendance_id, subject_id)
+        
+        label_text = f"{attendance_status} IN: {identified_name}"
+        event = 'in'
+        print(f"[ENTRY] {identified_name} marked {attendance_status}")
+
+    elif marked == MARKED_IN:
+        # SCENARIO B: MARKING OUT (Update Existing Record)
+        writer.submit('out', identified_id, current_time, subject_id=subject_id)
+        state.mark_out(identified_id, attendance_id, subject_id)
+        
+        label_text = f"EXIT: {identified_name}"
+        color = (255, 100, 0) # Orange/Blue for exit
+        event = 'out'
+        print(f"[EXIT] {identified_name} marked out")
+        
+    else:
+        # SCENARIO C: ALREADY MARKED IN AND OUT
+        label_text = f"{identified_name} (Completed)"
+        color = (150, 150, 150) # Gray/Neutral
+        event = 'completed'
+        
+    return face['box'], label_text, color, event
+
+# --- MAIN ATTENDANCE LOOP (PIPELINED) ---
+
+def mark_attendance_loop(db, AttendanceModel, StudentModel, DeepFace, source=0, show_window=True, session=None, subject_id=None):
     """
     Runs the live camera feed, performs recognition, and commits attendance.
+    Capture, detection/embedding, matching and DB writes run as separate pipeline stages;
+    this thread only draws the latest frame and annotations (skipped when headless).
+    `source` is a camera index, video file, image directory or "synthetic", and new
+    rows are recorded against `subject_id`.
+    When an AttendanceSession is given, it can stop the run and receives live counts.
     """
-    known_embeddings_arr, known_metadata = load_and_verify_all_embeddings(StudentModel)
+    matcher = load_gallery(StudentModel)
     
-    if not known_embeddings_arr.size:
+    if not matcher.size:
         print("[ERROR] No registered faces found. Cannot start attendance.")
-        return 
+        return {"status": "error", "message": "No registered faces found."}
         
-    cap = cv2.VideoCapture(0)
+    cap = open_frame_source(source)
     if not cap.isOpened():
-        print("[ERROR] Failed to open camera.")
-        return
-        
-    recognized_session = {} # {student_id: time} to prevent rapid commits
-    PROCESS_FRAME_RATE = 5 
-    frame_count = 0
+        print(f"[ERROR] Failed to open video source {source}.")
+        return {"status": "error", "message": f"Failed to open video source {source}."}
+    
+    embedding_service = BatchEmbeddingService.for_deepface(
+        get_recognition_model(), max_batch_size=EMBED_MAX_BATCH_SIZE, max_delay_ms=EMBED_MAX_DELAY_MS
+    ).start()
+    
+    app = current_app._get_current_object()
+    attendance_state = AttendanceState(db, AttendanceModel)
+    attendance_writer = AttendanceWriter(app, db, AttendanceModel).start()
+    
+    def handle_matches(faces):
+        annotations = [record_attendance(AttendanceModel, attendance_state, attendance_writer, face, subject_id) for face in faces]
+        if session is not None:
+            for face, annotation in zip(faces, annotations):
+                session.record(annotation[3], face['student']['name'] if face['student'] else None)
+        return annotations
+    
+    pipeline = AttendancePipeline(
+        cap,
+        embed_faces=make_face_embedder(embedding_service),
+        matcher=matcher,
+        handle_matches=handle_matches,
+        threshold=matcher.match_threshold(THRESHOLD),
+        workers=PIPELINE_WORKERS,
+        writer_context=app.app_context,
+        tracker=FaceTracker() if TRACK_FACES else None,
+    ).start()
+    if session is not None:
+        session.attach(pipeline)
 
-    while True:
-        ret, frame = cap.read()
-        if not ret: break
-        
-        frame_count += 1
+    while pipeline.is_running():
+        if not show_window:
+            time.sleep(0.1)
+            continue
         
-        if frame_count % PROCESS_FRAME_RATE != 0:
-            cv2.imshow("Attendance Marker", frame)
-            if cv2.waitKey(1) == ord('q'): break
+        frame, annotations = pipeline.latest()
+        if frame is None:
+            time.sleep(0.01)
             continue
             
         display_frame = frame.copy()
-        identified_id = None
-        identified_name = "Unknown"
-        
-        try:
-            faces = DeepFace.extract_faces(img_path=frame, detector_backend=DETECTOR_BACKEND, enforce_detection=False)
-            
-            for face_data in faces:
-                x, y, w, h = [face_data['facial_area'][k] for k in ['x', 'y', 'w', 'h']]
-                face_crop = frame[y:y+h, x:x+w]
-                
-                live_embedding_results = DeepFace.represent(img_path=face_crop, model_name=MODEL_NAME, detector_backend='skip', enforce_detection=False)
-                
-                if not live_embedding_results: continue
-                
-                live_embedding_arr = np.array(live_embedding_results[0]['embedding'], dtype=np.float32)
-                
-                # --- 1. OPTIMIZED COSINE DISTANCE COMPARISON ---
-                min_distance = 1.0
-                best_match_index = -1
-                
-                for i, stored_embedding in enumerate(known_embeddings_arr):
-                    distance = find_cosine_distance(stored_embedding, live_embedding_arr)
-                    
-                    if distance < min_distance:
-                        min_distance = distance
-                        best_match_index = i
-                
-                # --- 2. LOGIC HANDLING ---
-                if min_distance < THRESHOLD:
-                    match_data = known_metadata[best_match_index]
-                    identified_id = match_data['id']
-                    identified_name = match_data['name']
-                    
-                    today = datetime.now().date()
-                    current_time = datetime.now()
-                    
-                    # Check for existing record for today
-                    existing_entry = db.session.query(AttendanceModel).filter(
-                        AttendanceModel.student_id == identified_id,
-                        func.date(AttendanceModel.time_in) == today 
-                    ).first()
-
-                    if not existing_entry:
-                        # SCENARIO A: MARKING IN (Create New Record)
-                        attendance_status, color = calculate_attendance_status(AttendanceModel)
-                        
-                        new_entry = AttendanceModel(
-                            student_id=identified_id, 
-                            time_in=current_time, 
-                            status=attendance_status
-                        )
-                        db.session.add(new_entry)
-                        db.session.commit()
-                        
-                        recognized_session[identified_id] = current_time.time()
-                        label_text = f"{attendance_status} IN: {identified_name}"
-                        print(f"[ENTRY] {identified_name} marked {attendance_status}")
-
-                    elif existing_entry and existing_entry.time_out is None:
-                        # SCENARIO B: MARKING OUT (Update Existing Record)
-                        existing_entry.time_out = current_time 
-                        db.session.commit()
-                        
-                        label_text = f"EXIT: {identified_name}"
-                        color = (255, 100, 0) # Orange/Blue for exit
-                        print(f"[EXIT] {identified_name} marked out")
-                        
-                    else:
-                        # SCENARIO C: ALREADY MARKED IN AND OUT
-                        label_text = f"{identified_name} (Completed)"
-                        color = (150, 150, 150) # Gray/Neutral
-                else:
-                    label_text = f"Unknown (Dist: {min_distance:.2f})"
-                    color = (0, 0, 255) # Red
-
-                # Draw Visuals
-                cv2.rectangle(display_frame, (x, y), (x + w, y + h), color, 2)
-                cv2.putText(display_frame, label_text, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
-                
-        except Exception as e:
-            # print(f"Processing error: {e}") 
-            pass
+        for (x, y, w, h), label_text, color, _ in annotations:
+            # Draw Visuals
+            cv2.rectangle(display_frame, (x, y), (x + w, y + h), color, 2)
+            cv2.putText(display_frame, label_text, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
 
         cv2.imshow("Attendance Marker", display_frame)
 
-        if cv2.waitKey(1) == ord('q'): break
+        if cv2.waitKey(1) == ord('q'):
+            pipeline.stop()
 
+    pipeline.join()
+    embedding_service.stop()
+    attendance_writer.stop()
     cap.release()
-    cv2.destroyAllWindows()
-    return {"status": "session_closed"}
\ No newline at end of file
+    if show_window:
+        cv2.destroyAllWindows()
+        
+    metrics = pipeline.metrics()
+    metrics['embedding'] = embedding_service.metrics()
+    metrics['attendance_state'] = attendance_state.metrics()
+    metrics['attendance_writer'] = attendance_writer.metrics()
+    print(f"[INFO] Pipeline metrics: {metrics}")
+    return {"status": "session_closed", "metrics": metrics}
+
+
+# --- MULTI-CAMERA SESSIONS ---
+
+def run_multi_stream_session(db, AttendanceModel, StudentModel, DeepFace, streams, session=None):
+    """
+    Runs attendance for several classrooms at once. `streams` is a list of
+    {"source", "subject_id", "fps"} dicts; all of them share one gallery, one
+    embedding service and one worker pool.
+    """
+    matcher = load_gallery(StudentModel)
+    if not matcher.size:
+        print("[ERROR] No registered faces found. Cannot start attendance.")
+        return {"status": "error", "message": "No registered faces found."}
+    
+    stream_objects = []
+    for stream_id, config in enumerate(streams, start=1):
+        cap = open_frame_source(config['source'])
+        if not cap.isOpened():
+            for opened in stream_objects: opened.source.release()
+            return {"status": "error", "message": f"Failed to open video source {config['source']}."}
+        stream_objects.append(Stream(
+            stream_id, cap, subject_id=config.get('subject_id'), fps_budget=config.get('fps') or DEFAULT_STREAM_FPS,
+            tracker=FaceTracker() if TRACK_FACES else None,
+        ))
+    
+    embedding_service = BatchEmbeddingService.for_deepface(
+        get_recognition_model(), max_batch_size=EMBED_MAX_BATCH_SIZE, max_delay_ms=EMBED_MAX_DELAY_MS
+    ).start()
+    
+    app = current_app._get_current_object()
+    attendance_state = AttendanceState(db, AttendanceModel)
+    attendance_writer = AttendanceWriter(app, db, AttendanceModel).start()
+    
+    def handle_matches(stream, faces):
+        for face in faces:
+            annotation = record_attendance(AttendanceModel, attendance_state, attendance_writer, face, stream.subject_id)
+            if session is not None:
+                session.record(annotation[3], face['student']['name'] if face['student'] else None)
+    
+    scheduler = MultiStreamScheduler(
+        stream_objects,
+        embed_faces=make_face_embedder(embedding_service),
+        matcher=matcher,
+        handle_matches=handle_matches,
+        threshold=matcher.match_threshold(THRESHOLD),
+        workers=PIPELINE_WORKERS,
+        writer_context=app.app_context,
+    ).start()
+    if session is not None:
+        session.attach(scheduler)
+    
+    scheduler.join()
+    embedding_service.stop()
+    attendance_writer.stop()
+    for stream in stream_objects:
+        stream.source.release()
+    
+    metrics = scheduler.metrics()
+    metrics['embedding'] = embedding_service.metrics()
+    metrics['attendance_state'] = attendance_state.metrics()
+    metrics['attendance_writer'] = attendance_writer.metrics()
+    print(f"[INFO] Scheduler metrics: {metrics}")
+    return {"status": "session_closed", "metrics": metrics}
@@ -1,8 +1,13 @@
-from flask import Blueprint, redirect, url_for, flash, render_template, session
-from app.models import Student, Attendance
-from app.recognition import mark_attendance_loop # Import the core logic
+from flask import Blueprint, redirect, url_for, flash, render_template, session, jsonify, request, current_app, Response, stream_with_context
+from app.models import Student, Attendance, Subject
+from app.recognition import mark_attendance_loop, run_multi_stream_session # Import the core logic
 from app import db
-from sqlalchemy import func
+from app import model_registry
+from app.session_manager import session_manager
+from app.aggregates import apply_report_counts, count_new_rows, refresh_daily_rollups
+from app.query_cache import invalidate, ATTENDANCE
+from app.attendance_records import STATUSES, fetch_page, parse_filters, stream_csv, stream_json
+from sqlalchemy import insert, literal, select
 from datetime import datetime
 from functools import wraps # Ensure this is imported
 
@@ -27,71 +32,198 @@ def role_required(*roles):
     return decorator
 
 # --- ABSENTEE MARKING HELPER (Called after session ends) ---
-def mark_absentees_on_exit():
+def mark_absentees_on_exit(subject_id=None):
     """
-    Marks all students who do not have a time_in record for today as Absent.
+    Marks every student without an attendance record for today as Absent, in a
+    single INSERT ... SELECT (no Student rows are loaded).
+    With a subject_id only that subject's students are considered, and only
+    records of that subject count as attendance; without one, the whole school.
+    The absent students' Report rows are updated in the same transaction.
     """
-    today = datetime.now().date()
+    now = datetime.now()
 
-    # Get IDs of all students who ARE marked (Present or Late/Time_in set) today
-    present_or_late_ids = db.session.query(Attendance.student_id).filter(
-        func.date(Attendance.time_in) == today
-    ).distinct().subquery()
+    # Students who already have a record (Present / Late / Absent) today.
+    # NULL ids are excluded because a single NULL makes NOT IN match nothing.
+    marked_ids = select(Attendance.student_id).where(
+        Attendance.date == now.date(),
+        Attendance.student_id.isnot(None)
+    )
+    roster_filter = []
+    if subject_id is not None:
+        marked_ids = marked_ids.where(Attendance.subject_id == subject_id)
+        roster_filter.append(Student.subject_id == subject_id)
 
-    # Get all students who are NOT in the 'present_or_late_ids' subquery
-    absent_students = Student.query.filter(
-        Student.id.notin_(present_or_late_ids)
-    ).all()
+    roster = select(
+        Student.id,
+        literal(subject_id, Attendance.subject_id.type),
+        literal(now.date(), Attendance.date.type),
+        literal(now, Attendance.time_in.type), # Set time_in for the record date reference
+        literal('Absent', Attendance.status.type),
+    ).where(Student.id.not_in(marked_ids), *roster_filter)
 
-    absent_count = 0
-    
-    for student in absent_students:
-        # Create 'Absent' records
-        new_entry = Attendance(
-            student_id=student.id, 
-            time_in=datetime.now(), # Set time_in for the record date reference
-            status='Absent'
-        )
-        db.session.add(new_entry)
-        absent_count += 1
-        
+    absent_ids = db.session.execute(
+        insert(Attendance).from_select(['student_id', 'subject_id', 'date', 'time_in', 'status'], roster)
+        .returning(Attendance.student_id)
+    ).scalars().all()
+    apply_report_counts(db, count_new_rows((student_id, 'Absent') for student_id in absent_ids))
     db.session.commit()
-    return absent_count
+    invalidate(ATTENDANCE)
+    return len(absent_ids)
+
+
+# --- BACKGROUND ATTENDANCE SESSIONS ---
+def run_attendance_session(attendance_session):
+    """Body of a background session: headless recognition, absentee marking, today's rollups."""
+    if attendance_session.streams:
+        result = run_multi_stream_session(
+            db, Attendance, Student, model_registry.get_deepface(),
+            attendance_session.streams, session=attendance_session,
+        )
+    else:
+        result = mark_attendance_loop(
+            db, Attendance, Student, model_registry.get_deepface(),
+            source=attendance_session.source, show_window=False,
+            session=attendance_session, subject_id=attendance_session.subject_id,
+        )
+    if result.get('status') != 'session_closed':
+        raise RuntimeError(result.get('message', 'Attendance session failed.'))
+    
+    if attendance_session.streams:
+        subject_ids = {stream['subject_id'] for stream in attendance_session.streams}
+    else:
+        subject_ids = {attendance_session.subject_id}
+    if None in subject_ids:
+        subject_ids = {None} # an untagged stream covers the whole school
+    result['absent_count'] = sum(mark_absentees_on_exit(subject_id) for subject_id in subject_ids)
+    today = datetime.now().date()
+    refresh_daily_rollups(db, since=today, until=today)
+    return result
+
+
+def parse_source(raw_source):
+    """Camera index, video file path or frame directory from a form/JSON field."""
+    raw_source = (raw_source or '0').strip()
+    return int(raw_source) if raw_source.isdigit() else raw_source
+
+
+def start_background_session(source, subject_id=None, streams=None):
+    return session_manager.start(
+        current_app._get_current_object(), run_attendance_session, source,
+        subject_id=subject_id, started_by=session.get('user_name'), streams=streams,
+    )
 
 
 @attendance_bp.route('/start_attendance_session')
 @role_required('admin', 'teacher')
 def start_attendance_session():
-    """Initiates the synchronous camera feed and marks absentees upon termination."""
-    from deepface import DeepFace 
-    
+    """Starts a headless recognition session on the default camera and returns immediately."""
     try:
-        mark_attendance_loop(db, Attendance, Student, DeepFace)
-        
-        # 1. Finalize Absentees
-        absent_count = mark_absentees_on_exit()
-        flash(f"Attendance session ended. {absent_count} students marked as Absent.", 'info')
-        
+        attendance_session = start_background_session(0)
+        flash(f"Attendance session #{attendance_session.id} started. Live counts are shown on the attendance page.", 'info')
     except Exception as e:
         flash(f"Error starting attendance system: {e}", 'danger')
         
-    return redirect(url_for('dashboard.manage_students')) 
+    return redirect(url_for('dashboard.attendance')) 
+
+
+@attendance_bp.route('/attendance/sessions', methods=['GET', 'POST'])
+@role_required('admin', 'teacher')
+def attendance_sessions():
+    """
+    GET lists sessions. POST starts one from form/JSON fields source + subject_id, or
+    from a JSON "streams" list of {"source", "subject_id", "fps"} for several classrooms.
+    """
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or request.form
+        subject_id = data.get('subject_id')
+        streams = None
+        if isinstance(data.get('streams'), list):
+            streams = [
+                {
+                    'source': parse_source(str(stream.get('source'))),
+                    'subject_id': int(stream['subject_id']) if stream.get('subject_id') else None,
+                    'fps': float(stream['fps']) if stream.get('fps') else None,
+                }
+                for stream in data['streams']
+            ]
+        try:
+            attendance_session = start_background_session(
+                parse_source(data.get('source')),
+                subject_id=int(subject_id) if subject_id else None,
+                streams=streams,
+            )
+        except Exception as e:
+            return jsonify({'error': str(e)}), 409
+        return jsonify(attendance_session.to_dict()), 202
+    
+    return jsonify([s.to_dict() for s in session_manager.list()])
+
+
+@attendance_bp.route('/attendance/sessions/<int:session_id>')
+@role_required('admin', 'teacher')
+def attendance_session_status(session_id):
+    attendance_session = session_manager.get(session_id)
+    if attendance_session is None:
+        return jsonify({'error': 'Session not found.'}), 404
+    return jsonify(attendance_session.to_dict())
+
+
+@attendance_bp.route('/attendance/sessions/<int:session_id>/stop', methods=['POST'])
+@role_required('admin', 'teacher')
+def stop_attendance_session(session_id):
+    attendance_session = session_manager.stop(session_id)
+    if attendance_session is None:
+        return jsonify({'error': 'Session not found.'}), 404
+    return jsonify(attendance_session.to_dict())
 
 
 @attendance_bp.route('/view_attendance_records')
 @role_required('admin', 'teacher')
 def view_attendance_records():
-    """Fetches and displays all attendance records with status."""
+    """
+    Attendance history, one keyset page at a time (?after=<cursor>), filterable by
+    date_from / date_to / subject_id / status.
+    """
+    try:
+        filters = parse_filters(request.args)
+        attendance_records, next_cursor = fetch_page(filters, cursor=request.args.get('after'))
+    except ValueError as e:
+        flash(f"Invalid filter: {e}", 'danger')
+        filters = {}
+        attendance_records, next_cursor = fetch_page(filters)
     
-    attendance_records = db.session.query(
-        Attendance.time_in,
-        Attendance.time_out,
-        Student.name,
-        Student.roll_no,
-        Attendance.status 
-    ).join(Student).order_by(Attendance.time_in.desc()).all()
+    subjects = Subject.query.with_entities(Subject.id, Subject.name).order_by(Subject.name).all()
+    return render_template(
+        'attendance.html', records=attendance_records, next_cursor=next_cursor,
+        filters=filters, subjects=subjects, statuses=STATUSES,
+    )
+
+
+@attendance_bp.route('/attendance/records/export')
+@role_required('admin', 'teacher')
+def export_attendance_records():
+    """Streams every record matching the same filters as CSV (default) or ?format=json."""
+    try:
+        filters = parse_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return render_template('attendance.html', records=attendance_records)
+    if request.args.get('format') == 'json':
+        body, mimetype, extension = stream_json(filters), 'application/json', 'json'
+    else:
+        body, mimetype, extension = stream_csv(filters), 'text/csv', 'csv'
+    
+    filename = f"attendance_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    return Response(
+        stream_with_context(body), mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+# --- MODEL LOAD / MEMORY METRICS (for sizing server workers) ---
+@attendance_bp.route('/attendance/model_metrics')
+@role_required('admin')
+def model_metrics():
+    return jsonify(model_registry.metrics())
 
 # --- ROUTE TO TRIGGER ABSENTEE MARKING MANUALLY ---
 @attendance_bp.route('/mark_absentees', methods=['POST'])
@@ -100,6 +232,8 @@ def mark_absentees():
     """Administrative trigger for absentee marking."""
     try:
         absent_count = mark_absentees_on_exit()
+        today = datetime.now().date()
+        refresh_daily_rollups(db, since=today, until=today)
         flash(f"{absent_count} students were successfully marked as Absent.", 'warning')
     except Exception as e:
         flash("Failed to mark absentees. Ensure the attendance window is closed.", 'danger')
@@ -1,6 +1,13 @@
-from flask import Blueprint, request, redirect, url_for, flash, render_template, session
+import os
+import shutil
+import tempfile
+import zipfile
+from flask import Blueprint, request, redirect, url_for, flash, render_template, session, jsonify, current_app
 from app.models import Student, Teacher
 from app import db
+from app.embedding_index import sync_student, remove_student
+from app.query_cache import invalidate, STUDENTS, TEACHERS
+from app.bulk_enroll import PHOTO_EXTENSIONS, start_enrollment_job, get_enrollment_job
 
 crud_bp = Blueprint('crud', __name__)
 
@@ -36,6 +43,7 @@ def add_teacher():
         new_user = Teacher(name=name, email=email, contact=contact, password=password)   
         db.session.add(new_user)
         db.session.commit()
+        invalidate(TEACHERS)
         flash('Teacher Added Successfully.', 'success')
         return redirect(url_for('dashboard.manage_teacher'))
     
@@ -66,6 +74,7 @@ def update_teacher(teacher_id):
         updated_teacher.password = password
     
         db.session.commit()
+        invalidate(TEACHERS)
     
         flash(f"Teacher data for {name} updated successfully.", "success")
         return redirect(url_for("dashboard.manage_teacher"))
@@ -84,6 +93,7 @@ def delete_teacher(teacher_id):
     try:
         db.session.delete(deleted_teacher)
         db.session.commit()
+        invalidate(TEACHERS)
         flash(f"Teacher '{teacher}' successfully deleted.", 'success')
         
     except Exception as e:
@@ -112,6 +122,7 @@ def add_student():
         new_user = Student(name=name, email=email, roll_no=roll_no, contact=contact, password=password)   
         db.session.add(new_user)
         db.session.commit()
+        invalidate(STUDENTS)
         flash('Student Added Successfully.', 'success')
         return redirect(url_for('dashboard.manage_students'))
     
@@ -146,6 +157,8 @@ def update_student(student_id):
         updated_student.password = password
     
         db.session.commit()
+        sync_student(updated_student)
+        invalidate(STUDENTS)
     
         flash(f"Student data for {name} updated successfully.", "success")
         return redirect(url_for("dashboard.manage_students"))
@@ -160,10 +173,13 @@ def delete_student(student_id):
 
      
     student = deleted_student.name
+    student_id = deleted_student.id
     
     try:
         db.session.delete(deleted_student)
         db.session.commit()
+        remove_student(student_id)
+        invalidate(STUDENTS)
         flash(f"Student '{student}' successfully deleted.", 'success')
         
     except Exception as e:
@@ -172,7 +188,59 @@ def delete_student(student_id):
         flash("An error occurred during deletion.", 'danger')
     
     return redirect(url_for("dashboard.manage_students"))
-        
 
+#route for importing a roster CSV with a folder (or zip) of photos via admin
+@crud_bp.route('/dashboard/students/bulk_enroll', methods=["GET", "POST"])
+@role_required("admin")
+def bulk_enroll():
+    if request.method == "POST":
+        roster = request.files.get('roster')
+        photos = request.files.get('photos')
+        photo_dir = (request.form.get('photo_dir') or '').strip()
+        
+        if not roster or not roster.filename:
+            flash('Please choose a roster CSV file.', 'error')
+            return redirect(url_for('crud.bulk_enroll'))
+        roster_text = roster.read().decode('utf-8-sig', errors='replace')
         
-        
\ No newline at end of file
+        cleanup = None
+        if photos and photos.filename:
+            # Unpack only the images, flattened into a scratch folder that the job removes when done
+            photo_dir = tempfile.mkdtemp(prefix='bulk-enroll-')
+            cleanup = lambda: shutil.rmtree(photo_dir, ignore_errors=True)
+            try:
+                with zipfile.ZipFile(photos) as archive:
+                    for member in archive.infolist():
+                        name = os.path.basename(member.filename)
+                        if member.is_dir() or not name.lower().endswith(PHOTO_EXTENSIONS):
+                            continue
+                        with archive.open(member) as src, open(os.path.join(photo_dir, name), 'wb') as dst:
+                            shutil.copyfileobj(src, dst)
+            except zipfile.BadZipFile:
+                cleanup()
+                flash('The photos upload must be a .zip archive.', 'error')
+                return redirect(url_for('crud.bulk_enroll'))
+        elif not os.path.isdir(photo_dir):
+            flash('Upload a zip of photos or give a photo folder on the server.', 'error')
+            return redirect(url_for('crud.bulk_enroll'))
+        
+        job = start_enrollment_job(
+            current_app._get_current_object(), roster_text, photo_dir,
+            approved=request.form.get('approved', 'on') == 'on',
+            started_by=session.get('user_name'), cleanup=cleanup,
+        )
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify(job.to_dict()), 202
+        flash(f'Bulk enrollment #{job.id} started.', 'info')
+        return redirect(url_for('crud.bulk_enroll', job_id=job.id))
+    
+    return render_template("bulk_enroll.html", job_id=request.args.get('job_id', type=int))
+
+#progress of a bulk enrollment (polled by the bulk enroll page)
+@crud_bp.route('/dashboard/students/bulk_enroll/<int:job_id>')
+@role_required("admin")
+def bulk_enroll_status(job_id):
+    job = get_enrollment_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Enrollment job not found.'}), 404
+    return jsonify(job.to_dict())
@@ -1,6 +1,8 @@
 from flask import Blueprint,request, render_template, session, redirect, url_for, flash
-from app.models import  Teacher, Student, Attendance
+from app.models import  Teacher, Student, Report
 from app import db
+from app.embedding_index import remove_student
+from app.query_cache import cached, invalidate, STUDENTS, TEACHERS, ATTENDANCE
 
 dashboard_bp = Blueprint('dashboard', __name__, template_folder='../templates')
 
@@ -22,8 +24,8 @@ def login_required(*roles):
 @dashboard_bp.route('/dashboard/admin')
 @login_required('admin')
 def admin_dashboard():
-    all_students = Student.query.all()
-    return render_template('admin_dashboard.html',  students=all_students)
+    # The dashboard is a static menu: it never rendered the student list it used to load
+    return render_template('admin_dashboard.html')
 
 @dashboard_bp.route('/dashboard/teachers')
 @login_required('admin')
@@ -46,10 +48,24 @@ def attendance():
 @dashboard_bp.route('/dashboard/report')
 @login_required("admin", "teacher")
 def report():
-    all_teacher = Teacher.query.all()
-    all_students = Student.query.all()
-    attend = Attendance.query.all()
-    return render_template('report.html',  teachers=all_teacher, students=all_students, attendances=attend)
+    # Precomputed per-student totals (kept current by the attendance writer, see app/aggregates.py),
+    # cached until a student or attendance write invalidates them
+    student_reports = cached('dashboard:student_reports', load_student_reports, tags=(STUDENTS, ATTENDANCE))
+    return render_template('student_reports.html', reports=student_reports)
+
+def load_student_reports():
+    rows = db.session.query(
+        Student.id,
+        Student.name,
+        Student.roll_no,
+        Report.total_classes,
+        Report.attended_classes,
+        Report.attendance_percentage,
+        Report.avg_emotion_score,
+        Report.avg_liveness_score,
+        Report.last_updated,
+    ).outerjoin(Report, Report.student_id == Student.id).order_by(Student.roll_no)
+    return [row._asdict() for row in rows]
 
 
 @dashboard_bp.route('/admin/requests', methods=['GET', 'POST'])
@@ -72,10 +88,14 @@ def pending_requests():
             if action == 'approve':
                 user.is_approved = True
                 db.session.commit()
+                invalidate(STUDENTS if Model is Student else TEACHERS)
                 flash(f"{user.name} approved.", 'success')
             elif action == 'reject':
                 db.session.delete(user) # Optionally delete the user
                 db.session.commit()
+                invalidate(STUDENTS if Model is Student else TEACHERS)
+                if Model is Student:
+                    remove_student(user.id)
                 flash(f"{user.name} rejected and removed.", 'info')
 
         return redirect(url_for('dashboard.pending_requests'))
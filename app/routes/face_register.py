@@ -2,6 +2,8 @@ from flask import Blueprint, redirect, url_for, flash
 from app.models import Student
 from app.enroll_face import capture_embedding, check_face_duplicate
 from app import db 
+from app.embedding_index import sync_student
+from app.query_cache import invalidate, STUDENTS
 
 face_register_bp = Blueprint('face_register', __name__)
 
@@ -21,14 +23,18 @@ def register_face(roll_no):
         flash("Face capture failed. Try again!", "danger")
         return redirect(url_for("face_register.register_face"))
      
-    duplicate_name= check_face_duplicate(new_embedding_blob, roll_no)
+    duplicates = check_face_duplicate(new_embedding_blob, roll_no)
     
-    if duplicate_name:
-        flash(f"Face Registration Failed. This face is already registered as '{duplicate_name}'.", "error")
+    if duplicates:
+        closest = duplicates[0]
+        flash(f"Face Registration Failed. This face is already registered as '{closest['name']}' "
+              f"(Roll No: {closest['roll_no']}, distance {closest['distance']:.2f}).", "error")
         return redirect(url_for("dashboard.manage_students"))
     
     student.face_embedding = new_embedding_blob
     db.session.commit()
+    sync_student(student)
+    invalidate(STUDENTS)
 
     flash(f"Face registered successfully for {student.name}!", "success")
     return redirect(url_for("dashboard.manage_students"))
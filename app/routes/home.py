@@ -1,9 +1,8 @@
 from flask import Blueprint, render_template
-from app.models import Student
 
 home_bp = Blueprint('home', __name__)
 
 @home_bp.route('/')
 def home():
-    all_students = Student.query.all()
-    return render_template("home.html", students=all_students)
\ No newline at end of file
+    # Public landing page: static, so it does not query the database (it never rendered the student list)
+    return render_template("home.html")
\ No newline at end of file
@@ -1,6 +1,7 @@
 from flask import  Blueprint, request, render_template, flash, redirect, url_for
 from app import db
 from app.models import Admin, Teacher, Student
+from app.query_cache import invalidate, STUDENTS, TEACHERS
 
 
 # creating blueprint 
@@ -52,6 +53,7 @@ def register():
             
             db.session.add(new_user)
             db.session.commit()
+            invalidate(TEACHERS)
             flash('Account created successfully. Awaiting Admin approval before login.', 'info')
         
         #for registering student    
@@ -72,6 +74,7 @@ def register():
             
             db.session.add(new_user)
             db.session.commit()
+            invalidate(STUDENTS)
             flash('Account created successfully. Awaiting Admin approval before login.', 'info')
             
         else:
@@ -1,8 +1,10 @@
-from flask import Blueprint, render_template, session, redirect, url_for, flash
-from app.models import Admin, Teacher, Student, Attendance # Import all models
+from flask import Blueprint, render_template, session, redirect, url_for, flash, request, jsonify
+from app.models import Admin, Teacher, Student, Attendance, DailyRollup # Import all models
 from app import db # Database instance
-from datetime import datetime
-from sqlalchemy import func # For database functions like counting and dates
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from app.aggregates import rollup_trends
+from app.query_cache import cached, cache_stats, STUDENTS, TEACHERS, ATTENDANCE
 
 report_bp = Blueprint('report', __name__)
 
@@ -29,32 +31,9 @@ def view_reports():
     today_db = datetime.now().date()
     
     try:
-        # 1. Fetch Summary Counts 
-        total_teachers = db.session.query(Teacher).count()
-        total_students = db.session.query(Student).count()
-        total_attendance_entries = db.session.query(Attendance).count()
-        
-        # 2. Fetch Attendance Metrics 
-        present_today = db.session.query(Attendance).filter(
-            func.date(Attendance.timestamp) == today_db,
-            Attendance.status.in_(['Present', 'Late'])
-        ).count()
-
-        late_today = db.session.query(Attendance).filter(
-            func.date(Attendance.timestamp) == today_db,
-            Attendance.status == 'Late'
-        ).count()
-
-        # 3. Compile Data Dictionary
-        report_data = {
-            'total_teachers': total_teachers,
-            'total_students': total_students,
-            'total_entries': total_attendance_entries,
-            'present_today': present_today,
-            'late_today': late_today,
-            'recently_added_students': Student.query.order_by(Student.id.desc()).limit(5).all(),
-            'all_unapproved_teachers': Teacher.query.filter_by(is_approved=False).all()
-        }
+        # Served from the query cache until a student, teacher or attendance write invalidates it
+        report_data = cached(f'reports:summary:{today_date_str}', lambda: load_report_summary(today_db),
+                             tags=(STUDENTS, TEACHERS, ATTENDANCE))
 
     except Exception as e:
         print(f"REPORT GENERATION ERROR: {e}")
@@ -63,9 +42,73 @@ def view_reports():
         # Return default data structure on failure
         report_data = {
             'total_teachers': 0, 'total_students': 0, 'total_entries': 0,
-            'present_today': 0, 'late_today': 0,
+            'present_today': 0, 'late_today': 0, 'rollups_updated': None,
             'recently_added_students': [], 'all_unapproved_teachers': []
         }
 
     # 4. CRITICAL FIX: Ensure template name matches the file, and pass the date
-    return render_template('report.html', data=report_data, today_date=today_date_str)
\ No newline at end of file
+    return render_template('report.html', data=report_data, today_date=today_date_str)
+
+def load_report_summary(today_db):
+    # 1 + 2. Summary counts and today's metrics in one query; attendance figures come
+    # from the daily rollups (refreshed at session close / `flask backfill-rollups`)
+    def rollup_total(*conditions):
+        return select(func.coalesce(func.sum(DailyRollup.count), 0)).where(*conditions).scalar_subquery()
+
+    summary = db.session.query(
+        select(func.count(Teacher.id)).scalar_subquery(),
+        select(func.count(Student.id)).scalar_subquery(),
+        rollup_total(),
+        rollup_total(DailyRollup.date == today_db, DailyRollup.status.in_(['Present', 'Late'])),
+        rollup_total(DailyRollup.date == today_db, DailyRollup.status == 'Late'),
+        select(func.max(DailyRollup.updated_at)).scalar_subquery(),
+    ).one()
+    total_teachers, total_students, total_attendance_entries, present_today, late_today, rollups_updated = summary
+
+    # 3. Compile Data Dictionary (plain values only, so it can be cached)
+    recent_students = db.session.query(Student.name, Student.roll_no, Student.has_face_embedding).order_by(Student.id.desc()).limit(5)
+    unapproved_teachers = db.session.query(Teacher.name, Teacher.email).filter_by(is_approved=False)
+    return {
+        'total_teachers': total_teachers,
+        'total_students': total_students,
+        'total_entries': total_attendance_entries,
+        'present_today': present_today,
+        'late_today': late_today,
+        'rollups_updated': rollups_updated,
+        'recently_added_students': [row._asdict() for row in recent_students],
+        'all_unapproved_teachers': [row._asdict() for row in unapproved_teachers],
+    }
+
+# --- QUERY CACHE STATISTICS ---
+@report_bp.route('/reports/cache_stats')
+@role_required('admin')
+def query_cache_stats():
+    return jsonify(cache_stats())
+
+# --- ATTENDANCE TRENDS (served from the daily rollups) ---
+TREND_PERIODS = {'day': 30, 'week': 12 * 7, 'month': 365}   # default look-back in days per grouping
+
+@report_bp.route('/reports/trends')
+@role_required('admin', 'teacher')
+def attendance_trends():
+    """
+    Present / Late / Absent per day, week or month (?period=), optionally for one
+    subject_id and between since / until (YYYY-MM-DD). ?format=json returns the rows.
+    """
+    period = request.args.get('period', 'week')
+    if period not in TREND_PERIODS:
+        period = 'week'
+    try:
+        until = datetime.strptime(request.args['until'], '%Y-%m-%d').date() if request.args.get('until') else datetime.now().date()
+        since = datetime.strptime(request.args['since'], '%Y-%m-%d').date() if request.args.get('since') else until - timedelta(days=TREND_PERIODS[period])
+        subject_id = int(request.args['subject_id']) if request.args.get('subject_id') else None
+    except ValueError:
+        flash("Invalid date or subject filter.", 'danger')
+        return redirect(url_for('report.attendance_trends'))
+
+    trends = cached(f'reports:trends:{period}:{since}:{until}:{subject_id}',
+                    lambda: rollup_trends(db, since, until, period=period, subject_id=subject_id),
+                    tags=(ATTENDANCE,))
+    if request.args.get('format') == 'json':
+        return jsonify(trends)
+    return render_template('report_trends.html', trends=trends, period=period, since=since, until=until, subject_id=subject_id)
@@ -0,0 +1,224 @@
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+from app.pipeline import StageStats, build_faces
+
+
+# --- CONFIGURATION ---
+DEFAULT_STREAM_FPS = 5.0   # frames per second each classroom may send to the shared workers
+STREAM_QUEUE_SIZE = 2      # frames buffered per stream before backpressure applies
+
+
+# --- STREAM ---
+class Stream:
+    """One video source tagged with the Subject whose attendance it records."""
+
+    def __init__(self, stream_id, source, subject_id=None, fps_budget=DEFAULT_STREAM_FPS, queue_size=STREAM_QUEUE_SIZE, tracker=None):
+        self.id = stream_id
+        self.source = source
+        self.subject_id = subject_id
+        self.fps_budget = fps_budget
+        self.live = getattr(source, "live", True)
+        self.frames = deque()
+        self.queue_size = queue_size
+        self.tracker = tracker        # optional FaceTracker, one per camera
+        self.next_slot = 0.0          # earliest time the dispatcher may hand out this stream's next frame
+        self.exhausted = False
+        self.stats = {name: StageStats(name) for name in ("capture", "processed", "faces", "end_to_end")}
+
+    def metrics(self, elapsed):
+        data = {name: stats.snapshot(elapsed) for name, stats in self.stats.items()}
+        data["subject_id"] = self.subject_id
+        data["source"] = getattr(self.source, "name", str(self.source))
+        data["fps_budget"] = self.fps_budget
+        data["queued"] = len(self.frames)
+        if self.tracker is not None:
+            data["tracking"] = self.tracker.metrics()
+        return data
+
+
+# --- SCHEDULER ---
+class MultiStreamScheduler:
+    """
+    Interleaves frames from several classroom streams into one shared pool of
+    detect/embed workers (and therefore one model instance).
+
+    - Each stream has its own capture thread and a small frame buffer. Live streams evict
+      their oldest buffered frame when full; file streams block (backpressure).
+    - Workers take frames round-robin across streams, skipping any stream that has used its
+      `fps_budget`, so a busy camera cannot starve the others.
+    - Workers embed and match; a single writer thread calls handle_matches(stream, faces).
+
+    Exposes stop() / is_running() / metrics() like AttendancePipeline, so a background
+    AttendanceSession can drive either.
+    """
+
+    def __init__(self, streams, embed_faces, matcher, handle_matches, threshold, workers=2, writer_context=None):
+        self.streams = list(streams)
+        self.embed_faces = embed_faces
+        self.matcher = matcher
+        self.handle_matches = handle_matches
+        self.threshold = threshold
+        self.workers = workers
+        self.writer_context = writer_context or nullcontext
+
+        self.results = queue.Queue(maxsize=4 * workers)
+        self._cond = threading.Condition()
+        self._cursor = 0
+        self._stop = threading.Event()
+        self._threads = []
+        self._workers_left = workers
+        self._started_at = None
+
+    # --- lifecycle ---
+    def start(self):
+        self._started_at = time.monotonic()
+        targets = [(self._capture, (stream,), f"capture-{stream.id}") for stream in self.streams]
+        targets += [(self._work, (), f"worker-{i}") for i in range(self.workers)]
+        targets += [(self._write, (), "write")]
+
+        for target, args, name in targets:
+            thread = threading.Thread(target=target, args=args, name=f"scheduler-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def is_running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def run(self):
+        self.start()
+        self.join()
+        return self.metrics()
+
+    def metrics(self):
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "streams": {stream.id: stream.metrics(elapsed) for stream in self.streams},
+        }
+
+    # --- capture (one thread per stream) ---
+    def _capture(self, stream):
+        stats = stream.stats["capture"]
+        try:
+            while not self._stop.is_set():
+                start = time.monotonic()
+                ret, frame = stream.source.read()
+                if not ret:
+                    break
+                stats.record(time.monotonic() - start)
+
+                with self._cond:
+                    while not stream.live and len(stream.frames) >= stream.queue_size and not self._stop.is_set():
+                        self._cond.wait(0.1)
+                    if len(stream.frames) >= stream.queue_size:
+                        stream.frames.popleft()
+                        stats.drop()
+                    stream.frames.append((time.monotonic(), frame))
+                    self._cond.notify_all()
+        except Exception as e:
+            print(f"[WARN] Stream {stream.id} capture failed: {e}")
+        finally:
+            with self._cond:
+                stream.exhausted = True
+                self._cond.notify_all()
+
+    # --- fair dispatch ---
+    def _next_frame(self):
+        """Round-robin over streams with a frame ready and budget left. None when all are done."""
+        with self._cond:
+            while True:
+                if self._stop.is_set():
+                    return None
+
+                now = time.monotonic()
+                count = len(self.streams)
+                wake_at = None
+                for offset in range(count):
+                    stream = self.streams[(self._cursor + offset) % count]
+                    if not stream.frames:
+                        continue
+                    if stream.next_slot > now:
+                        wake_at = min(wake_at or stream.next_slot, stream.next_slot)
+                        continue
+
+                    self._cursor = (self._cursor + offset + 1) % count
+                    if stream.fps_budget:
+                        stream.next_slot = max(stream.next_slot, now - 1.0 / stream.fps_budget) + 1.0 / stream.fps_budget
+                    captured_at, frame = stream.frames.popleft()
+                    self._cond.notify_all()
+                    return stream, captured_at, frame
+
+                if all(stream.exhausted and not stream.frames for stream in self.streams):
+                    return None
+                self._cond.wait(None if wake_at is None else max(0.0, wake_at - now))
+
+    # --- shared workers ---
+    def _work(self):
+        try:
+            while True:
+                item = self._next_frame()
+                if item is None:
+                    return
+
+                stream, captured_at, frame = item
+                start = time.monotonic()
+                try:
+                    faces = self._recognize(stream, frame)
+                except Exception as e:
+                    print(f"[WARN] Stream {stream.id} recognition failed: {e}")
+                    continue
+
+                stream.stats["processed"].record(time.monotonic() - start)
+                self.results.put((stream, captured_at, faces))
+        finally:
+            with self._cond:
+                self._workers_left -= 1
+                if self._workers_left == 0:
+                    self.results.put(None)
+
+    def _recognize(self, stream, frame):
+        if stream.tracker is None:
+            boxes, embeddings = self.embed_faces(frame)
+            return build_faces(self.matcher, self.threshold, boxes, embeddings)
+
+        boxes, crops = self.embed_faces.detect(frame)
+        tracks, needed = stream.tracker.update(boxes)
+        embedded_tracks = [tracks[i] for i in needed]
+        try:
+            embeddings = self.embed_faces.embed([crops[i] for i in needed]) if needed else []
+            faces = build_faces(self.matcher, self.threshold, [boxes[i] for i in needed], embeddings)
+        except Exception:
+            stream.tracker.release(embedded_tracks)
+            raise
+        return stream.tracker.resolve(embedded_tracks, faces, tracks)
+
+    # --- single DB writer ---
+    def _write(self):
+        with self.writer_context():
+            while True:
+                item = self.results.get()
+                if item is None:
+                    return
+
+                stream, captured_at, faces = item
+                start = time.monotonic()
+                try:
+                    self.handle_matches(stream, faces)
+                except Exception as e:
+                    print(f"[WARN] Attendance write failed for stream {stream.id}: {e}")
+                stream.stats["faces"].record(time.monotonic() - start, items=len(faces))
+                stream.stats["end_to_end"].record(time.monotonic() - captured_at)
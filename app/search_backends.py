@@ -0,0 +1,135 @@
+import numpy as np
+
+from app.matcher import GalleryMatcher, l2_normalize
+from app.quantization import QuantizedRows, quantize_gallery
+
+
+# --- CONFIGURATION ---
+IVF_NPROBE = 8            # coarse clusters scanned per query
+IVF_TRAIN_ITERATIONS = 10
+IVF_TRAIN_SAMPLE = 64     # training points per cluster (k-means runs on a sample)
+
+
+# --- EXACT BACKEND ---
+class ExactSearch(GalleryMatcher):
+    """Brute-force cosine search over the whole gallery (the reference for recall)."""
+
+    name = "exact"
+
+
+# --- APPROXIMATE BACKEND ---
+class IVFSearch(GalleryMatcher):
+    """
+    Inverted-file search: the gallery is split into `nlist` clusters by spherical k-means
+    and each query only scans the rows of its `nprobe` closest clusters. Rows are copied
+    into cluster order once at build time so every probed list is a contiguous slice.
+    """
+
+    name = "ivf"
+
+    def _build(self, nlist=None, nprobe=IVF_NPROBE, seed=0, **options):
+        size = self.size
+        self.nlist = max(1, min(nlist or int(4 * np.sqrt(size)), size))
+        self.nprobe = max(1, min(nprobe, self.nlist))
+
+        if size == 0:
+            self.centroids = np.zeros((0, 0), dtype=np.float32)
+            self.list_offsets = np.zeros(1, dtype=np.int64)
+            self.list_rows = np.zeros(0, dtype=np.int64)
+            self.list_vectors = self.gallery
+            return
+
+        rng = np.random.default_rng(seed)
+        sample_size = min(size, self.nlist * IVF_TRAIN_SAMPLE)
+        sample = np.asarray(self.gallery[np.sort(rng.choice(size, sample_size, replace=False))])
+
+        centroids = sample[rng.choice(sample_size, self.nlist, replace=False)]
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~np.any(sums, axis=1)
+            sums[empty] = centroids[empty]
+            centroids = l2_normalize(sums)
+        self.centroids = centroids
+
+        assignment = self._assign(self.gallery)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=self.nlist)
+
+        self.list_offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.list_rows = order
+        self.list_vectors = self.gallery[order]
+        if not isinstance(self.list_vectors, QuantizedRows):
+            self.list_vectors = np.ascontiguousarray(self.list_vectors)
+
+    def _assign(self, vectors, chunk=65536):
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk):
+            block = np.asarray(vectors[start:start + chunk])
+            assignment[start:start + chunk] = np.argmax(block @ self.centroids.T, axis=1)
+        return assignment
+
+    def match(self, live_embeddings, k=1):
+        if self.size == 0:
+            raise ValueError("gallery is empty")
+
+        k = max(1, min(k, self.size))
+        live = self.prepare(live_embeddings) if len(live_embeddings) else np.zeros((0, self.dim), np.float32)
+
+        indices = np.zeros((len(live), k), dtype=np.int64)
+        distances = np.ones((len(live), k), dtype=np.float32)
+        if not len(live):
+            return indices, distances
+
+        probes = np.argsort(-(live @ self.centroids.T), axis=1)[:, :self.nprobe]
+
+        for q, query in enumerate(live):
+            slices = [slice(self.list_offsets[c], self.list_offsets[c + 1]) for c in probes[q]]
+            rows = np.concatenate([self.list_rows[s] for s in slices])
+            dist = 1.0 - np.concatenate([self.list_vectors[s] @ query for s in slices])
+
+            found = min(k, len(rows))
+            if found == 0:
+                continue
+            top = np.argpartition(dist, found - 1)[:found] if found < len(rows) else np.arange(found)
+            top = top[np.argsort(dist[top])]
+
+            indices[q, :found] = rows[top]
+            distances[q, :found] = dist[top]
+            # Not enough candidates in the probed lists: pad with the best hit.
+            indices[q, found:] = rows[top[0]]
+
+        return indices, distances
+
+
+BACKENDS = {backend.name: backend for backend in (ExactSearch, IVFSearch)}
+
+
+# --- FACTORY & EVALUATION ---
+def build_search_backend(name, gallery, metadata, precision="float32", projection=None, **options):
+    """
+    Builds the configured backend over an already L2-normalized gallery, optionally
+    projected to fewer dimensions (see app.projection) and held in `precision`
+    ("float32", or "float16" / "int8" to keep it quantized in memory).
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"unknown search backend '{name}' (choose from {', '.join(BACKENDS)})")
+    if projection is not None and len(metadata):
+        gallery = l2_normalize(projection.transform(gallery))
+    return BACKENDS[name].from_normalized(quantize_gallery(gallery, precision), metadata, projection=projection, **options)
+
+
+def recall_at_k(backend, queries, k=1, reference=None):
+    """
+    Fraction of the exact top-k neighbours that `backend` also returns in its top-k.
+    `reference` defaults to an ExactSearch over the same gallery.
+    """
+    if reference is None:
+        reference = ExactSearch.from_normalized(backend.gallery, backend.metadata, projection=backend.projection)
+
+    expected, _ = reference.match(queries, k=k)
+    found, _ = backend.match(queries, k=k)
+
+    hits = sum(len(set(e) & set(f)) for e, f in zip(expected, found))
+    return hits / expected.size if expected.size else 1.0
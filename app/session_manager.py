@@ -0,0 +1,149 @@
+import itertools
+import threading
+import traceback
+from collections import deque
+from datetime import datetime
+
+
+# --- CONFIGURATION ---
+MAX_CONCURRENT_SESSIONS = 8
+RECENT_EVENTS = 20        # recognition events kept per session for the dashboard
+
+
+# --- SESSION ---
+class AttendanceSession:
+    """
+    One headless recognition run. Counters are updated by the pipeline's writer
+    thread and read by the status endpoint, so every access goes through `lock`.
+    """
+
+    def __init__(self, session_id, source, subject_id=None, started_by=None, streams=None):
+        self.id = session_id
+        self.source = source
+        self.subject_id = subject_id
+        self.streams = streams    # several {"source", "subject_id", "fps"} for a multi-camera session
+        self.started_by = started_by
+        self.status = "starting"   # starting -> running -> stopping -> finished | failed
+        self.created_at = datetime.now()
+        self.finished_at = None
+        self.error = None
+        self.result = None
+        self.counts = {"faces": 0, "recognized": 0, "unknown": 0, "in": 0, "out": 0, "completed": 0}
+        self.events = deque(maxlen=RECENT_EVENTS)
+        self.pipeline = None
+        self.stop_requested = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def record(self, event, name=None):
+        """Called once per matched face with event in / out / completed / unknown."""
+        with self.lock:
+            self.counts["faces"] += 1
+            if event == "unknown":
+                self.counts["unknown"] += 1
+                return
+            self.counts["recognized"] += 1
+            self.counts[event] += 1
+            if event in ("in", "out"):
+                self.events.appendleft({"time": datetime.now().strftime("%H:%M:%S"), "event": event, "name": name})
+
+    def attach(self, pipeline):
+        """`pipeline` is an AttendancePipeline or MultiStreamScheduler (stop/metrics)."""
+        self.pipeline = pipeline
+        with self.lock:
+            self.status = "running"
+        if self.stop_requested.is_set():
+            pipeline.stop()
+
+    def stop(self):
+        self.stop_requested.set()
+        with self.lock:
+            if self.status in ("starting", "running"):
+                self.status = "stopping"
+        if self.pipeline is not None:
+            self.pipeline.stop()
+
+    @property
+    def active(self):
+        return self.status in ("starting", "running", "stopping")
+
+    def to_dict(self):
+        with self.lock:
+            data = {
+                "id": self.id,
+                "source": ", ".join(str(s["source"]) for s in self.streams) if self.streams else str(self.source),
+                "subject_id": self.subject_id,
+                "status": self.status,
+                "created_at": self.created_at.isoformat(timespec="seconds"),
+                "finished_at": self.finished_at.isoformat(timespec="seconds") if self.finished_at else None,
+                "counts": dict(self.counts),
+                "events": list(self.events),
+                "error": self.error,
+                "result": self.result,
+            }
+        if self.pipeline is not None:
+            data["metrics"] = self.pipeline.metrics()
+        return data
+
+
+# --- MANAGER ---
+class SessionManager:
+    """
+    Runs attendance sessions on background threads so no HTTP worker is held for a
+    class period. Sessions live in this process: run the web server with a single
+    worker process (and as many threads as needed) so status requests see them.
+    """
+
+    def __init__(self, max_sessions=MAX_CONCURRENT_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self, app, run_session, source, subject_id=None, started_by=None, streams=None):
+        """
+        Starts `run_session(session)` on a new thread inside an app context.
+        Raises RuntimeError when the concurrent session limit is reached.
+        """
+        with self._lock:
+            running = [s for s in self._sessions.values() if s.active]
+            if len(running) >= self.max_sessions:
+                raise RuntimeError(f"{len(running)} sessions already running (limit {self.max_sessions})")
+
+            session = AttendanceSession(next(self._ids), source, subject_id, started_by, streams)
+            self._sessions[session.id] = session
+
+        def target():
+            try:
+                with app.app_context():
+                    session.result = run_session(session)
+                status = "finished"
+            except Exception as e:
+                traceback.print_exc()
+                session.error = str(e)
+                status = "failed"
+            with session.lock:
+                session.status = status
+                session.finished_at = datetime.now()
+
+        session.thread = threading.Thread(target=target, name=f"attendance-session-{session.id}", daemon=True)
+        session.thread.start()
+        return session
+
+    def get(self, session_id):
+        return self._sessions.get(session_id)
+
+    def stop(self, session_id):
+        session = self.get(session_id)
+        if session is not None:
+            session.stop()
+        return session
+
+    def list(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return sorted(sessions, key=lambda s: s.id, reverse=True)
+
+
+# Process-wide manager used by the attendance routes
+session_manager = SessionManager()
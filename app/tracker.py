@@ -0,0 +1,153 @@
+import itertools
+import threading
+import time
+
+
+# --- CONFIGURATION ---
+IOU_THRESHOLD = 0.3            # minimum box overlap to continue a track
+REFRESH_SECONDS = 10.0         # confident tracks are re-embedded this often anyway
+LOW_CONFIDENCE_DISTANCE = 0.35 # identities farther than this (or unknown) count as low confidence
+RETRY_SECONDS = 0.5            # how often a low-confidence track may be re-embedded
+MAX_MISSED_SECONDS = 1.5       # tracks not seen for this long are dropped
+
+
+def box_iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    inter_w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    inter_h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = inter_w * inter_h
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    __slots__ = ("id", "box", "student", "distance", "last_seen", "last_embedded", "pending")
+
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = box
+        self.student = None
+        self.distance = 1.0
+        self.last_seen = now
+        self.last_embedded = None
+        self.pending = False     # an embedding for this track is in flight
+
+
+# --- TRACKER ---
+class FaceTracker:
+    """
+    Greedy IoU association of face boxes across frames. Each face gets a track id;
+    update() says which faces actually need the model (new tracks, low-confidence
+    identities, or tracks due for a refresh) and every other face reuses its
+    track's cached identity.
+    """
+
+    def __init__(self, iou_threshold=IOU_THRESHOLD, refresh_seconds=REFRESH_SECONDS,
+                 low_confidence_distance=LOW_CONFIDENCE_DISTANCE, retry_seconds=RETRY_SECONDS,
+                 max_missed_seconds=MAX_MISSED_SECONDS):
+        self.iou_threshold = iou_threshold
+        self.refresh_seconds = refresh_seconds
+        self.low_confidence_distance = low_confidence_distance
+        self.retry_seconds = retry_seconds
+        self.max_missed_seconds = max_missed_seconds
+
+        self.tracks = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+        self.faces_seen = 0
+        self.faces_embedded = 0
+        self.tracks_created = 0
+
+    def _needs_embedding(self, track, now):
+        if track.pending:
+            return False
+        if track.last_embedded is None:
+            return True
+        since = now - track.last_embedded
+        if track.student is None or track.distance > self.low_confidence_distance:
+            return since >= self.retry_seconds
+        return since >= self.refresh_seconds
+
+    def update(self, boxes, now=None):
+        """
+        Associates this frame's boxes with existing tracks.
+        Returns (tracks, needed): tracks[i] belongs to boxes[i], and needed lists the
+        indices whose crops must be embedded (those tracks are marked pending).
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.tracks = [t for t in self.tracks if now - t.last_seen <= self.max_missed_seconds]
+
+            pairs = sorted(
+                ((box_iou(track.box, box), t_idx, b_idx)
+                 for t_idx, track in enumerate(self.tracks) for b_idx, box in enumerate(boxes)),
+                reverse=True,
+            )
+            assigned = [None] * len(boxes)
+            used_tracks = set()
+            for iou, t_idx, b_idx in pairs:
+                if iou < self.iou_threshold:
+                    break
+                if t_idx in used_tracks or assigned[b_idx] is not None:
+                    continue
+                used_tracks.add(t_idx)
+                assigned[b_idx] = self.tracks[t_idx]
+
+            needed = []
+            for b_idx, box in enumerate(boxes):
+                track = assigned[b_idx]
+                if track is None:
+                    track = Track(next(self._ids), box, now)
+                    self.tracks.append(track)
+                    self.tracks_created += 1
+                    assigned[b_idx] = track
+                track.box = box
+                track.last_seen = now
+
+                if self._needs_embedding(track, now):
+                    track.pending = True
+                    track.last_embedded = now
+                    needed.append(b_idx)
+
+            self.faces_seen += len(boxes)
+            self.faces_embedded += len(needed)
+            return assigned, needed
+
+    def resolve(self, embedded_tracks, matched_faces, tracks):
+        """
+        Stores fresh match results on the tracks that were embedded, then returns one
+        face dict per track of the frame (tracks still waiting on the model are left out).
+        """
+        with self._lock:
+            for track, face in zip(embedded_tracks, matched_faces):
+                track.student = face["student"]
+                track.distance = face["distance"]
+                track.pending = False
+
+            return [
+                {"box": track.box, "student": track.student, "distance": track.distance, "track_id": track.id}
+                for track in tracks if not track.pending
+            ]
+
+    def release(self, tracks):
+        """Clears the pending flag when an embedding attempt failed."""
+        with self._lock:
+            for track in tracks:
+                track.pending = False
+                track.last_embedded = None
+
+    def metrics(self):
+        with self._lock:
+            minutes = max(time.monotonic() - self._started_at, 1e-9) / 60
+            return {
+                "faces_seen": self.faces_seen,
+                "faces_embedded": self.faces_embedded,
+                "embeddings_skipped": self.faces_seen - self.faces_embedded,
+                "reduction_factor": round(self.faces_seen / self.faces_embedded, 2) if self.faces_embedded else None,
+                "embeddings_per_min": round(self.faces_embedded / minutes, 1),
+                "faces_per_min": round(self.faces_seen / minutes, 1),
+                "tracks_created": self.tracks_created,
+                "active_tracks": len(self.tracks),
+            }
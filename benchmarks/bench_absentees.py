@@ -0,0 +1,85 @@
+"""
+End-of-session absentee marking: the old ORM loop (load every absent Student, add one
+Attendance per student) against the set-based INSERT ... SELECT in
+mark_absentees_on_exit, whole school and scoped to one subject.
+
+Usage: python -m benchmarks.bench_absentees [--students 10000 100000] [--present 0.7]
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import func
+
+from app import db
+from app.models import Attendance, Student
+from app.routes.attendance import mark_absentees_on_exit
+from benchmarks.database import make_app, seed_attendance, seed_students
+
+
+def legacy_mark_absentees():
+    today = datetime.now().date()
+    present_or_late_ids = db.session.query(Attendance.student_id).filter(
+        func.date(Attendance.time_in) == today
+    ).distinct()
+    absent_students = Student.query.filter(Student.id.notin_(present_or_late_ids)).all()
+    for student in absent_students:
+        db.session.add(Attendance(student_id=student.id, time_in=datetime.now(), status="Absent"))
+    db.session.commit()
+    return len(absent_students)
+
+
+def timed(fn, *args):
+    """(result, seconds, peak Python heap MB) of one call."""
+    tracemalloc.start()
+    start = time.monotonic()
+    result = fn(*args)
+    elapsed = time.monotonic() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def reset_today(present):
+    """Leaves only today's Present/Late rows in place (drops the Absent rows a run added)."""
+    Attendance.query.filter(Attendance.status == "Absent").delete()
+    db.session.commit()
+    return Attendance.query.count() == present
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--present", type=float, default=0.7, help="share of students already marked today")
+    parser.add_argument("--subjects", type=int, default=20)
+    parser.add_argument("--embedding-bytes", type=int, default=2048, help="size of each Student.face_embedding blob")
+    args = parser.parse_args()
+
+    for count in args.students:
+        with tempfile.TemporaryDirectory() as directory:
+            app = make_app(directory)
+            with app.app_context():
+                seed_students(count, args.embedding_bytes, subjects=args.subjects)
+                seed_attendance(count, days=1, present_ratio=args.present, subjects=args.subjects)
+                Attendance.query.filter(Attendance.status == "Absent").delete()
+                db.session.commit()
+                present = Attendance.query.count()
+                print(f"\n{count} students, {present} already marked today")
+
+                marked, elapsed, peak = timed(legacy_mark_absentees)
+                print(f"  ORM loop (old)        : {marked:>7} absent in {elapsed:7.3f}s, peak heap {peak:7.1f} MB")
+                reset_today(present)
+                db.session.expunge_all()
+
+                marked, elapsed, peak = timed(mark_absentees_on_exit)
+                print(f"  INSERT ... SELECT     : {marked:>7} absent in {elapsed:7.3f}s, peak heap {peak:7.1f} MB")
+                reset_today(present)
+
+                marked, elapsed, peak = timed(mark_absentees_on_exit, 1)
+                print(f"  one subject of {args.subjects:<5}: {marked:>7} absent in {elapsed:7.3f}s, peak heap {peak:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Attendance history at semester scale: keyset pages against OFFSET pages deep into the
+table, and the streaming CSV export's peak memory as the row count grows.
+
+Usage: python -m benchmarks.bench_attendance_export [--students 2000] [--days 50 200]
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+
+from app import db
+from app.attendance_records import RECORDS_PAGE_SIZE, fetch_page, records_query, stream_csv
+from app.models import Attendance
+from benchmarks.database import make_app, seed_attendance, seed_students
+
+
+def offset_page(page):
+    return records_query({}).offset(page * RECORDS_PAGE_SIZE).limit(RECORDS_PAGE_SIZE).all()
+
+
+def keyset_cursor_at(page):
+    """Cursor of the row just before `page`, found once so the timed call is a single page fetch."""
+    row = records_query({}).offset(page * RECORDS_PAGE_SIZE - 1).first()
+    return f"{row.time_in.isoformat()}_{row.id}"
+
+
+def export_peak(filters):
+    """(rows, bytes, seconds, peak Python heap MB) of one full CSV export."""
+    tracemalloc.start()
+    start = time.monotonic()
+    size = rows = 0
+    for chunk in stream_csv(filters):
+        size += len(chunk)
+        rows += chunk.count("\n")
+    elapsed = time.monotonic() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return rows - 1, size, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--days", type=int, nargs="+", default=[50, 200])
+    args = parser.parse_args()
+
+    for days in args.days:
+        with tempfile.TemporaryDirectory() as directory:
+            app = make_app(directory)
+            with app.app_context():
+                seed_students(args.students, embedding_bytes=16)
+                total = seed_attendance(args.students, days)
+                db.session.execute(db.text("ANALYZE"))
+                print(f"\n{total} attendance rows")
+
+                last_page = total // RECORDS_PAGE_SIZE - 1
+                for page in (1, last_page // 2, last_page):
+                    start = time.monotonic()
+                    offset_page(page)
+                    offset_ms = 1000 * (time.monotonic() - start)
+
+                    cursor = keyset_cursor_at(page)
+                    start = time.monotonic()
+                    fetch_page({}, cursor)
+                    keyset_ms = 1000 * (time.monotonic() - start)
+                    print(f"  page {page:>6}: OFFSET {offset_ms:8.1f} ms   keyset {keyset_ms:6.1f} ms")
+
+                rows, size, elapsed, peak = export_peak({})
+                print(f"  CSV export: {rows} rows, {size / 2**20:.1f} MB in {elapsed:.1f}s, peak heap {peak:.1f} MB")
+                assert rows == Attendance.query.count()
+
+
+if __name__ == "__main__":
+    main()
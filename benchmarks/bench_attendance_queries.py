@@ -0,0 +1,122 @@
+"""
+Attendance lookups on a large synthetic table: the old func.date(time_in) predicates
+against the `date` column, before and after the composite indexes declared on the
+Attendance model (the same ones `flask migrate-attendance` creates).
+
+Usage: python -m benchmarks.bench_attendance_queries [--students 5000] [--days 400]
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import func, text
+
+from app import db
+from app.models import Attendance
+from benchmarks.database import make_app, seed_attendance
+
+
+def lookup_old(student_id, today):
+    return db.session.query(Attendance.id).filter(
+        Attendance.student_id == student_id, func.date(Attendance.time_in) == today
+    ).first()
+
+
+def lookup_new(student_id, today):
+    return db.session.query(Attendance.id).filter(
+        Attendance.date == today, Attendance.student_id == student_id
+    ).first()
+
+
+def day_old(today):
+    return db.session.query(Attendance.student_id, Attendance.time_out).filter(func.date(Attendance.time_in) == today).all()
+
+
+def day_new(today):
+    return db.session.query(Attendance.student_id, Attendance.time_out).filter(Attendance.date == today).all()
+
+
+def present_old(today):
+    return db.session.query(Attendance).filter(
+        func.date(Attendance.time_in) == today, Attendance.status.in_(["Present", "Late"])
+    ).count()
+
+
+def present_new(today):
+    return db.session.query(Attendance).filter(
+        Attendance.date == today, Attendance.status.in_(["Present", "Late"])
+    ).count()
+
+
+def subject_old(today):
+    return db.session.query(Attendance.student_id).filter(
+        Attendance.subject_id == 1, func.date(Attendance.time_in) == today
+    ).all()
+
+
+def subject_new(today):
+    return db.session.query(Attendance.student_id).filter(
+        Attendance.subject_id == 1, Attendance.date == today
+    ).all()
+
+
+QUERIES = [
+    ("student marked today? (x50)", lookup_old, lookup_new, 50),
+    ("today's rows (session preload)", day_old, day_new, 1),
+    ("present today (report count)", present_old, present_new, 1),
+    ("one subject today", subject_old, subject_new, 1),
+]
+
+
+def timed_ms(fn, today, repeat):
+    start = time.monotonic()
+    for i in range(repeat):
+        if repeat > 1:
+            fn(i * 37 + 1, today)
+        else:
+            fn(today)
+    return 1000 * (time.monotonic() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=400)
+    parser.add_argument("--subjects", type=int, default=20)
+    args = parser.parse_args()
+
+    today = datetime.now().date()
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory)
+        with app.app_context():
+            for index in Attendance.__table__.indexes:
+                index.drop(bind=db.engine)
+
+            start = time.monotonic()
+            rows = seed_attendance(args.students, args.days, subjects=args.subjects)
+            print(f"{rows} attendance rows ({args.students} students x {args.days} days) seeded in {time.monotonic() - start:.0f}s\n")
+
+            results = {name: [timed_ms(old, today, n), timed_ms(new, today, n)] for name, old, new, n in QUERIES}
+
+            start = time.monotonic()
+            for index in Attendance.__table__.indexes:
+                index.create(bind=db.engine)
+            db.session.execute(text("ANALYZE"))
+            print(f"indexes built in {time.monotonic() - start:.1f}s\n")
+
+            for name, old, new, n in QUERIES:
+                results[name].append(timed_ms(new, today, n))
+
+            print(f"{'query':<32} {'func.date':>12} {'date col':>12} {'date+index':>12}")
+            for name, (before, column, indexed) in results.items():
+                print(f"{name:<32} {before:>10.1f}ms {column:>10.1f}ms {indexed:>10.1f}ms")
+
+            plan = db.session.execute(text(
+                "EXPLAIN QUERY PLAN SELECT id FROM attendances WHERE date = :d AND student_id = 1"
+            ), {"d": today.isoformat()}).fetchall()
+            print(f"\nplan for the per-student lookup: {plan[-1][-1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Cost of attendance writes seen by the recognition thread: one commit per IN/OUT event
+(the old record_attendance) against the batched AttendanceWriter. Runs on a throwaway
+SQLite file so the numbers include real commit/fsync latency.
+
+Usage: python -m benchmarks.bench_attendance_writer [--students 2000] [--batch 16 64 256]
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime
+
+from app import db
+from app.models import Attendance
+from app.attendance_writer import AttendanceWriter
+from benchmarks.database import make_app
+
+
+def reset(app):
+    with app.app_context():
+        Attendance.query.delete()
+        db.session.commit()
+
+
+def run_commit_per_event(app, students):
+    with app.app_context():
+        start = time.monotonic()
+        for student_id in students:
+            entry = Attendance(student_id=student_id, time_in=datetime.now(), status="Present")
+            db.session.add(entry)
+            db.session.commit()
+        for student_id in students:
+            entry = db.session.query(Attendance).filter(Attendance.student_id == student_id).first()
+            entry.time_out = datetime.now()
+            db.session.commit()
+        return time.monotonic() - start
+
+
+def run_writer(app, students, max_batch):
+    writer = AttendanceWriter(app, db, Attendance, max_batch=max_batch).start()
+    start = time.monotonic()
+    for student_id in students:
+        writer.submit("in", student_id, datetime.now(), status="Present")
+    for student_id in students:
+        writer.submit("out", student_id, datetime.now())
+    blocked = time.monotonic() - start
+    writer.stop()
+    return blocked, time.monotonic() - start, writer.metrics()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--batch", type=int, nargs="+", default=[16, 64, 256])
+    args = parser.parse_args()
+
+    students = list(range(1, args.students + 1))
+    events = 2 * len(students)
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory)
+
+        elapsed = run_commit_per_event(app, students)
+        print(f"commit per event: {events} events in {elapsed:.2f}s "
+              f"({events / elapsed:.0f} events/s, {1000 * elapsed / events:.2f} ms blocking per event)")
+
+        for max_batch in args.batch:
+            reset(app)
+            blocked, total, metrics = run_writer(app, students, max_batch)
+            print(f"\nwriter, batch {max_batch}: {events} events durable in {total:.2f}s ({events / total:.0f} events/s)")
+            print(f"  recognition thread blocked {1000 * blocked / events:.3f} ms per event")
+            print(f"  {metrics['batches']} batches, avg {metrics['avg_batch_size']} events, "
+                  f"flush avg {metrics['avg_flush_ms']} ms / max {metrics['max_flush_ms']} ms, "
+                  f"event latency avg {metrics['avg_event_latency_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
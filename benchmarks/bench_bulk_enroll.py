@@ -0,0 +1,93 @@
+"""
+Bulk enrollment throughput (flask bulk-enroll) against the number of embedding worker
+processes, on a generated roster and photo folder. Reading, downscaling and the
+database inserts are real.
+
+By default detection + embedding is simulated with a fixed CPU-bound cost per photo
+(roughly what opencv detection + VGG-Face costs on one core). Pass --deepface to run
+the real models instead (needs deepface installed and face photos to be meaningful).
+
+Usage: python -m benchmarks.bench_bulk_enroll [--photos 400] [--workers 0 1 2 4] [--photo-ms 150]
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from app import bulk_enroll
+from app.face_templates import build_template
+from app.models import Student
+from benchmarks.database import make_app
+
+SIMULATED_DIM = 4096
+SIMULATED_MS = 150
+
+
+def simulated_embed(paths):
+    """Reads and downscales like embed_photos, then burns SIMULATED_MS of CPU per photo as the model would."""
+    samples = []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        scale = bulk_enroll.MAX_PHOTO_SIDE / max(image.shape[:2])
+        if scale < 1:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        deadline = time.process_time() + float(os.environ.get("BENCH_PHOTO_MS", SIMULATED_MS)) / 1000
+        while time.process_time() < deadline:
+            pass
+        seed = int(image[:8, :8].sum())
+        samples.append(np.random.default_rng(seed).standard_normal(SIMULATED_DIM).astype(np.float32))
+    if not samples:
+        return None, "Unreadable image"
+    return build_template(samples), None
+
+
+def write_intake(directory, count, seed=0):
+    """Roster CSV text plus <roll_no>.jpg phone-sized photos in <directory>/photos."""
+    rng = np.random.default_rng(seed)
+    photo_dir = os.path.join(directory, "photos")
+    os.makedirs(photo_dir)
+    lines = ["name,email,roll_no,contact,password"]
+    base = cv2.resize(rng.integers(0, 256, (120, 90, 3), dtype=np.uint8), (1500, 2000))
+    for i in range(count):
+        lines.append(f"Student {i},s{i}@example.com,R{i:06d},{9_000_000_000 + i},x")
+        photo = base.copy()
+        photo[:8, :8] = rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)
+        cv2.imwrite(os.path.join(photo_dir, f"R{i:06d}.jpg"), photo)
+    return "\n".join(lines) + "\n", photo_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=400)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--photo-ms", type=float, default=SIMULATED_MS)
+    parser.add_argument("--deepface", action="store_true", help="run the real detector and model")
+    args = parser.parse_args()
+    os.environ["BENCH_PHOTO_MS"] = str(args.photo_ms)   # inherited by the spawned workers
+    embed = bulk_enroll.embed_photos if args.deepface else simulated_embed
+
+    with tempfile.TemporaryDirectory() as directory:
+        roster_text, photo_dir = write_intake(directory, args.photos)
+        print(f"{args.photos} photos, {'real models' if args.deepface else f'{args.photo_ms:.0f} ms simulated model'}, "
+              f"{os.cpu_count()} CPUs\n")
+
+        for workers in args.workers:
+            with tempfile.TemporaryDirectory() as db_directory:
+                app = make_app(db_directory)
+                with app.app_context():
+                    rows, _ = bulk_enroll.read_roster(io.StringIO(roster_text))
+                    result = bulk_enroll.enroll_students(rows, photo_dir, workers=workers, embed=embed)
+                    assert result["enrolled"] == Student.query.count() == args.photos, result["errors"][:3]
+                    rate = args.photos / result["seconds"]
+                    print(f"workers={workers}: {result['seconds']:6.1f}s  {rate:6.1f} photos/s   "
+                          f"5k intake ~{5000 / rate / 60:5.1f} min")
+
+
+if __name__ == "__main__":
+    main()
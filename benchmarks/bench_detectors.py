@@ -0,0 +1,114 @@
+"""
+Face detector backends (app.detectors) at several detection scales: frames detected
+per second and, on a labelled image set, recall.
+
+--images DIR runs on every image in DIR. With --boxes CSV (file,x,y,w,h per face) a face
+counts as found when a detection overlaps it with IoU >= --iou; without it every image is
+assumed to show exactly one face, and recall is the share of images with a detection.
+"extra" is the mean number of detections beyond the labelled faces (false positives).
+Without --images, random frames are timed only.
+
+Backends whose model files or packages are missing are skipped with the reason; DeepFace
+detector names (e.g. opencv, retinaface) need deepface installed.
+
+Usage: python -m benchmarks.bench_detectors [--images DIR [--boxes CSV]] [--backends haar yunet opencv]
+                                            [--scales 1.0 0.5 0.25] [--frames 50] [--size 1280x720]
+"""
+import argparse
+import csv
+import os
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+from app.detectors import build_detector
+
+
+def load_images(directory):
+    names = sorted(name for name in os.listdir(directory)
+                   if os.path.splitext(name)[1].lower() in (".jpg", ".jpeg", ".png", ".bmp", ".webp"))
+    images = [(name, cv2.imread(os.path.join(directory, name))) for name in names]
+    return [(name, image) for name, image in images if image is not None]
+
+
+def load_boxes(path):
+    boxes = defaultdict(list)
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            boxes[row["file"]].append(tuple(int(float(row[k])) for k in ("x", "y", "w", "h")))
+    return boxes
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    union = aw * ah + bw * bh - w * h
+    return w * h / union if union else 0.0
+
+
+def score(detections, truth, threshold):
+    """(faces found, labelled faces, extra detections) for one image."""
+    boxes = [tuple(d["facial_area"][k] for k in ("x", "y", "w", "h")) for d in detections]
+    if truth is None:
+        return min(1, len(boxes)), 1, max(0, len(boxes) - 1)
+    found = sum(1 for face in truth if any(iou(face, box) >= threshold for box in boxes))
+    return found, len(truth), max(0, len(boxes) - found)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="folder of test images")
+    parser.add_argument("--boxes", help="ground-truth CSV: file,x,y,w,h")
+    parser.add_argument("--iou", type=float, default=0.5)
+    parser.add_argument("--backends", nargs="+", default=["haar", "yunet", "skip", "opencv"])
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0, 0.5, 0.25])
+    parser.add_argument("--frames", type=int, default=50, help="random frames timed without --images")
+    parser.add_argument("--size", default="1280x720", help="random frame size without --images")
+    args = parser.parse_args()
+
+    if args.images:
+        images = load_images(args.images)
+        boxes = load_boxes(args.boxes) if args.boxes else None
+        print(f"{len(images)} images from {args.images}" + (f", boxes from {args.boxes}" if boxes else ", one face each") + "\n")
+    else:
+        width, height = (int(v) for v in args.size.split("x"))
+        rng = np.random.default_rng(0)
+        base = cv2.resize(rng.integers(0, 256, (height // 8, width // 8, 3), dtype=np.uint8), (width, height))
+        images = [(f"frame{i}", np.roll(base, 7 * i, axis=1)) for i in range(args.frames)]
+        boxes = None
+        print(f"{len(images)} random {width}x{height} frames (timing only)\n")
+
+    print(f"{'backend':>10} {'scale':>6} {'frames/s':>9} {'faces/s':>8} {'recall':>7} {'extra':>6}")
+    for backend in args.backends:
+        for scale in args.scales:
+            detector = build_detector(backend, scale)
+            try:
+                detector.warm_up()
+                detector.detect(images[0][1])
+            except Exception as e:
+                print(f"{backend:>10} {scale:>6.2f}  skipped: {e}")
+                break
+
+            found = labelled = extra = faces = 0
+            start = time.perf_counter()
+            for name, image in images:
+                detections = detector.detect(image)
+                faces += len(detections)
+                if args.images:
+                    f, n, x = score(detections, boxes.get(name, []) if boxes is not None else None, args.iou)
+                    found, labelled, extra = found + f, labelled + n, extra + x
+            elapsed = time.perf_counter() - start
+
+            recall = f"{found / labelled:7.3f}" if labelled else f"{'-':>7}"
+            extra_rate = f"{extra / len(images):6.2f}" if args.images else f"{'-':>6}"
+            print(f"{backend:>10} {scale:>6.2f} {len(images) / elapsed:>9.1f} {faces / elapsed:>8.1f} {recall} {extra_rate}")
+            if backend == "skip":
+                break   # does no work, so the scale does not matter
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Enrollment duplicate check: the old check_face_duplicate (read and decode every stored
+BLOB from the database, then L2 distances against all of them) against
+find_duplicate_faces, which searches the memory-mapped embedding index with the
+recognition backend. Queries are noisy re-captures of enrolled identities; "found" is
+the share whose true identity is the closest candidate.
+
+Usage: python -m benchmarks.bench_duplicate_check [--sizes 1000 5000 20000] [--dim 4096]
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from app import db
+from app import enroll_face
+from app import recognition
+from app.embedding_codec import decode_embedding, decode_many, encode_embedding
+from app.embedding_index import get_index
+from app.models import Student
+from benchmarks.database import make_app
+from benchmarks.synthetic import make_gallery, make_queries
+
+
+def legacy_check(new_embedding_blob, roll_no):
+    """Copy of the old check_face_duplicate, returning the closest row instead of its name."""
+    new_embedding = decode_embedding(new_embedding_blob).astype(np.float32)
+    existing_students = Student.query.with_entities(
+        Student.name, Student.roll_no, Student.face_embedding
+    ).filter(Student.face_embedding.isnot(None), Student.roll_no != roll_no).all()
+    stored_embeddings, counts = decode_many([student.face_embedding for student in existing_students])
+    owners = np.repeat(np.arange(len(existing_students)), counts)
+    distances = np.linalg.norm(stored_embeddings - new_embedding, axis=1)
+    return existing_students[int(owners[np.argmin(distances)])].roll_no
+
+
+def seed_gallery(gallery, chunk=2000):
+    for start in range(0, len(gallery), chunk):
+        db.session.execute(Student.__table__.insert(), [
+            {"name": f"Student {i}", "email": f"s{i}@example.com", "roll_no": f"R{i:07d}", "contact": 9_000_000_000 + i,
+             "password": "x", "is_approved": True, "face_embedding": encode_embedding(gallery[i], "VGG-Face")}
+            for i in range(start, min(start + chunk, len(gallery)))
+        ])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 5_000, 20_000])
+    parser.add_argument("--dim", type=int, default=4096)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--backend", choices=["exact", "ivf"], default=recognition.SEARCH_BACKEND)
+    args = parser.parse_args()
+    recognition.SEARCH_BACKEND = args.backend
+
+    print(f"{'gallery':>8} {'old ms/check':>13} {'old found':>10} {'index build ms':>15} {'new ms/check':>13} {'new found':>10}")
+    for size in args.sizes:
+        gallery = make_gallery(size, args.dim)
+        queries, true_rows = make_queries(gallery, args.queries)
+        blobs = [encode_embedding(query, "VGG-Face") for query in queries]
+        with tempfile.TemporaryDirectory() as directory:
+            app = make_app(directory)
+            with app.app_context():
+                seed_gallery(gallery)
+
+                start = time.perf_counter()
+                old = [legacy_check(blob, "new student") for blob in blobs]
+                old_ms = (time.perf_counter() - start) * 1000 / len(blobs)
+                db.session.expunge_all()
+
+                start = time.perf_counter()
+                get_index().invalidate()
+                matcher = recognition.load_gallery(Student)
+                build_ms = (time.perf_counter() - start) * 1000
+
+                start = time.perf_counter()
+                new = [enroll_face.find_duplicate_faces([decode_embedding(blob)], matcher=matcher, threshold=2.0)[0] for blob in blobs]
+                new_ms = (time.perf_counter() - start) * 1000 / len(blobs)
+
+                expected = [f"R{row:07d}" for row in true_rows]
+                old_found = np.mean([found == roll for found, roll in zip(old, expected)])
+                new_found = np.mean([bool(c) and c[0]["roll_no"] == roll for c, roll in zip(new, expected)])
+                print(f"{size:>8} {old_ms:>13.1f} {old_found:>10.2f} {build_ms:>15.0f} {new_ms:>13.2f} {new_found:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Faces/second of the old per-face embedding path (one model call per crop, like
+DeepFace.represent(detector_backend='skip')) against BatchEmbeddingService.
+
+By default the model is simulated: each call costs a fixed overhead plus a smaller
+per-face cost, which is how batched inference behaves on BLAS/GPU backends.
+Pass --deepface to time the real MODEL_NAME model instead (needs deepface installed).
+
+Usage: python -m benchmarks.bench_embedding [--faces 30] [--frames 20] [--deepface]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.embedding_service import BatchEmbeddingService
+
+
+def make_simulated_infer(call_ms, face_ms, dim):
+    def infer(batch):
+        time.sleep((call_ms + face_ms * len(batch)) / 1000)
+        return np.zeros((len(batch), dim), dtype=np.float32)
+    return infer
+
+
+def make_crops(faces, rng):
+    return [rng.integers(0, 256, (int(rng.integers(60, 160)), int(rng.integers(60, 160)), 3), dtype=np.uint8)
+            for _ in range(faces)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faces", type=int, default=30, help="faces per frame")
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--workers", type=int, default=2, help="concurrent pipeline workers submitting frames")
+    parser.add_argument("--call-ms", type=float, default=20.0, help="simulated fixed cost per model call")
+    parser.add_argument("--face-ms", type=float, default=1.5, help="simulated cost per face in a call")
+    parser.add_argument("--deepface", action="store_true")
+    args = parser.parse_args()
+
+    if args.deepface:
+        from app.model_registry import get_recognition_model
+        client = get_recognition_model()
+        make_service = lambda **opts: BatchEmbeddingService.for_deepface(client, **opts)
+    else:
+        infer = make_simulated_infer(args.call_ms, args.face_ms, 4096)
+        make_service = lambda **opts: BatchEmbeddingService(infer, (224, 224), **opts)
+
+    rng = np.random.default_rng(0)
+    frames = [make_crops(args.faces, rng) for _ in range(args.frames)]
+    total_faces = args.faces * args.frames
+
+    # --- per-face path: batch size 1, no service thread ---
+    per_face = make_service(max_batch_size=1)
+    start = time.perf_counter()
+    for crops in frames:
+        per_face.embed(crops)
+    baseline = total_faces / (time.perf_counter() - start)
+    print(f"{'per-face calls':>28}: {baseline:8.1f} faces/s  ({per_face.metrics()['batches']} model calls)")
+
+    for batch_size in args.batch_sizes:
+        service = make_service(max_batch_size=batch_size).start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.workers) as pool:
+            list(pool.map(service.embed, frames))
+        rate = total_faces / (time.perf_counter() - start)
+        service.stop()
+        m = service.metrics()
+        label = f"batched (max {batch_size}, {args.workers} workers)"
+        print(f"{label:>28}: {rate:8.1f} faces/s  ({m['batches']} model calls, avg batch {m['avg_batch_size']}, "
+              f"{rate / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Compares the legacy per-student cosine loop from mark_attendance_loop against the
+vectorized GalleryMatcher on synthetic embeddings.
+
+Usage: python -m benchmarks.bench_matcher [--dim 4096] [--faces 5]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.matcher import GalleryMatcher
+
+
+def legacy_find_cosine_distance(source_representation, test_representation):
+    # Copy of recognition.find_cosine_distance (recognition.py pulls in cv2/deepface at import).
+    source_representation = source_representation.flatten()
+    test_representation = test_representation.flatten()
+    a = np.dot(source_representation, test_representation)
+    b = np.sqrt(np.sum(source_representation * source_representation))
+    c = np.sqrt(np.sum(test_representation * test_representation))
+    if b == 0 or c == 0:
+        return 1.0
+    return 1 - a / (b * c)
+
+
+def legacy_match(gallery, live_batch):
+    results = []
+    for live in live_batch:
+        min_distance, best = 1.0, -1
+        for i, stored in enumerate(gallery):
+            distance = legacy_find_cosine_distance(stored, live)
+            if distance < min_distance:
+                min_distance, best = distance, i
+        results.append(best)
+    return results
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dim", type=int, default=4096, help="embedding size (VGG-Face = 4096)")
+    parser.add_argument("--faces", type=int, default=5, help="live faces per frame")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000])
+    parser.add_argument("--legacy-max", type=int, default=10_000, help="skip the slow loop above this size")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'gallery':>9} {'legacy ms':>10} {'matcher ms':>11} {'build ms':>9} {'speedup':>8}")
+
+    for size in args.sizes:
+        gallery = rng.standard_normal((size, args.dim), dtype=np.float32)
+        live = gallery[rng.integers(0, size, args.faces)] + 0.1 * rng.standard_normal((args.faces, args.dim), dtype=np.float32)
+
+        start = time.perf_counter()
+        matcher = GalleryMatcher(gallery, [{"id": i} for i in range(size)])
+        build_ms = (time.perf_counter() - start) * 1000
+
+        matcher_ms = timed(lambda: matcher.match(live, k=5), repeat=5) * 1000
+
+        if size <= args.legacy_max:
+            legacy_ms = timed(lambda: legacy_match(gallery, live), repeat=1) * 1000
+            assert legacy_match(gallery, live) == list(matcher.match(live)[0][:, 0])
+            print(f"{size:>9} {legacy_ms:>10.2f} {matcher_ms:>11.2f} {build_ms:>9.2f} {legacy_ms / matcher_ms:>7.1f}x")
+        else:
+            print(f"{size:>9} {'-':>10} {matcher_ms:>11.2f} {build_ms:>9.2f} {'-':>8}")
+
+        del gallery, matcher
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Throughput of the staged attendance pipeline against the old sequential loop, using a
+synthetic (or video-file) frame source and a simulated model so no camera or DeepFace
+install is needed. The simulated model sleeps, which releases the GIL like real inference.
+
+Usage: python -m benchmarks.bench_pipeline [--source synthetic:640x480:300] [--workers 1 2 4]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.frame_sources import open_frame_source
+from app.pipeline import AttendancePipeline
+from app.search_backends import ExactSearch
+from benchmarks.synthetic import make_gallery
+
+
+def make_fake_embedder(faces, dim, embed_ms):
+    rng = np.random.default_rng(0)
+
+    def embed_faces(frame):
+        time.sleep(embed_ms / 1000)
+        boxes = [(10 * i, 10, 50, 50) for i in range(faces)]
+        return boxes, rng.standard_normal((faces, dim), dtype=np.float32)
+
+    return embed_faces
+
+
+def make_fake_writer(write_ms):
+    def handle_matches(faces):
+        time.sleep(write_ms / 1000)
+        return [(face["box"], "", (0, 0, 0)) for face in faces]
+
+    return handle_matches
+
+
+def run_sequential(source, embed_faces, matcher, handle_matches):
+    start, frames = time.monotonic(), 0
+    while True:
+        ret, frame = source.read()
+        if not ret:
+            break
+        boxes, embeddings = embed_faces(frame)
+        indices, distances = matcher.match(embeddings, k=1)
+        handle_matches([{"box": b, "student": None, "distance": d} for b, d in zip(boxes, distances[:, 0])])
+        frames += 1
+    return frames / (time.monotonic() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default="synthetic:640x480:200")
+    parser.add_argument("--gallery", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=4096)
+    parser.add_argument("--faces", type=int, default=5, help="faces per frame")
+    parser.add_argument("--embed-ms", type=float, default=40, help="simulated detect+embed time per frame")
+    parser.add_argument("--write-ms", type=float, default=5, help="simulated DB time per frame")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    gallery = make_gallery(args.gallery, args.dim)
+    matcher = ExactSearch(gallery, [{"id": i, "name": str(i)} for i in range(args.gallery)])
+    embed_faces = make_fake_embedder(args.faces, args.dim, args.embed_ms)
+    handle_matches = make_fake_writer(args.write_ms)
+
+    fps = run_sequential(open_frame_source(args.source), embed_faces, matcher, handle_matches)
+    print(f"sequential loop: {fps:.1f} frames/s")
+
+    for workers in args.workers:
+        pipeline = AttendancePipeline(
+            open_frame_source(args.source), embed_faces, matcher, handle_matches,
+            threshold=0.5, workers=workers,
+        )
+        metrics = pipeline.run()
+        print(f"\npipeline, {workers} worker(s): {metrics['embed']['items'] / metrics['elapsed_s']:.1f} frames/s")
+        for stage in ("capture", "embed", "match", "write", "faces", "end_to_end"):
+            m = metrics[stage]
+            print(f"  {stage:>10}: {m['items']:>6} items {m['per_sec']:>8.1f}/s  avg {m['avg_ms']:>7.2f} ms  "
+                  f"max {m['max_ms']:>7.2f} ms  dropped {m['dropped']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Dimensionality reduction before matching: full 4096-d cosine search against PCA and
+random projections to a few output sizes. Reports the fit time, the session-start cost
+of projecting the gallery, the time to score one frame's faces, and identification
+accuracy (top-1 on noisy re-captures) plus recall@k against the full-dimension search.
+The median genuine distance shows how far matches move relative to MATCH_THRESHOLD, and
+"threshold" is the cut-off calibrate_threshold picks to keep its false accept rate
+(calibrated on the gallery plus a separate set of re-captures); "accepted" is the share of
+queries whose top-1 match is correct and under the threshold in force, "false acc" the
+share accepted as someone else.
+
+The synthetic identities have --latent-dim degrees of freedom; real VGG-Face galleries
+are less compressible, so check the trade-off on your own data with flask fit-projection.
+
+Usage: python -m benchmarks.bench_projection [--gallery 20000] [--dims 64 128 256 512] [--latent-dim 256]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.matcher import l2_normalize
+from app.model_registry import MATCH_THRESHOLD
+from app.projection import METHODS, calibrate_threshold, fit_projection
+from app.search_backends import build_search_backend, recall_at_k
+from benchmarks.synthetic import make_gallery, make_queries
+
+
+def timed_ms(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gallery", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=4096)
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 256, 512])
+    parser.add_argument("--latent-dim", type=int, default=256)
+    parser.add_argument("--noise", type=float, default=2.0, help="re-capture noise of the queries")
+    parser.add_argument("--faces", type=int, default=5, help="live faces per frame")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    gallery = l2_normalize(make_gallery(args.gallery, args.dim, latent_dim=args.latent_dim))
+    queries, truth = make_queries(gallery, args.queries, noise=args.noise)
+    frame = queries[:args.faces]
+    metadata = [{"id": i} for i in range(args.gallery)]
+    recaptures, owners = make_queries(gallery, args.queries, noise=args.noise, seed=2)
+    samples = np.concatenate([gallery, recaptures])
+    owners = np.concatenate([np.arange(args.gallery), owners])
+
+    def accepted(found, distances, threshold):
+        under = distances[:, 0] < threshold
+        return np.mean(under & (found[:, 0] == truth)), np.mean(under & (found[:, 0] != truth))
+
+    full = build_search_backend("exact", gallery, metadata)
+    found, distances = full.match(queries)
+    full_ms = timed_ms(lambda: full.match(frame, k=args.k))
+    print(f"{args.gallery} students, {args.dim}-d, {args.queries} queries (noise {args.noise})\n")
+    print(f"{'method':>7} {'dim':>5} {'fit ms':>8} {'project ms':>10} {'frame ms':>9} {'MB':>7} "
+          f"{'top-1':>6} {f'recall@{args.k}':>9} {'genuine d':>9} {'threshold':>9} {'accepted':>8} "
+          f"{'false acc':>9} {'variance':>8}")
+    accept, false_accept = accepted(found, distances, MATCH_THRESHOLD)
+    print(f"{'full':>7} {args.dim:>5} {'-':>8} {'-':>10} {full_ms:>9.2f} {gallery.nbytes / 2**20:>7.1f} "
+          f"{np.mean(found[:, 0] == truth):>6.3f} {1.0:>9.3f} {np.median(distances[:, 0]):>9.3f} "
+          f"{MATCH_THRESHOLD:>9.3f} {accept:>8.3f} {false_accept:>9.3f} {'-':>8}")
+
+    for method in METHODS:
+        for dim in args.dims:
+            start = time.perf_counter()
+            try:
+                projection = fit_projection(gallery, method, dim)
+                calibrate_threshold(projection, samples, owners, MATCH_THRESHOLD)
+            except ValueError as e:
+                print(f"{method:>7} {dim:>5}  skipped: {e}")
+                continue
+            fit_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            matcher = build_search_backend("exact", gallery, metadata, projection=projection)
+            project_ms = (time.perf_counter() - start) * 1000
+            frame_ms = timed_ms(lambda: matcher.match(frame, k=args.k))
+
+            found, distances = matcher.match(queries)
+            recall = recall_at_k(matcher, queries, k=args.k, reference=full)
+            accept, false_accept = accepted(found, distances, matcher.match_threshold(MATCH_THRESHOLD))
+            variance = f"{100 * projection.explained_variance:7.1f}%" if projection.explained_variance is not None else "-"
+            print(f"{method:>7} {dim:>5} {fit_ms:>8.0f} {project_ms:>10.0f} {frame_ms:>9.2f} "
+                  f"{matcher.gallery.nbytes / 2**20:>7.1f} {np.mean(found[:, 0] == truth):>6.3f} {recall:>9.3f} "
+                  f"{np.median(distances[:, 0]):>9.3f} {projection.threshold:>9.3f} {accept:>8.3f} "
+                  f"{false_accept:>9.3f} {variance:>8}")
+            del matcher
+
+
+if __name__ == "__main__":
+    main()
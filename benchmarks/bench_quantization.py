@@ -0,0 +1,73 @@
+"""
+Gallery precision: float32 against float16 and int8 (scalar-quantized) galleries, per
+gallery size. Reports the resident gallery size, the time to score one frame's faces,
+top-1 agreement and recall@k against exact float32 search, the largest cosine-distance
+error, and the Student.face_embedding BLOB size per stored vector.
+
+Usage: python -m benchmarks.bench_quantization [--sizes 1000 10000 50000] [--dim 4096] [--faces 5]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.embedding_codec import encode_embedding
+from app.matcher import l2_normalize
+from app.quantization import PRECISIONS
+from app.search_backends import build_search_backend, recall_at_k
+from benchmarks.synthetic import make_gallery, make_queries
+
+
+def timed_ms(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--dim", type=int, default=4096)
+    parser.add_argument("--faces", type=int, default=5, help="live faces per frame")
+    parser.add_argument("--queries", type=int, default=200, help="queries for the recall figures")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--backend", choices=["exact", "ivf"], default="exact")
+    args = parser.parse_args()
+
+    vector = np.random.default_rng(0).standard_normal(args.dim).astype(np.float32)
+    print("BLOB per vector: " + ", ".join(
+        f"{precision} {len(encode_embedding(vector, 'VGG-Face', precision))} B" for precision in PRECISIONS
+    ) + "\n")
+
+    print(f"{'gallery':>8} {'precision':>9} {'MB':>8} {'build ms':>9} {'frame ms':>9} "
+          f"{'top-1 agree':>11} {f'recall@{args.k}':>9} {'max |d err|':>11}")
+    for size in args.sizes:
+        gallery = l2_normalize(make_gallery(size, args.dim))
+        queries, _ = make_queries(gallery, args.queries)
+        frame = queries[:args.faces]
+        metadata = [{"id": i} for i in range(size)]
+        reference = build_search_backend("exact", gallery, metadata)
+        expected, expected_distances = reference.match(queries, k=args.k)
+
+        for precision in PRECISIONS:
+            start = time.perf_counter()
+            matcher = build_search_backend(args.backend, gallery, metadata, precision=precision)
+            build_ms = (time.perf_counter() - start) * 1000
+            frame_ms = timed_ms(lambda: matcher.match(frame, k=args.k))
+
+            found, _ = matcher.match(queries, k=args.k)
+            agree = float(np.mean(found[:, 0] == expected[:, 0]))
+            recall = recall_at_k(matcher, queries, k=args.k, reference=reference)
+            # How far the quantized scores of the reference neighbours moved
+            error = np.abs(np.take_along_axis(matcher.distances(queries), expected, axis=1) - expected_distances).max()
+            print(f"{size:>8} {precision:>9} {matcher.gallery.nbytes / 2**20:>8.1f} {build_ms:>9.1f} {frame_ms:>9.2f} "
+                  f"{agree:>11.3f} {recall:>9.3f} {error:>11.5f}")
+            del matcher
+        del gallery, reference
+
+
+if __name__ == "__main__":
+    main()
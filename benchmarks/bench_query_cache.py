@@ -0,0 +1,75 @@
+"""
+Dashboard reads through the query cache: the /reports summary and /dashboard/report
+loaders run uncached, then through the in-process and the shared (SQLite file) store,
+with the hit rate an admin refreshing the pages would see between writes.
+
+Usage: python -m benchmarks.bench_query_cache [--students 5000] [--days 60] [--loads 200]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from app import db
+from app.aggregates import rebuild_reports, refresh_daily_rollups
+from app.query_cache import ATTENDANCE, STUDENTS, TEACHERS, MemoryStore, QueryCache, SharedStore
+from app.routes.dashboard import load_student_reports
+from app.routes.report import load_report_summary
+from benchmarks.database import make_app, seed_attendance, seed_students
+
+
+def per_load_ms(load, loads):
+    start = time.monotonic()
+    for _ in range(loads):
+        load()
+    return 1000 * (time.monotonic() - start) / loads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--loads", type=int, default=200, help="page loads per configuration")
+    parser.add_argument("--write-every", type=int, default=50, help="invalidate after this many loads")
+    args = parser.parse_args()
+
+    today = datetime.now().date()
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory)
+        with app.app_context():
+            seed_students(args.students, embedding_bytes=16)
+            rows = seed_attendance(args.students, args.days)
+            rebuild_reports(db)
+            refresh_daily_rollups(db)
+            print(f"{args.students} students, {rows} attendance rows, {args.loads} loads per page\n")
+
+            pages = {
+                "/reports": ("reports:summary", lambda: load_report_summary(today), (STUDENTS, TEACHERS, ATTENDANCE)),
+                "/dashboard/report": ("dashboard:student_reports", load_student_reports, (STUDENTS, ATTENDANCE)),
+            }
+            stores = {
+                "memory": lambda: MemoryStore(),
+                "shared": lambda: SharedStore(os.path.join(directory, "query_cache.db")),
+            }
+            for page, (key, loader, tags) in pages.items():
+                print(f"{page:<18} uncached      {per_load_ms(loader, args.loads):8.2f} ms/load")
+                for name, make_store in stores.items():
+                    cache = QueryCache(make_store())
+                    cache.invalidate()
+                    loads = 0
+
+                    def load():
+                        nonlocal loads
+                        loads += 1
+                        if loads % args.write_every == 0:
+                            cache.invalidate(ATTENDANCE)   # a writer committing between page views
+                        return cache.get_or_load(key, loader, tags)
+
+                    ms = per_load_ms(load, args.loads)
+                    stats = cache.stats()
+                    print(f"{'':<18} {name:<13} {ms:8.2f} ms/load   hit rate {stats['hit_rate']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
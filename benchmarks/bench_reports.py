@@ -0,0 +1,71 @@
+"""
+Per-student report page: aggregating every attendance row on each view (the old
+/dashboard/report) against reading the precomputed Report rows, plus what keeping
+them current costs (full rebuild, and one session's worth of incremental updates).
+
+Usage: python -m benchmarks.bench_reports [--students 2000] [--days 200]
+"""
+import argparse
+import tempfile
+import time
+from collections import defaultdict
+
+from app import db
+from app.aggregates import apply_report_counts, rebuild_reports
+from app.models import Attendance, Report, Student
+from benchmarks.database import make_app, seed_attendance, seed_students
+
+
+def report_from_attendance():
+    """What the old page did: load every attendance row and aggregate in Python."""
+    students = Student.query.all()
+    totals = defaultdict(lambda: [0, 0])
+    for record in Attendance.query.all():
+        totals[record.student_id][0] += 1
+        totals[record.student_id][1] += record.status in ("Present", "Late")
+    return [(s.roll_no, *totals[s.id]) for s in students]
+
+
+def report_from_aggregates():
+    return db.session.query(
+        Student.roll_no, Report.total_classes, Report.attended_classes, Report.attendance_percentage
+    ).outerjoin(Report, Report.student_id == Student.id).all()
+
+
+def timed(fn, *args):
+    db.session.expunge_all()
+    start = time.monotonic()
+    result = fn(*args)
+    return result, 1000 * (time.monotonic() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory)
+        with app.app_context():
+            seed_students(args.students, embedding_bytes=16)
+            rows = seed_attendance(args.students, args.days)
+            print(f"{args.students} students, {rows} attendance rows\n")
+
+            count, rebuild_ms = timed(rebuild_reports, db)
+            print(f"flask rebuild-reports     : {count} reports in {rebuild_ms:8.1f} ms")
+
+            session_counts = {student_id: (1, 1) for student_id in range(1, args.students + 1)}
+            _, apply_ms = timed(apply_report_counts, db, session_counts)
+            db.session.rollback()
+            print(f"one session, incremental  : {len(session_counts)} students in {apply_ms:8.1f} ms\n")
+
+            old, old_ms = timed(report_from_attendance)
+            new, new_ms = timed(report_from_aggregates)
+            assert [row[1:3] for row in old] == [tuple(row[1:3]) for row in new]
+            print(f"report page, from attendance rows: {old_ms:8.1f} ms")
+            print(f"report page, from Report rows    : {new_ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
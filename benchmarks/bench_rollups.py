@@ -0,0 +1,91 @@
+"""
+Report summary and trends over a long history: counting the raw attendances table on
+every view against reading the DailyRollup table, plus the cost of maintaining it
+(full backfill, and the one-day refresh done at session close).
+
+Usage: python -m benchmarks.bench_rollups [--students 2000] [--days 365]
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func
+
+from app import db
+from app.aggregates import refresh_daily_rollups, rollup_trends
+from app.models import Attendance, DailyRollup
+from benchmarks.database import make_app, seed_attendance, seed_students
+
+
+def summary_from_attendance(today):
+    """The old /reports counts, on the date column so the comparison is about rollups, not indexes."""
+    return (
+        db.session.query(Attendance).count(),
+        db.session.query(Attendance).filter(Attendance.date == today, Attendance.status.in_(["Present", "Late"])).count(),
+        db.session.query(Attendance).filter(Attendance.date == today, Attendance.status == "Late").count(),
+    )
+
+
+def summary_from_rollups(today):
+    def total(*conditions):
+        return db.session.query(func.coalesce(func.sum(DailyRollup.count), 0)).filter(*conditions).scalar_subquery()
+
+    return db.session.query(
+        total(),
+        total(DailyRollup.date == today, DailyRollup.status.in_(["Present", "Late"])),
+        total(DailyRollup.date == today, DailyRollup.status == "Late"),
+    ).one()
+
+
+def trends_from_attendance(since, until):
+    bucket = func.strftime("%Y-W%W", Attendance.date)
+    return db.session.query(
+        bucket, *(func.sum(case((Attendance.status == status, 1), else_=0)) for status in ("Present", "Late", "Absent"))
+    ).filter(Attendance.date >= since, Attendance.date <= until).group_by(bucket).order_by(bucket).all()
+
+
+def timed_ms(fn, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.monotonic()
+        result = fn(*args)
+        elapsed = 1000 * (time.monotonic() - start)
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--subjects", type=int, default=10)
+    args = parser.parse_args()
+
+    today = datetime.now().date()
+    since = today - timedelta(days=args.days)
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory)
+        with app.app_context():
+            seed_students(args.students, embedding_bytes=16, subjects=args.subjects)
+            rows = seed_attendance(args.students, args.days, subjects=args.subjects)
+            print(f"{rows} attendance rows over {args.days} days\n")
+
+            count, backfill_ms = timed_ms(refresh_daily_rollups, db, repeat=1)
+            _, close_ms = timed_ms(refresh_daily_rollups, db, today, today)
+            print(f"flask backfill-rollups : {count} rollup rows in {backfill_ms:8.1f} ms")
+            print(f"session-close refresh  : one day in {close_ms:8.1f} ms\n")
+
+            old, old_ms = timed_ms(summary_from_attendance, today)
+            new, new_ms = timed_ms(summary_from_rollups, today)
+            assert tuple(old) == tuple(new)
+            print(f"/reports summary : attendances {old_ms:8.1f} ms   rollups {new_ms:6.2f} ms")
+
+            old, old_ms = timed_ms(trends_from_attendance, since, today)
+            new, new_ms = timed_ms(rollup_trends, db, since, today, "week")
+            assert [tuple(row[1:]) for row in old] == [(t["present"], t["late"], t["absent"]) for t in new]
+            print(f"weekly trends    : attendances {old_ms:8.1f} ms   rollups {new_ms:6.2f} ms  ({len(new)} weeks)")
+
+
+if __name__ == "__main__":
+    main()
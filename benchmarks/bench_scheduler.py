@@ -0,0 +1,57 @@
+"""
+Runs several streams through one MultiStreamScheduler and prints per-stream throughput,
+budget skips and backpressure drops. Sources can be video files, frame directories or
+synthetic streams; the model is simulated so no camera or DeepFace install is needed.
+
+Usage:
+  python -m benchmarks.bench_scheduler --sources a.mp4 b.mp4 c.mp4 --fps 5
+  python -m benchmarks.bench_scheduler --streams 4 --live-fps 25 --fps 5
+"""
+import argparse
+
+from app.frame_sources import open_frame_source
+from app.scheduler import MultiStreamScheduler, Stream
+from app.search_backends import ExactSearch
+from benchmarks.bench_pipeline import make_fake_embedder
+from benchmarks.synthetic import make_gallery
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sources", nargs="*", help="video files or frame directories (default: synthetic)")
+    parser.add_argument("--streams", type=int, default=4, help="synthetic streams when --sources is not given")
+    parser.add_argument("--frames", type=int, default=150, help="frames per synthetic stream")
+    parser.add_argument("--live-fps", type=float, default=25, help="capture rate of synthetic streams (0 = as fast as possible)")
+    parser.add_argument("--fps", type=float, nargs="+", default=[5.0], help="per-stream budget, one value or one per stream")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--faces", type=int, default=5)
+    parser.add_argument("--embed-ms", type=float, default=40)
+    parser.add_argument("--dim", type=int, default=512)
+    args = parser.parse_args()
+
+    if args.sources:
+        sources = [open_frame_source(s) for s in args.sources]
+    else:
+        spec = f"synthetic:320x240:{args.frames}" + (f":{args.live_fps}" if args.live_fps else "")
+        sources = [open_frame_source(spec) for _ in range(args.streams)]
+
+    budgets = args.fps if len(args.fps) == len(sources) else [args.fps[0]] * len(sources)
+    streams = [Stream(i + 1, source, subject_id=i + 1, fps_budget=fps) for i, (source, fps) in enumerate(zip(sources, budgets))]
+
+    gallery = make_gallery(1000, args.dim)
+    matcher = ExactSearch(gallery, [{"id": i, "name": str(i)} for i in range(len(gallery))])
+    scheduler = MultiStreamScheduler(
+        streams, make_fake_embedder(args.faces, args.dim, args.embed_ms), matcher,
+        handle_matches=lambda stream, faces: None, threshold=0.5, workers=args.workers,
+    )
+    metrics = scheduler.run()
+
+    print(f"{len(streams)} streams, {args.workers} shared workers, {metrics['elapsed_s']} s")
+    print(f"{'stream':>6} {'budget':>7} {'captured':>9} {'dropped':>8} {'processed':>10} {'proc/s':>7} {'e2e ms':>8}")
+    for stream_id, m in metrics["streams"].items():
+        print(f"{stream_id:>6} {m['fps_budget']:>7.1f} {m['capture']['items']:>9} {m['capture']['dropped']:>8} "
+              f"{m['processed']['items']:>10} {m['processed']['per_sec']:>7.2f} {m['end_to_end']['avg_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Latency / recall trade-off of the gallery search backends on synthetic embeddings.
+Recall@k is measured against ExactSearch on the same gallery.
+
+Usage: python -m benchmarks.bench_search_backends [--dim 4096] [--sizes 1000 10000 50000]
+"""
+import argparse
+import time
+
+from app.matcher import l2_normalize
+from app.search_backends import ExactSearch, IVFSearch, recall_at_k
+from benchmarks.synthetic import make_gallery, make_queries
+
+
+def per_query_ms(backend, queries, k):
+    start = time.perf_counter()
+    for query in queries:
+        backend.match(query[None, :], k=k)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dim", type=int, default=4096)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=1)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    print(f"{'gallery':>8} {'backend':>14} {'build ms':>9} {'ms/query':>9} {f'recall@{args.k}':>9}")
+    for size in args.sizes:
+        gallery = l2_normalize(make_gallery(size, args.dim))
+        metadata = [{"id": i} for i in range(size)]
+        queries, _ = make_queries(gallery, args.queries)
+
+        exact = ExactSearch.from_normalized(gallery, metadata)
+        print(f"{size:>8} {'exact':>14} {'-':>9} {per_query_ms(exact, queries, args.k):>9.3f} {1.0:>9.3f}")
+
+        for nprobe in args.nprobe:
+            start = time.perf_counter()
+            ivf = IVFSearch.from_normalized(gallery, metadata, nprobe=nprobe)
+            build_ms = (time.perf_counter() - start) * 1000
+            recall = recall_at_k(ivf, queries, k=args.k, reference=exact)
+            label = f"ivf/{ivf.nlist}/{nprobe}"
+            print(f"{size:>8} {label:>14} {build_ms:>9.0f} {per_query_ms(ivf, queries, args.k):>9.3f} {recall:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Student listing pages (home, admin dashboard, manage students, report) at school scale:
+Student.query.all() with the face_embedding BLOB loaded (as before) against the deferred
+column plus the has_face_embedding flag the templates now use.
+
+Usage: python -m benchmarks.bench_student_listing [--students 10000] [--embedding-bytes 16428]
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+
+from flask import render_template_string
+from sqlalchemy.orm import undefer
+
+from app import db
+from app.models import Student
+from benchmarks.database import make_app, seed_students
+
+# The student table of manage_students.html, with the face column as a parameter
+ROWS = """
+{% for student in students %}
+<tr><td>{{ student.id }}</td><td>{{ student.name }}</td><td>{{ student.email }}</td>
+<td>{{ student.roll_no }}</td><td>{{ student.contact }}</td>
+<td>{% if student[face_attr] %}Yes{% else %}No{% endif %}</td>
+<td>{% if student.is_approved %}Yes{% else %}No{% endif %}</td></tr>
+{% endfor %}
+"""
+
+
+def render_listing(query, face_attr):
+    """(query seconds, render seconds) for one page view."""
+    db.session.expunge_all()
+    start = time.monotonic()
+    students = query.all()
+    loaded = time.monotonic()
+    html = render_template_string(ROWS, students=students, face_attr=face_attr)
+    assert html
+    return loaded - start, time.monotonic() - loaded
+
+
+def peak_heap_mb(query, face_attr):
+    """Peak Python heap of one page view (traced separately: tracemalloc slows everything down)."""
+    db.session.expunge_all()
+    tracemalloc.start()
+    render_template_string(ROWS, students=query.all(), face_attr=face_attr)
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=10_000)
+    parser.add_argument("--embedding-bytes", type=int, default=16_428, help="4096-d float32 VGG-Face vector + header")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory)
+        with app.test_request_context():
+            seed_students(args.students, args.embedding_bytes)
+            print(f"{args.students} students, {args.embedding_bytes}-byte embeddings\n")
+
+            cases = [
+                ("BLOB loaded (before)", Student.query.options(undefer(Student.face_embedding)), "face_embedding"),
+                ("deferred (after)", Student.query, "has_face_embedding"),
+            ]
+            for name, query, face_attr in cases:
+                runs = [render_listing(query, face_attr) for _ in range(args.repeat)]
+                load, render = (min(values) for values in zip(*runs))
+                peak = peak_heap_mb(query, face_attr)
+                print(f"{name:<22} query {1000 * load:8.1f} ms  render {1000 * render:7.1f} ms  "
+                      f"peak heap {peak:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Enrollment templates: one sample per student against TEMPLATE_SAMPLES samples stored as a
+centroid or as several gallery rows, scored by recognition at MATCH_THRESHOLD.
+Genuine queries are new captures of enrolled students (a hit is the right student under
+the threshold); impostor queries are people who never enrolled (any match is a false accept).
+
+By default identities and captures are synthetic: every capture is the identity plus
+--noise, and a --bad fraction of enrollment samples is a different person (a frame that
+passed the quality checks but caught someone else). With --images DIR the real detector
+and model embed DIR/<person>/*.jpg instead: the first --samples photos of each person
+enroll, the rest are queries, and every fifth person is held out as an impostor.
+
+Usage: python -m benchmarks.bench_templates [--students 500] [--samples 5] [--noise 0.9] [--bad 0.1]
+       python -m benchmarks.bench_templates --images DIR [--samples 5]
+"""
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from app import face_templates
+from app.face_templates import build_template, gallery_vectors
+from app.matcher import GalleryMatcher
+from app.model_registry import MATCH_THRESHOLD
+from benchmarks.synthetic import make_gallery
+
+
+def captures(identity, count, noise, rng):
+    """`count` noisy captures of one identity vector (noise relative to its norm, as make_queries)."""
+    scale = noise * np.linalg.norm(identity) / np.sqrt(len(identity))
+    return identity + scale * rng.standard_normal((count, len(identity)), dtype=np.float32)
+
+
+def synthetic_data(students, impostors, samples, queries, noise, bad, dim, seed=0):
+    """({person: enrollment samples}, [(person or None, query vector)])."""
+    rng = np.random.default_rng(seed)
+    identities = make_gallery(students + impostors, dim, seed=seed)
+    enrollment, probes = {}, []
+    for person in range(students):
+        taken = captures(identities[person], samples, noise, rng)
+        for i in range(samples):
+            if rng.random() < bad:
+                taken[i] = captures(identities[rng.integers(students + impostors)], 1, noise, rng)[0]
+        enrollment[person] = taken
+        probes.extend((person, query) for query in captures(identities[person], queries, noise, rng))
+    for person in range(students, students + impostors):
+        probes.extend((None, query) for query in captures(identities[person], queries, noise, rng))
+    return enrollment, probes
+
+
+def image_data(directory, samples):
+    """The same structure from DIR/<person>/*.jpg, embedded by the real detector and model."""
+    from app.enroll_face import template_from_images
+
+    enrollment, probes = {}, []
+    people = sorted(name for name in os.listdir(directory) if os.path.isdir(os.path.join(directory, name)))
+    for n, person in enumerate(people):
+        folder = os.path.join(directory, person)
+        images = [cv2.imread(os.path.join(folder, name)) for name in sorted(os.listdir(folder))]
+        images = [image for image in images if image is not None]
+        impostor = n % 5 == 4
+        if not impostor:
+            template, _ = template_from_images(images[:samples])
+            if template is None:
+                continue
+            enrollment[person] = template
+        for image in (images if impostor else images[samples:]):
+            # build_template keeps a lone sample as is, so this is the plain normalized embedding
+            embedding, _ = template_from_images([image])
+            if embedding is not None:
+                probes.append((None if impostor else person, embedding[0]))
+    return enrollment, probes
+
+
+def evaluate(enrollment, probes, samples, mode):
+    """Builds the gallery the way recognition does and scores every probe."""
+    rows, metadata = [], []
+    for person, taken in enrollment.items():
+        template = build_template(taken[:samples], max_samples=samples)
+        vectors = gallery_vectors(template, mode=mode)
+        rows.append(vectors)
+        metadata.extend([person] * len(vectors))
+    matcher = GalleryMatcher(np.vstack(rows), metadata)
+
+    queries = np.stack([query for _, query in probes])
+    start = time.monotonic()
+    indices, distances = matcher.match(queries, k=1)
+    elapsed_ms = 1000 * (time.monotonic() - start)
+
+    hits = genuine = false_accepts = impostors = impostor_accepts = 0
+    for (person, _), row, distance in zip(probes, indices[:, 0], distances[:, 0]):
+        accepted = distance < MATCH_THRESHOLD
+        if person is None:
+            impostors += 1
+            impostor_accepts += accepted
+            false_accepts += accepted
+        else:
+            genuine += 1
+            hits += accepted and metadata[row] == person
+            false_accepts += accepted and metadata[row] != person
+    accepted_total = hits + false_accepts
+    return {
+        "rows": matcher.size,
+        "recall": hits / genuine if genuine else 0.0,
+        "precision": hits / accepted_total if accepted_total else 1.0,
+        "impostor_far": impostor_accepts / impostors if impostors else 0.0,
+        "ms_per_query": elapsed_ms / len(probes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--impostors", type=int, default=100)
+    parser.add_argument("--samples", type=int, default=face_templates.TEMPLATE_SAMPLES)
+    parser.add_argument("--queries", type=int, default=4, help="captures per person")
+    parser.add_argument("--noise", type=float, default=0.9, help="per-capture noise (synthetic)")
+    parser.add_argument("--bad", type=float, default=0.1, help="fraction of enrollment samples of the wrong person (synthetic)")
+    parser.add_argument("--outlier-distance", type=float, default=face_templates.OUTLIER_DISTANCE)
+    parser.add_argument("--dim", type=int, default=4096)
+    parser.add_argument("--images", help="labelled photo folder, embedded with the real models")
+    args = parser.parse_args()
+    face_templates.OUTLIER_DISTANCE = args.outlier_distance   # read by build_template at call time
+
+    if args.images:
+        enrollment, probes = image_data(args.images, args.samples)
+    else:
+        enrollment, probes = synthetic_data(args.students, args.impostors, args.samples, args.queries,
+                                            args.noise, args.bad, args.dim)
+    impostor_probes = sum(1 for person, _ in probes if person is None)
+    print(f"{len(enrollment)} enrolled, {len(probes) - impostor_probes} genuine + {impostor_probes} impostor queries, "
+          f"threshold {MATCH_THRESHOLD}\n")
+
+    print(f"{'template':>22}  {'rows':>6}  {'recall':>7}  {'precision':>9}  {'impostor FAR':>12}  {'ms/query':>8}")
+    for label, samples, mode in (
+        ("1 sample", 1, "centroid"),
+        (f"{args.samples} samples, centroid", args.samples, "centroid"),
+        (f"{args.samples} samples, multi", args.samples, "multi"),
+    ):
+        result = evaluate(enrollment, probes, samples, mode)
+        print(f"{label:>22}  {result['rows']:6d}  {result['recall']:7.3f}  {result['precision']:9.3f}  "
+              f"{result['impostor_far']:12.3f}  {result['ms_per_query']:8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Throwaway SQLite databases with the app's models, for benchmarks that need real queries."""
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import Flask
+
+from app import db
+from app.models import Attendance, Student
+
+
+def make_app(directory):
+    """Minimal Flask app bound to <directory>/bench.db, with all tables created."""
+    app = Flask(__name__, instance_path=directory)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed_students(count, embedding_bytes=2048, subjects=1, chunk=10_000, seed=0):
+    """Inserts `count` approved students, spread over `subjects`, each with a random embedding blob."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, count, chunk):
+        rows = [
+            {
+                "id": i + 1, "name": f"Student {i}", "email": f"s{i}@example.com", "roll_no": f"R{i:07d}",
+                "contact": 9_000_000_000 + i, "password": "x", "is_approved": True,
+                "subject_id": i % subjects + 1, "face_embedding": rng.bytes(embedding_bytes),
+            }
+            for i in range(start, min(start + chunk, count))
+        ]
+        db.session.execute(Student.__table__.insert(), rows)
+    db.session.commit()
+
+
+def seed_attendance(student_count, days, present_ratio=0.8, subjects=1, chunk=50_000, seed=0, end_day=None):
+    """
+    One record per student per day for `days` days ending at `end_day` (default today):
+    Present / Late for `present_ratio` of them, Absent otherwise. Returns the row count.
+    """
+    rng = np.random.default_rng(seed)
+    end_day = end_day or datetime.now().date()
+    rows, total = [], 0
+    for offset in range(days):
+        day = end_day - timedelta(days=offset)
+        base = datetime.combine(day, datetime.min.time()) + timedelta(hours=8)
+        draws = rng.random(student_count)
+        minutes = rng.integers(0, 90, student_count)
+        for i in range(student_count):
+            time_in = base + timedelta(minutes=int(minutes[i]))
+            status = "Absent" if draws[i] >= present_ratio else ("Late" if minutes[i] >= 60 else "Present")
+            rows.append({
+                "student_id": i + 1, "subject_id": i % subjects + 1, "date": day, "time_in": time_in,
+                "time_out": None if status == "Absent" else time_in + timedelta(hours=6),
+                "status": status, "mode": "Face",
+            })
+            if len(rows) >= chunk:
+                db.session.execute(Attendance.__table__.insert(), rows)
+                total += len(rows)
+                rows = []
+    if rows:
+        db.session.execute(Attendance.__table__.insert(), rows)
+        total += len(rows)
+    db.session.commit()
+    return total
@@ -0,0 +1,24 @@
+"""Synthetic face-like embeddings shared by the benchmarks."""
+import numpy as np
+
+
+def make_gallery(size, dim, latent_dim=64, seed=0):
+    """
+    Identities drawn from a low-rank latent space plus isotropic noise, which gives the
+    gallery the kind of cluster structure real face embeddings have (pure Gaussian
+    vectors are all nearly orthogonal and make every index look bad).
+    """
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((latent_dim, dim), dtype=np.float32)
+    latent = rng.standard_normal((size, latent_dim), dtype=np.float32)
+    gallery = latent @ basis + 0.5 * rng.standard_normal((size, dim), dtype=np.float32)
+    return gallery
+
+
+def make_queries(gallery, count, noise=0.3, seed=1):
+    """Noisy re-captures of random enrolled identities. Returns (queries, true_rows)."""
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(gallery), count)
+    scale = noise * np.linalg.norm(gallery[rows], axis=1, keepdims=True) / np.sqrt(gallery.shape[1])
+    queries = gallery[rows] + scale * rng.standard_normal((count, gallery.shape[1]), dtype=np.float32)
+    return queries, rows